@@ -8,6 +8,17 @@ and ETag passthrough) and mounts the API routers. Business logic lives in
 
 from __future__ import annotations
 
-from app.main import create_app
+from typing import Any
 
 __all__ = ["create_app"]
+
+
+def __getattr__(name: str) -> Any:
+    # Resolve the factory lazily: importing a leaf module such as
+    # app.logic.csv_validation (e.g. in an import-pool worker) must not load
+    # the whole application.
+    if name == "create_app":
+        from app.main import create_app
+
+        return create_app
+    raise AttributeError(f"module 'app' has no attribute {name!r}")
@@ -39,6 +39,11 @@ def get_engine(url: str | None = None) -> Engine:
     Reuses a module-level Engine so repositories share the same connection.
     For SQLite in-memory URLs, use a StaticPool to keep a single connection
     alive across sessions and threads during tests.
+
+    On psycopg 3 URLs (``postgresql+psycopg://``) a statement is prepared
+    server-side once it has run `DB_PREPARE_THRESHOLD` times on a connection
+    (driver default 5; 0 prepares on first use). psycopg2 has no server-side
+    prepare, so there the module-level statements only save client-side work.
     """
     global _ENGINE, _ENGINE_URL
     resolved_url = url or _db_url()
@@ -51,6 +56,10 @@ def get_engine(url: str | None = None) -> Engine:
                 "poolclass": StaticPool,
                 "connect_args": {"check_same_thread": False},
             })
+        elif resolved_url.startswith("postgresql+psycopg:"):
+            threshold = os.getenv("DB_PREPARE_THRESHOLD")
+            if threshold:
+                kwargs["connect_args"] = {"prepare_threshold": int(threshold)}
         _ENGINE = create_engine(resolved_url, **kwargs)
         _ENGINE_URL = resolved_url
 
@@ -375,6 +375,29 @@ def _expose_diag(resp: JSONResponse) -> None:
         logger.error("expose_diag_failed", exc_info=True)
 
 
+def if_none_match_satisfied(request: Request, current_etag: Optional[str]) -> bool:
+    """Return True when a conditional GET's If-None-Match matches `current_etag`.
+
+    Read routes call this to decide on 304 so that ETag comparison stays in
+    the guard; they only emit headers. Uses the canonical
+    app.logic.etag.compare_etag helper (lists, quotes, weak tags, '*').
+    """
+    try:
+        inm = request.headers.get("If-None-Match") if request is not None else None
+    except Exception:
+        inm = None
+    if not inm or not current_etag:
+        return False
+    from app.logic.etag import compare_etag as _cmp  # type: ignore
+
+    matched = bool(_cmp(current_etag, inm))
+    try:
+        logger.info("etag.if_none_match", extra={"matched": matched})
+    except Exception:
+        logger.error("etag_if_none_match_log_failed", exc_info=True)
+    return matched
+
+
 def _guard_for_answers(request: Request, if_match: str | None) -> Optional[JSONResponse]:
     params = getattr(request, "path_params", {}) or {}
     response_set_id = params.get("response_set_id")
@@ -2126,10 +2149,10 @@ def precondition_guard(
                 # Primary: resolve via repository_screens
                 try:
                     from app.logic.repository_screens import get_screen_key_for_question  # type: ignore
-                    from app.logic.etag import compute_screen_etag  # type: ignore
+                    from app.logic.screen_memo import memoized_screen_etag  # type: ignore
                     _skey = get_screen_key_for_question(str(_qid))
                     if _skey:
-                        _token = compute_screen_etag(str(_rsid), str(_skey)) or ""
+                        _token = memoized_screen_etag(str(_rsid), str(_skey)) or ""
                 except Exception:
                     _token = ""
                 # Fallback: resolve via repository_answers when primary fails/empty
@@ -2138,10 +2161,10 @@ def precondition_guard(
                         from app.logic.repository_answers import (
                             get_screen_key_for_question as _answers_skey,
                         )  # type: ignore
-                        from app.logic.etag import compute_screen_etag as _compute_screen_etag  # type: ignore
+                        from app.logic.screen_memo import memoized_screen_etag as _memoized_screen_etag  # type: ignore
                         _skey_fb = _answers_skey(str(_qid))
                         if _skey_fb:
-                            _token = _compute_screen_etag(str(_rsid), str(_skey_fb)) or ""
+                            _token = _memoized_screen_etag(str(_rsid), str(_skey_fb)) or ""
                     except Exception:
                         _token = _token or ""
             from app.logic.header_emitter import emit_etag_headers as _emit_headers  # type: ignore
@@ -2227,8 +2250,8 @@ def precondition_guard(
                     _skey = v
             if _rsid and _skey:
                 try:
-                    from app.logic.etag import compute_screen_etag  # type: ignore
-                    current_etag = compute_screen_etag(str(_rsid), str(_skey))
+                    from app.logic.screen_memo import memoized_screen_etag  # type: ignore
+                    current_etag = memoized_screen_etag(str(_rsid), str(_skey))
                 except Exception:
                     current_etag = None
             else:
@@ -2339,8 +2362,8 @@ def precondition_guard(
                 _skey_fb = str(_qid_fb)
             if _rsid_fb and _skey_fb:
                 try:
-                    from app.logic.etag import compute_screen_etag as _compute_screen_etag  # type: ignore
-                    current_etag = _compute_screen_etag(str(_rsid_fb), str(_skey_fb)) or current_etag
+                    from app.logic.screen_memo import memoized_screen_etag as _memoized_screen_etag  # type: ignore
+                    current_etag = _memoized_screen_etag(str(_rsid_fb), str(_skey_fb)) or current_etag
                 except Exception:
                     # Leave current_etag unchanged on failure
                     pass
@@ -2395,8 +2418,8 @@ def precondition_guard(
                         _skey2 = str(_qid2)
                     if _rsid2 and _skey2:
                         try:
-                            from app.logic.etag import compute_screen_etag as _comp2  # type: ignore
-                            _token_em = _comp2(str(_rsid2), str(_skey2)) or ""
+                            from app.logic.screen_memo import memoized_screen_etag as _memoized_etag2  # type: ignore
+                            _token_em = _memoized_etag2(str(_rsid2), str(_skey2)) or ""
                         except Exception:
                             _token_em = ""
                 except Exception:
@@ -2448,6 +2471,6 @@ def precondition_guard(
     return None
 
 
-__all__ = ["precondition_guard"]
+__all__ = ["precondition_guard", "if_none_match_satisfied"]
 
 # Duplicate If-Match normaliser removed; rely on route/header emitter diagnostics
@@ -3,35 +3,160 @@
 Applies a root stdout handler so all module loggers emit INFO-level logs
 without requiring per-module setup. Keeps uvicorn loggers visible and avoids
 duplicate handlers on reloads.
+
+Records are handed to a `QueueHandler` and written to stdout by a single
+`QueueListener` thread, so request threads never block on stream I/O.
+Records dropped by level or sampling are never formatted; kept records have
+their `%`-style arguments merged before enqueueing, as the stdlib handler
+does. Tuning via environment:
+
+- ``LOG_LEVEL``: root level (default INFO).
+- ``LOG_LEVELS``: per-logger levels, e.g.
+  ``app.logic.screen_builder=WARNING,app.guards=INFO``.
+- ``LOG_SAMPLE_RATES``: keep only a fraction of INFO/DEBUG records for a
+  logger prefix, e.g. ``app.logic.screen_builder=0.01``. WARNING and above
+  are never sampled.
 """
 from __future__ import annotations
+import atexit
+import copy
 import logging
+import os
+import queue
+import random
+import sys
+import threading
 from logging.config import dictConfig
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict
+
+_FORMAT = "%(asctime)s %(levelname)s:%(name)s:%(message)s"
 
 _DICT_CONFIG = {
     "version": 1,
     "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "%(asctime)s %(levelname)s:%(name)s:%(message)s",
-        }
-    },
     "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "level": "INFO",
-            "formatter": "default",
-            "stream": "ext://sys.stdout",
-        }
+        "queue": {"()": "app.logging_setup.get_queue_handler"},
     },
-    "root": {"level": "INFO", "handlers": ["console"]},
+    "root": {"level": "INFO", "handlers": ["queue"]},
     "loggers": {
-        "uvicorn": {"level": "INFO", "handlers": ["console"], "propagate": False},
-        "uvicorn.error": {"level": "INFO", "handlers": ["console"], "propagate": False},
-        "uvicorn.access": {"level": "INFO", "handlers": ["console"], "propagate": False},
+        "uvicorn": {"level": "INFO", "handlers": ["queue"], "propagate": False},
+        "uvicorn.error": {"level": "INFO", "handlers": ["queue"], "propagate": False},
+        "uvicorn.access": {"level": "INFO", "handlers": ["queue"], "propagate": False},
     },
 }
 
+
+def _parse_pairs(raw: str | None) -> Dict[str, str]:
+    """Parse ``name=value,name=value`` into a dict, ignoring malformed items."""
+    out: Dict[str, str] = {}
+    for item in (raw or "").split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip() and value.strip():
+            out[name.strip()] = value.strip()
+    return out
+
+
+class SamplingFilter(logging.Filter):
+    """Pass a configured fraction of INFO/DEBUG records per logger prefix."""
+
+    def __init__(self, rates: Dict[str, float]) -> None:
+        super().__init__()
+        # Longest prefix first so the most specific rate wins
+        self._rates = sorted(rates.items(), key=lambda kv: len(kv[0]), reverse=True)
+        self._cache: Dict[str, float] = {}
+
+    def _rate_for(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = 1.0
+            for prefix, value in self._rates:
+                if name == prefix or name.startswith(prefix + "."):
+                    rate = value
+                    break
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self._rates:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves line formatting to the listener thread.
+
+    The message is merged with its arguments here, on the calling thread, so
+    callers may keep mutating the dicts and lists they log. Exception
+    tracebacks are rendered here too (they reference live frames); only the
+    timestamp/level line layout is applied by the listener. As in the stdlib
+    handler, the enqueued record is a copy, so handlers that see the record
+    after this one still get its args and exc_info.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_QUEUE_HANDLER: QueueHandler | None = None
+_LISTENER: QueueListener | None = None
+_LOCK = threading.Lock()
+
+
+def _stop_listener() -> None:
+    if _LISTENER is not None:
+        _LISTENER.stop()
+
+
+def get_queue_handler() -> QueueHandler:
+    """Return the process-wide queue handler, starting its listener on first use."""
+    global _QUEUE_HANDLER, _LISTENER
+    with _LOCK:
+        if _QUEUE_HANDLER is None:
+            q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+            console = logging.StreamHandler(stream=sys.stdout)
+            console.setFormatter(logging.Formatter(_FORMAT))
+            handler = _DeferredQueueHandler(q)
+            rates: Dict[str, float] = {}
+            for name, value in _parse_pairs(os.getenv("LOG_SAMPLE_RATES")).items():
+                try:
+                    rates[name] = min(1.0, max(0.0, float(value)))
+                except ValueError:
+                    continue
+            handler.addFilter(SamplingFilter(rates))
+            _LISTENER = QueueListener(q, console, respect_handler_level=True)
+            _LISTENER.start()
+            atexit.register(_stop_listener)
+            _QUEUE_HANDLER = handler
+        return _QUEUE_HANDLER
+
+
+def _apply_levels() -> None:
+    for name, level in _parse_pairs(os.getenv("LOG_LEVELS")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+
+def route_module_logger(logger: logging.Logger) -> None:
+    """Send a module logger's records to stdout via the shared queue.
+
+    For modules that must emit INFO even when `configure_logging` has not run
+    (e.g. imported directly by tests); replaces per-module stream handlers.
+    """
+    handler = get_queue_handler()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    configured = _parse_pairs(os.getenv("LOG_LEVELS")).get(logger.name)
+    logger.setLevel(configured.upper() if configured else logging.INFO)
+    logger.propagate = False
+
+
 def configure_logging() -> None:
     """Configure application-wide logging once.
 
@@ -42,3 +167,5 @@ def configure_logging() -> None:
     if root.handlers:
         return
     dictConfig(_DICT_CONFIG)
+    root.setLevel((os.getenv("LOG_LEVEL") or "INFO").upper())
+    _apply_levels()
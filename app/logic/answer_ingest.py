@@ -0,0 +1,241 @@
+"""Streaming NDJSON answer ingestion.
+
+Consumes an `application/x-ndjson` body incrementally, one JSON object per
+line shaped like `{"question_id": ..., "value": ..., "option_id": ..., "clear": ...}`.
+Lines are validated with the same checks as the single-answer routes and
+written in chunked transactions via `bulk_upsert_answers`; one outcome line
+is streamed back per input line, in input order, followed by a summary line.
+At most one chunk of parsed lines is held at a time, so memory stays flat
+regardless of upload size.
+"""
+
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+
+from starlette.concurrency import run_in_threadpool
+
+from app.logic.enum_resolution import resolve_enum_option
+from app.logic.etag import compute_screen_etag
+from app.logic.repository_answers import bulk_upsert_answers, get_questions_screen_and_kind
+from app.logic.validation import (
+    HamiltonValidationError,
+    is_finite_number,
+    validate_answer_upsert,
+    validate_kind_value,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Lines written per transaction
+INGEST_CHUNK_SIZE = max(1, int(os.getenv("ANSWERS_INGEST_CHUNK_SIZE", "500")))
+# Longest accepted line; longer lines are rejected without being buffered
+INGEST_MAX_LINE_BYTES = max(1024, int(os.getenv("ANSWERS_INGEST_MAX_LINE_BYTES", str(1024 * 1024))))
+
+# (line_no, question_id, body, error) where error is (code, message) or None
+_Pending = Tuple[int, Optional[str], Dict[str, Any], Optional[Tuple[str, str]]]
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int | None = None
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Yield (line_no, raw_line) from a byte stream; raw_line is None when too long.
+
+    Blank lines are skipped but still counted so line numbers match the upload.
+    Every line longer than `max_line_bytes` is reported as None, whether it
+    arrived within one chunk or spread over several.
+    """
+    max_line_bytes = max_line_bytes or INGEST_MAX_LINE_BYTES
+    buf = bytearray()
+    line_no = 0
+    overlong = False
+    async for chunk in chunks:
+        if not chunk:
+            continue
+        buf.extend(chunk)
+        while True:
+            nl = buf.find(b"\n")
+            if nl < 0:
+                break
+            line_no += 1
+            if overlong:
+                overlong = False
+                del buf[: nl + 1]
+                yield line_no, None
+                continue
+            if nl > max_line_bytes:
+                del buf[: nl + 1]
+                yield line_no, None
+                continue
+            line = bytes(buf[:nl]).strip()
+            del buf[: nl + 1]
+            if line:
+                yield line_no, line
+        if not overlong and len(buf) > max_line_bytes:
+            # Discard the rest of this line as it arrives
+            overlong = True
+        if overlong:
+            buf.clear()
+    if overlong:
+        yield line_no + 1, None
+    elif buf.strip():
+        yield line_no + 1, bytes(buf).strip()
+
+
+def parse_ingest_line(line_no: int, raw: Optional[bytes]) -> _Pending:
+    """Decode and validate one line's shape; errors are carried, not raised."""
+    if raw is None:
+        return line_no, None, {}, ("VALIDATION_FAILED", "line too long")
+    try:
+        obj = json.loads(raw)
+    except Exception:
+        return line_no, None, {}, ("VALIDATION_FAILED", "invalid json")
+    if not isinstance(obj, dict):
+        return line_no, None, {}, ("VALIDATION_FAILED", "line must be an object")
+    qid = obj.pop("question_id", None)
+    if not qid or not isinstance(qid, str):
+        return line_no, None, {}, ("RUN_BATCH_ITEM_QUESTION_ID_MISSING", "question_id required")
+    try:
+        validate_answer_upsert(obj)
+    except HamiltonValidationError as exc:
+        return line_no, qid, {}, ("VALIDATION_FAILED", str(exc))
+    return line_no, qid, obj, None
+
+
+def _outcome(line_no: int, qid: Optional[str], error: Optional[Tuple[str, str]]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {"line": line_no}
+    if qid:
+        out["question_id"] = qid
+    if error is None:
+        out["outcome"] = "success"
+    else:
+        out["outcome"] = "error"
+        out["error"] = {"code": error[0], "message": error[1]}
+    return out
+
+
+def write_ingest_chunk(
+    response_set_id: str, pending: List[_Pending]
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Validate kinds for a chunk and write it in one transaction.
+
+    Returns (outcomes in input order, screen_keys whose version advanced).
+    """
+    meta = get_questions_screen_and_kind([p[1] for p in pending if p[3] is None and p[1]])
+    checked: List[_Pending] = []
+    # Last operation per question wins, as if lines were applied in order:
+    # question_id -> (value, option_id), or None for a clear
+    latest: Dict[str, Optional[Tuple[Any, Any]]] = {}
+    screen_of: Dict[str, str] = {}
+    screens: List[str] = []
+    for line_no, qid, body, error in pending:
+        if error is None and qid is not None:
+            skey, kind = meta.get(qid, (None, None))
+            if not skey:
+                error = ("RUN_QUESTION_ID_UNKNOWN", "unknown question_id")
+            elif bool(body.get("clear")):
+                latest.pop(qid, None)
+                latest[qid] = None
+                screen_of[qid] = skey
+            else:
+                value = body.get("value")
+                opt = body.get("option_id")
+                kind_l = (kind or "").lower()
+                try:
+                    if value is not None:
+                        validate_kind_value(kind_l, value)
+                    if kind_l == "number" and value is not None and not is_finite_number(value):
+                        raise HamiltonValidationError("not_finite_number")
+                    if kind_l == "enum_single" and not opt:
+                        opt = resolve_enum_option(qid, value_token=str(value) if value is not None else None)
+                        if not opt:
+                            raise HamiltonValidationError("enum value not recognised")
+                except HamiltonValidationError as exc:
+                    error = ("VALIDATION_FAILED", str(exc))
+                else:
+                    latest.pop(qid, None)
+                    latest[qid] = (value, opt)
+                    screen_of[qid] = skey
+        checked.append((line_no, qid, body, error))
+
+    if latest:
+        upserts = [(q, op[0], op[1]) for q, op in latest.items() if op is not None]
+        clears = [q for q, op in latest.items() if op is None]
+        try:
+            screens = list(bulk_upsert_answers(response_set_id, upserts, clears, screen_of))
+        except Exception:
+            logger.error(
+                "answers_ingest_chunk_failed rs_id=%s lines=%s", response_set_id, len(pending), exc_info=True
+            )
+            checked = [
+                (n, q, b, e if e is not None else ("INTERNAL_ERROR", "write failed"))
+                for n, q, b, e in checked
+            ]
+    return [_outcome(n, q, e) for n, q, _b, e in checked], screens
+
+
+def _screen_etags(response_set_id: str, screen_keys: set[str]) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for skey in sorted(screen_keys):
+        try:
+            out[skey] = compute_screen_etag(response_set_id, skey)
+        except Exception:
+            logger.error("answers_ingest_etag_failed rs_id=%s screen_key=%s", response_set_id, skey, exc_info=True)
+    return out
+
+
+async def stream_ingest_outcomes(
+    response_set_id: str,
+    chunks: AsyncIterator[bytes],
+    chunk_size: int | None = None,
+) -> AsyncIterator[bytes]:
+    """Ingest an NDJSON byte stream, yielding NDJSON outcome lines as chunks commit.
+
+    Within a chunk a later line for the same question supersedes earlier
+    ones, matching the end state of applying lines one by one. The summary
+    line carries the final Screen-ETag of every screen the upload touched.
+    """
+    chunk_size = chunk_size or INGEST_CHUNK_SIZE
+    pending: List[_Pending] = []
+    totals = {"lines": 0, "succeeded": 0, "failed": 0}
+    touched: set[str] = set()
+
+    async def _flush() -> AsyncIterator[bytes]:
+        outcomes, screens = await run_in_threadpool(write_ingest_chunk, response_set_id, list(pending))
+        pending.clear()
+        touched.update(screens)
+        for out in outcomes:
+            totals["lines"] += 1
+            totals["succeeded" if out["outcome"] == "success" else "failed"] += 1
+            yield (json.dumps(out) + "\n").encode("utf-8")
+
+    async for line_no, raw in iter_ndjson_lines(chunks):
+        pending.append(parse_ingest_line(line_no, raw))
+        if len(pending) >= chunk_size:
+            async for out_line in _flush():
+                yield out_line
+    if pending:
+        async for out_line in _flush():
+            yield out_line
+    logger.info(
+        "answers_ingest_done rs_id=%s lines=%s succeeded=%s failed=%s",
+        response_set_id,
+        totals["lines"],
+        totals["succeeded"],
+        totals["failed"],
+    )
+    etags = await run_in_threadpool(_screen_etags, response_set_id, touched)
+    yield (json.dumps({"summary": {**totals, "screen_etags": etags}}) + "\n").encode("utf-8")
+
+
+__all__ = [
+    "INGEST_CHUNK_SIZE",
+    "iter_ndjson_lines",
+    "parse_ingest_line",
+    "write_ingest_chunk",
+    "stream_ingest_outcomes",
+]
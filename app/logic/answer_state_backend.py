@@ -0,0 +1,595 @@
+"""Pluggable stores behind the answer cache and Screen-ETag version counters.
+
+`repository_answers` keeps two pieces of hot state: the answer read-through
+cache (`(response_set_id, question_id) -> (option_id, value_text,
+value_number, value_bool)`) and the per-(response_set_id, screen_key)
+version counters that feed Screen-ETags. Both are mappings; this module
+provides interchangeable implementations selected by
+`ANSWER_STATE_BACKEND`:
+
+- ``memory`` (default): per-process stores; answers live in a bounded
+  LRU/TTL cache (`ANSWER_CACHE_MAX_ENTRIES`, `ANSWER_CACHE_TTL_SECONDS`).
+- ``sql``: the `screen_state_version` / `screen_state_answer` tables on the
+  application database, with an atomic upsert-increment for versions, so
+  every worker sees the same counters and answers.
+- ``socket``: a small line-delimited JSON server on a local Unix socket
+  (`ANSWER_STATE_SOCKET`), standing in for an external cache service in
+  multi-worker development setups. Start it with
+  ``python -m app.logic.answer_state_backend /tmp/answer-state.sock``.
+
+Version stores additionally expose `increment(key) -> int`.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import json
+import logging
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+
+logger = logging.getLogger(__name__)
+
+AnswerKey = Tuple[str, str]
+AnswerTuple = Tuple[Optional[str], Optional[str], Optional[float], Optional[bool]]
+
+
+class InProcessVersions(dict):
+    """Per-process version counters (default backend)."""
+
+    def increment(self, key: Tuple[str, str]) -> int:
+        value = int(self.get(key, 0)) + 1
+        self[key] = value
+        return value
+
+
+def _intern_id(value: Any) -> Any:
+    """Share one string object per distinct id across all cache entries."""
+    return sys.intern(value) if type(value) is str else value
+
+
+class _AnswerEntry:
+    """Slotted cache record: one object per answer instead of nested tuples."""
+
+    __slots__ = ("option_id", "value_text", "value_number", "value_bool", "expires_at")
+
+    def __init__(self, value: AnswerTuple, expires_at: float) -> None:
+        opt, self.value_text, self.value_number, self.value_bool = value
+        self.option_id = _intern_id(opt)
+        self.expires_at = expires_at
+
+    def as_tuple(self) -> AnswerTuple:
+        return (self.option_id, self.value_text, self.value_number, self.value_bool)
+
+
+class BoundedAnswerCache(MutableMapping):
+    """Per-process answer cache with a size bound and a TTL.
+
+    Entries are grouped per response set: each set maps interned question
+    ids to slotted `_AnswerEntry` records, and recency is tracked per
+    response set (respondents work through one set at a time), so an entry
+    costs one dict slot and one small object rather than a key tuple,
+    nested value tuples and a linked-list node. Reads still return plain
+    4-tuples.
+
+    Entries past `ttl_seconds` read as misses and are dropped. Inserting past
+    `max_entries` evicts whole least-recently-used response sets (or, for a
+    single oversized set, its oldest entries). Answers that exist only here
+    because the DB write failed are pinned: they are the sole copy, so they
+    are exempt from size and TTL eviction until overwritten, deleted or
+    evicted with their response set.
+
+    The cache is shared by the request threadpool, so every public method
+    holds a lock; the underscored helpers assume it is already held.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._sets: "OrderedDict[str, Dict[str, _AnswerEntry]]" = OrderedDict()
+        self._pinned: Dict[str, Dict[str, _AnswerEntry]] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, rs_id: str, qid: str) -> bool:
+        entries = self._sets.get(rs_id)
+        if entries is None or entries.pop(qid, None) is None:
+            return False
+        self._size -= 1
+        if not entries:
+            del self._sets[rs_id]
+        return True
+
+    def _unpin(self, rs_id: str, qid: str) -> bool:
+        pinned = self._pinned.get(rs_id)
+        if pinned is None or pinned.pop(qid, None) is None:
+            return False
+        if not pinned:
+            del self._pinned[rs_id]
+        return True
+
+    def _get(self, key: AnswerKey) -> AnswerTuple:
+        rs_id, qid = key
+        pinned = self._pinned.get(rs_id)
+        if pinned is not None and qid in pinned:
+            self.hits += 1
+            return pinned[qid].as_tuple()
+        entries = self._sets.get(rs_id)
+        entry = entries.get(qid) if entries is not None else None
+        if entry is None:
+            self.misses += 1
+            raise KeyError(key)
+        if entry.expires_at <= self._clock():
+            self._drop(rs_id, qid)
+            self.expirations += 1
+            self.misses += 1
+            raise KeyError(key)
+        self._sets.move_to_end(rs_id)
+        self.hits += 1
+        return entry.as_tuple()
+
+    def __getitem__(self, key: AnswerKey) -> AnswerTuple:
+        with self._lock:
+            return self._get(key)
+
+    def __setitem__(self, key: AnswerKey, value: AnswerTuple) -> None:
+        rs_id, qid = _intern_id(key[0]), _intern_id(key[1])
+        with self._lock:
+            self._unpin(rs_id, qid)
+            entries = self._sets.get(rs_id)
+            if entries is None:
+                entries = self._sets[rs_id] = {}
+            if qid not in entries:
+                self._size += 1
+            entries[qid] = _AnswerEntry(value, self._clock() + self.ttl_seconds)
+            self._sets.move_to_end(rs_id)
+            self._evict_overflow(rs_id)
+
+    def _evict_overflow(self, current: str) -> None:
+        while self._size > self.max_entries and self._sets:
+            oldest = next(iter(self._sets))
+            if oldest != current:
+                evicted = len(self._sets.pop(oldest))
+                self._size -= evicted
+                self.evictions += evicted
+                continue
+            # Only the set being written remains: trim its oldest entries
+            entries = self._sets[current]
+            entries.pop(next(iter(entries)))
+            self._size -= 1
+            self.evictions += 1
+
+    def __delitem__(self, key: AnswerKey) -> None:
+        with self._lock:
+            unpinned = self._unpin(key[0], key[1])
+            if not (self._drop(key[0], key[1]) or unpinned):
+                raise KeyError(key)
+
+    def pop(self, key: AnswerKey, *default: Any) -> Any:
+        """Remove and return an entry in one locked step, as dict.pop does."""
+        with self._lock:
+            try:
+                value = self._get(key)
+            except KeyError:
+                if default:
+                    return default[0]
+                raise
+            self._unpin(key[0], key[1])
+            self._drop(key[0], key[1])
+            return value
+
+    def __iter__(self) -> Iterator[AnswerKey]:
+        with self._lock:
+            keys = [(rs, q) for rs, qids in self._pinned.items() for q in qids]
+            keys.extend((rs, q) for rs, entries in self._sets.items() for q in entries)
+        return iter(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._size + sum(len(p) for p in self._pinned.values())
+
+    def pin(self, key: AnswerKey) -> None:
+        """Exempt a present entry from size/TTL eviction (sole copy of an answer)."""
+        rs_id, qid = key
+        with self._lock:
+            entries = self._sets.get(rs_id)
+            entry = entries.get(qid) if entries is not None else None
+            if entry is not None:
+                self._drop(rs_id, qid)
+                self._pinned.setdefault(rs_id, {})[qid] = entry
+
+    def evict_response_set(self, response_set_id: str) -> int:
+        """Drop every entry of one response set; return how many were dropped."""
+        rs_id = str(response_set_id)
+        with self._lock:
+            dropped = len(self._sets.pop(rs_id, {}))
+            self._size -= dropped
+            dropped += len(self._pinned.pop(rs_id, {}))
+            self.evictions += dropped
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+            self._pinned.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": self._size,
+                "response_sets": len(self._sets),
+                "pinned": sum(len(p) for p in self._pinned.values()),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
+
+
+# ---------------------------------------------------------------------------
+# SQL backend
+# ---------------------------------------------------------------------------
+
+
+class SqlVersions(MutableMapping):
+    """Version counters in `screen_state_version`, shared by all workers."""
+
+    def __getitem__(self, key: Tuple[str, str]) -> int:
+        with get_engine().connect() as conn:
+            row = conn.execute(
+                sql_text(
+                    "SELECT version FROM screen_state_version WHERE response_set_id = :rs AND screen_key = :sk"
+                ),
+                {"rs": str(key[0]), "sk": str(key[1])},
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return int(row[0])
+
+    def __setitem__(self, key: Tuple[str, str], value: int) -> None:
+        with get_engine().begin() as conn:
+            conn.execute(
+                sql_text(
+                    """
+                    INSERT INTO screen_state_version (response_set_id, screen_key, version)
+                    VALUES (:rs, :sk, :v)
+                    ON CONFLICT (response_set_id, screen_key) DO UPDATE SET version = :v
+                    """
+                ),
+                {"rs": str(key[0]), "sk": str(key[1]), "v": int(value)},
+            )
+
+    def __delitem__(self, key: Tuple[str, str]) -> None:
+        with get_engine().begin() as conn:
+            res = conn.execute(
+                sql_text(
+                    "DELETE FROM screen_state_version WHERE response_set_id = :rs AND screen_key = :sk"
+                ),
+                {"rs": str(key[0]), "sk": str(key[1])},
+            )
+        if not res.rowcount:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        with get_engine().connect() as conn:
+            rows = conn.execute(
+                sql_text("SELECT response_set_id, screen_key FROM screen_state_version")
+            ).fetchall()
+        return iter([(str(r[0]), str(r[1])) for r in rows])
+
+    def __len__(self) -> int:
+        with get_engine().connect() as conn:
+            return int(conn.execute(sql_text("SELECT COUNT(*) FROM screen_state_version")).scalar() or 0)
+
+    def increment(self, key: Tuple[str, str]) -> int:
+        """Atomically add one to a counter (creating it at 1) and return it."""
+        with get_engine().begin() as conn:
+            row = conn.execute(
+                sql_text(
+                    """
+                    INSERT INTO screen_state_version (response_set_id, screen_key, version)
+                    VALUES (:rs, :sk, 1)
+                    ON CONFLICT (response_set_id, screen_key)
+                    DO UPDATE SET version = screen_state_version.version + 1
+                    RETURNING version
+                    """
+                ),
+                {"rs": str(key[0]), "sk": str(key[1])},
+            ).fetchone()
+        return int(row[0])
+
+    def clear(self) -> None:
+        with get_engine().begin() as conn:
+            conn.execute(sql_text("DELETE FROM screen_state_version"))
+
+
+class SqlAnswers(MutableMapping):
+    """Answer cache in `screen_state_answer`, shared by all workers."""
+
+    def __getitem__(self, key: AnswerKey) -> AnswerTuple:
+        with get_engine().connect() as conn:
+            row = conn.execute(
+                sql_text(
+                    """
+                    SELECT option_id, value_text, value_number, value_bool
+                    FROM screen_state_answer
+                    WHERE response_set_id = :rs AND question_id = :qid
+                    """
+                ),
+                {"rs": str(key[0]), "qid": str(key[1])},
+            ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        opt, vtext, vnum, vbool = row
+        return (
+            str(opt) if opt is not None else None,
+            vtext,
+            float(vnum) if vnum is not None else None,
+            bool(vbool) if vbool is not None else None,
+        )
+
+    def __setitem__(self, key: AnswerKey, value: AnswerTuple) -> None:
+        opt, vtext, vnum, vbool = value
+        with get_engine().begin() as conn:
+            conn.execute(
+                sql_text(
+                    """
+                    INSERT INTO screen_state_answer (response_set_id, question_id, option_id, value_text, value_number, value_bool)
+                    VALUES (:rs, :qid, :opt, :vtext, :vnum, :vbool)
+                    ON CONFLICT (response_set_id, question_id)
+                    DO UPDATE SET option_id = :opt, value_text = :vtext, value_number = :vnum, value_bool = :vbool
+                    """
+                ),
+                {"rs": str(key[0]), "qid": str(key[1]), "opt": opt, "vtext": vtext, "vnum": vnum, "vbool": vbool},
+            )
+
+    def __delitem__(self, key: AnswerKey) -> None:
+        with get_engine().begin() as conn:
+            res = conn.execute(
+                sql_text(
+                    "DELETE FROM screen_state_answer WHERE response_set_id = :rs AND question_id = :qid"
+                ),
+                {"rs": str(key[0]), "qid": str(key[1])},
+            )
+        if not res.rowcount:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[AnswerKey]:
+        with get_engine().connect() as conn:
+            rows = conn.execute(
+                sql_text("SELECT response_set_id, question_id FROM screen_state_answer")
+            ).fetchall()
+        return iter([(str(r[0]), str(r[1])) for r in rows])
+
+    def __len__(self) -> int:
+        with get_engine().connect() as conn:
+            return int(conn.execute(sql_text("SELECT COUNT(*) FROM screen_state_answer")).scalar() or 0)
+
+    def evict_response_set(self, response_set_id: str) -> int:
+        with get_engine().begin() as conn:
+            res = conn.execute(
+                sql_text("DELETE FROM screen_state_answer WHERE response_set_id = :rs"),
+                {"rs": str(response_set_id)},
+            )
+        return int(res.rowcount or 0)
+
+    def clear(self) -> None:
+        with get_engine().begin() as conn:
+            conn.execute(sql_text("DELETE FROM screen_state_answer"))
+
+
+# ---------------------------------------------------------------------------
+# Local-socket backend (stand-in for an external cache service)
+# ---------------------------------------------------------------------------
+
+
+class _StateRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        server: "StateSocketServer" = self.server  # type: ignore[assignment]
+        for line in self.rfile:
+            try:
+                reply = {"ok": True, "value": server.dispatch(json.loads(line))}
+            except KeyError:
+                reply = {"ok": False, "error": "missing"}
+            except Exception as exc:  # report to the client, keep serving
+                logger.error("answer_state_socket_request_failed", exc_info=True)
+                reply = {"ok": False, "error": str(exc)}
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class StateSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Holds the shared mappings in one process and serves them over a Unix socket."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str) -> None:
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, _StateRequestHandler)
+        self._lock = threading.Lock()
+        self._stores: Dict[str, Dict[str, Any]] = {"versions": {}, "answers": {}}
+
+    def dispatch(self, req: Dict[str, Any]) -> Any:
+        op = req.get("op")
+        store = self._stores[str(req.get("ns"))]
+        key = "\x1f".join(str(k) for k in (req.get("key") or []))
+        with self._lock:
+            if op == "get":
+                return store[key]
+            if op == "set":
+                store[key] = req.get("value")
+                return None
+            if op == "del":
+                del store[key]
+                return None
+            if op == "incr":
+                store[key] = int(store.get(key, 0)) + 1
+                return store[key]
+            if op == "keys":
+                return [k.split("\x1f") for k in store]
+            if op == "clear":
+                store.clear()
+                return None
+        raise ValueError(f"unknown op {op!r}")
+
+
+class _SocketMapping(MutableMapping):
+    """Client-side mapping over one namespace of a `StateSocketServer`."""
+
+    def __init__(self, path: str, namespace: str) -> None:
+        self._path = path
+        self._ns = namespace
+        self._lock = threading.Lock()
+        self._sock: socket.socket | None = None
+        self._reader: Any = None
+
+    def _call(self, op: str, key: Any = None, value: Any = None) -> Any:
+        payload = json.dumps({"op": op, "ns": self._ns, "key": list(key) if key else None, "value": value})
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self._sock.connect(self._path)
+                        self._reader = self._sock.makefile("rb")
+                    self._sock.sendall(payload.encode("utf-8") + b"\n")
+                    reply = json.loads(self._reader.readline())
+                    break
+                except OSError:
+                    # Reconnect once on a dropped connection
+                    self._sock = None
+                    if attempt == 2:
+                        raise
+        if not reply.get("ok"):
+            if reply.get("error") == "missing":
+                raise KeyError(key)
+            raise RuntimeError(reply.get("error"))
+        return reply.get("value")
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._decode(self._call("get", key))
+
+    def __setitem__(self, key: Any, value: Any) -> None:
+        self._call("set", key, list(value) if isinstance(value, tuple) else value)
+
+    def __delitem__(self, key: Any) -> None:
+        self._call("del", key)
+
+    def __iter__(self) -> Iterator[Tuple[str, ...]]:
+        return iter([tuple(k) for k in self._call("keys")])
+
+    def __len__(self) -> int:
+        return len(self._call("keys"))
+
+    def clear(self) -> None:
+        self._call("clear")
+
+    @staticmethod
+    def _decode(value: Any) -> Any:
+        return tuple(value) if isinstance(value, list) else value
+
+
+class SocketVersions(_SocketMapping):
+    def __init__(self, path: str) -> None:
+        super().__init__(path, "versions")
+
+    def increment(self, key: Tuple[str, str]) -> int:
+        return int(self._call("incr", key))
+
+
+class SocketAnswers(_SocketMapping):
+    def __init__(self, path: str) -> None:
+        super().__init__(path, "answers")
+
+
+# ---------------------------------------------------------------------------
+# Selection
+# ---------------------------------------------------------------------------
+
+
+# Backend actually opened by `open_answer_state()`; stores are chosen once per
+# process, so later changes to ANSWER_STATE_BACKEND do not affect it.
+_OPENED_BACKEND: str | None = None
+
+
+def answer_state_backend_name() -> str:
+    return (os.getenv("ANSWER_STATE_BACKEND") or "memory").strip().lower()
+
+
+def is_shared_answer_state() -> bool:
+    """True when the opened versions/answers stores are shared with other workers."""
+    return _OPENED_BACKEND in {"sql", "socket"}
+
+
+def open_answer_state() -> tuple[MutableMapping, MutableMapping]:
+    """Return (answers, versions) stores for the configured backend.
+
+    Unknown backend names fall back to in-process stores with an error log.
+    The backend used is recorded for `is_shared_answer_state()`.
+    """
+    global _OPENED_BACKEND
+    name = answer_state_backend_name()
+    if name == "sql":
+        _OPENED_BACKEND = name
+        return SqlAnswers(), SqlVersions()
+    if name == "socket":
+        _OPENED_BACKEND = name
+        path = os.getenv("ANSWER_STATE_SOCKET") or "/tmp/answer-state.sock"
+        return SocketAnswers(path), SocketVersions(path)
+    if name != "memory":
+        logger.error("answer_state_backend_unknown name=%s; using in-process stores", name)
+    _OPENED_BACKEND = "memory"
+    try:
+        max_entries = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES") or 100_000)
+        ttl_seconds = float(os.getenv("ANSWER_CACHE_TTL_SECONDS") or 3600)
+    except ValueError:
+        logger.error("answer_cache_config_invalid; using defaults", exc_info=True)
+        max_entries, ttl_seconds = 100_000, 3600.0
+    return BoundedAnswerCache(max_entries, ttl_seconds), InProcessVersions()
+
+
+__all__ = [
+    "InProcessVersions",
+    "BoundedAnswerCache",
+    "SqlVersions",
+    "SqlAnswers",
+    "StateSocketServer",
+    "SocketVersions",
+    "SocketAnswers",
+    "answer_state_backend_name",
+    "is_shared_answer_state",
+    "open_answer_state",
+]
+
+
+if __name__ == "__main__":  # pragma: no cover - manual dev helper
+    _path = sys.argv[1] if len(sys.argv) > 1 else "/tmp/answer-state.sock"
+    logging.basicConfig(level=logging.INFO)
+    with StateSocketServer(_path) as _server:
+        logger.info("answer_state_socket_serving path=%s", _path)
+        _server.serve_forever()
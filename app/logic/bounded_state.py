@@ -0,0 +1,107 @@
+"""Bounded, expiring maps for per-response-set process state.
+
+Write generations, screen-state records and gating records are kept per
+response set for the life of the process; as plain dicts they grew with
+every response set ever touched. `BoundedStateMap` applies the answer
+cache's policy to them: least-recently-used entries are evicted past a size
+bound and entries older than a TTL read as misses. Every record held here
+can be rebuilt from the database, so losing one only costs a reseed.
+
+`RESPONSE_STATE_MAX_ENTRIES` (default 10000) and
+`RESPONSE_STATE_TTL_SECONDS` (default 3600) configure maps opened with
+`open_response_state_map`.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Hashable, Iterator, Tuple
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedStateMap(MutableMapping):
+    """Per-process map with a size bound and a TTL, holding values by reference.
+
+    Unlike the replay stores, values are live records that callers update in
+    place, so reads return the stored object rather than a copy. The TTL
+    runs from the last assignment. The request threadpool shares a map, so
+    every access to the entries holds a lock.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            expires_at, value = self._entries[key]
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.expirations += 1
+                raise KeyError(key)
+            self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            del self._entries[key]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            now = self._clock()
+            return iter([k for k, (exp, _) in self._entries.items() if exp > now])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]  # type: ignore[index]
+        except KeyError:
+            return False
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def open_response_state_map(name: str) -> BoundedStateMap:
+    """Return a bounded map configured from the RESPONSE_STATE_* settings."""
+    try:
+        max_entries = int(os.getenv("RESPONSE_STATE_MAX_ENTRIES") or 10_000)
+        ttl_seconds = float(os.getenv("RESPONSE_STATE_TTL_SECONDS") or 3600)
+    except ValueError:
+        logger.error("response_state_config_invalid; using defaults", exc_info=True)
+        max_entries, ttl_seconds = 10_000, 3600.0
+    return BoundedStateMap(name, max_entries, ttl_seconds)
+
+
+__all__ = ["BoundedStateMap", "open_response_state_map"]
@@ -7,14 +7,32 @@ CSV and exporting a stable snapshot. Export ordering is deterministic by
 
 from __future__ import annotations
 
+import atexit
 import csv
 import io
-from typing import Dict, Iterable, List, Tuple
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, Iterator, List, Mapping, NamedTuple, Tuple
 from uuid import uuid4
 
 from sqlalchemy import text as sql_text
 
 from app.db.base import get_engine
+from app.logic.csv_validation import ChunkResult, ImportRow, validate_chunk
+from app.logic.etag import compute_questionnaire_etag_for_authoring
+from app.logic.repository_screens import invalidate_visibility_rules_cache
+from app.logic.visibility_graph import invalidate_questionnaire_graph
+from app.logic.question_meta import invalidate_question_meta
+from app.logic.parent_index import invalidate_parent_index
+
+
+logger = logging.getLogger(__name__)
 
 
 HEADER = [
@@ -24,194 +42,411 @@ HEADER = [
 ]
 
 
-def build_export_csv(questionnaire_id: str, rows: Iterable[Dict[str, object]] | None = None) -> bytes:
+# Only the exported columns are read; ordering keys need not be selected
+_EXPORT_ROWS_SQL = sql_text(
+    """
+    SELECT q.question_id, q.question_text, q.answer_kind
+    FROM questionnaire_question q
+    JOIN screen s ON s.screen_key = q.screen_key
+    WHERE s.questionnaire_id = :qid
+    ORDER BY q.screen_key ASC, q.question_order ASC, q.question_id ASC
+    """
+)
+
+
+def iter_export_csv(questionnaire_id: str, rows: Iterable[Dict[str, object]] | None = None) -> Iterator[bytes]:
+    """Yield the export CSV as UTF-8 chunks: the header, then one chunk per row.
+
+    When ``rows`` is empty the questionnaire is read from the DB with one
+    ordered query and streamed row by row, so memory stays constant in the
+    number of questions. The query is issued before the header is yielded,
+    letting callers prime the generator to surface SQL errors up front.
+    """
     rows = list(rows or [])
-    # If no rows are provided, load from DB
-    if not rows:
-        eng = get_engine()
-        with eng.connect() as conn:
-            qrows = conn.execute(
-                sql_text(
-                    """
-                    SELECT q.question_id, q.external_qid, q.screen_key, q.question_order, q.question_text,
-                           q.answer_kind AS answer_kind, q.mandatory, q.placeholder_code
-                    FROM questionnaire_question q
-                    JOIN screen s ON s.screen_key = q.screen_key
-                    WHERE s.questionnaire_id = :qid
-                    ORDER BY q.screen_key ASC, q.question_order ASC, q.question_id ASC
-                    """
-                ),
-                {"qid": questionnaire_id},
-            ).mappings().all()
-            # Fetch options per question for enum_single
-            def _options_for(qid: str) -> str:
-                opt_rows = conn.execute(
-                    sql_text(
-                        "SELECT value, COALESCE(label, value) AS label FROM answer_option WHERE question_id = :qid ORDER BY sort_index ASC"
-                    ),
-                    {"qid": qid},
-                ).fetchall()
-                return "|".join(f"{r[0]}:{r[1]}" for r in opt_rows)
-        rows = [
-            {
-                "question_id": str(r["question_id"]),
-                "external_qid": r["external_qid"],
-                "screen_key": r["screen_key"],
-                "question_order": int(r["question_order"]),
-                "question_text": r["question_text"],
-                "answer_kind": r["answer_kind"],
-                "mandatory": bool(r["mandatory"]),
-                "placeholder_code": r["placeholder_code"] or "",
-                "options": _options_for(str(r["question_id"])) if r["answer_kind"] == "enum_single" else "",
-            }
-            for r in qrows
-        ]
-    rows.sort(key=lambda r: (str(r.get("screen_key")), int(r.get("question_order", 0)), str(r.get("question_id", ""))))
     buf = io.StringIO(newline="")
     # Force LF-only line endings for exact fixture byte parity
     writer = csv.DictWriter(buf, fieldnames=HEADER, lineterminator='\n')
-    writer.writeheader()
-    for r in rows:
-        writer.writerow({k: r.get(k, "") for k in HEADER})
-    return buf.getvalue().encode("utf-8")
 
+    def _take() -> bytes:
+        chunk = buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate(0)
+        return chunk
 
-def parse_import_csv(b: bytes) -> Dict[str, object]:
+    if rows:
+        rows.sort(key=lambda r: (str(r.get("screen_key")), int(r.get("question_order", 0)), str(r.get("question_id", ""))))
+        writer.writeheader()
+        yield _take()
+        for r in rows:
+            writer.writerow({k: r.get(k, "") for k in HEADER})
+            yield _take()
+        return
+
+    # If no rows are provided, stream from DB in the query's deterministic order
+    eng = get_engine()
+    with eng.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(
+            _EXPORT_ROWS_SQL, {"qid": questionnaire_id}
+        )
+        writer.writeheader()
+        yield _take()
+        for r in result:
+            writer.writerow({"question_id": str(r[0]), "question_text": r[1], "answer_kind": r[2]})
+            yield _take()
+
+
+def build_export_csv(questionnaire_id: str, rows: Iterable[Dict[str, object]] | None = None) -> bytes:
+    return b"".join(iter_export_csv(questionnaire_id, rows))
+
+
+# Rendered exports keyed by (questionnaire_id, content ETag). The ETag covers
+# screens and the exported question columns, so an entry can never be stale: an edit
+# yields a new key and the old artifact simply ages out of the LRU. The token
+# is read in its own transaction, so an artifact is only stored when the token
+# recomputed after streaming still matches it.
+_EXPORT_CACHE_MAX_ENTRIES = 16
+_EXPORT_CACHE: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+
+def get_cached_export(questionnaire_id: str, etag: str) -> bytes | None:
+    """Return the cached export bytes for this questionnaire state, if any."""
+    key = (str(questionnaire_id), str(etag))
+    data = _EXPORT_CACHE.get(key)
+    if data is not None:
+        _EXPORT_CACHE.move_to_end(key)
+    return data
+
+
+def iter_export_csv_cached(questionnaire_id: str, etag: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Pass export chunks through, storing the full artifact once exhausted.
+
+    Nothing is cached when the consumer stops early (client disconnect), so a
+    truncated body is never served from the cache. Nor is anything cached when
+    the questionnaire changed while streaming: the body may then belong to a
+    newer state than `etag`.
+    """
+    parts: List[bytes] = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    if compute_questionnaire_etag_for_authoring(questionnaire_id, include_questions=True) != etag:
+        logger.info("export_cache_skip_changed questionnaire_id=%s", questionnaire_id)
+        return
+    key = (str(questionnaire_id), str(etag))
+    _EXPORT_CACHE[key] = b"".join(parts)
+    _EXPORT_CACHE.move_to_end(key)
+    while len(_EXPORT_CACHE) > _EXPORT_CACHE_MAX_ENTRIES:
+        _EXPORT_CACHE.popitem(last=False)
+
+
+_UPDATE_QUESTION_SQL = sql_text(
+    """
+    UPDATE questionnaire_question
+    SET screen_id=:sid, screen_key=:skey, question_order=:ord, question_text=:qtext, answer_kind=:akind, mandatory=:mand, placeholder_code=:ph
+    WHERE question_id = :qid
+    """
+)
+
+_INSERT_QUESTION_SQL = sql_text(
+    """
+    INSERT INTO questionnaire_question (question_id, screen_id, screen_key, external_qid, question_order, question_text, answer_kind, mandatory, placeholder_code)
+    VALUES (:qid, :sid, :skey, :ext, :ord, :qtext, :akind, :mand, :ph)
+    """
+)
+
+_DELETE_OPTIONS_SQL = sql_text("DELETE FROM answer_option WHERE question_id = :qid")
+
+_UPSERT_OPTION_SQL = sql_text(
+    """
+    INSERT INTO answer_option (option_id, question_id, value, label, sort_index)
+    VALUES (:oid, :qid, :val, :lbl, :idx)
+    ON CONFLICT (question_id, value) DO UPDATE SET label=EXCLUDED.label, sort_index=EXCLUDED.sort_index
+    """
+)
+
+
+# Import pipeline tuning. Parallel validation is off by default (one worker):
+# on a 1-CPU host scripts/bench_csv_validate.py measured inline validation at
+# 0.58s per 100k rows against 1.54s on a warm 4-worker pool, and no multi-core
+# crossover has been measured yet. To enable it, set CSV_IMPORT_WORKERS > 1
+# and CSV_IMPORT_PARALLEL_MIN_ROWS to the smallest size where that benchmark
+# shows the pool winning on the target host.
+IMPORT_WORKERS = max(1, int(os.getenv("CSV_IMPORT_WORKERS", "1")))
+IMPORT_CHUNK_ROWS = max(1, int(os.getenv("CSV_IMPORT_CHUNK_ROWS", "5000")))
+IMPORT_PARALLEL_MIN_ROWS = max(1, int(os.getenv("CSV_IMPORT_PARALLEL_MIN_ROWS", "100000")))
+# Pool workers must not be forked from the server process: it already runs
+# threads (log listener, replay sweeper, answer-state server) whose locks a
+# forked child would inherit mid-acquire.
+IMPORT_START_METHOD = os.getenv("CSV_IMPORT_START_METHOD", "spawn")
+
+# One long-lived pool per process, created on first parallel import so worker
+# start-up is paid once rather than per file.
+_IMPORT_POOL: ProcessPoolExecutor | None = None
+_IMPORT_POOL_LOCK = threading.Lock()
+
+
+def _import_pool() -> ProcessPoolExecutor:
+    """Return the process-wide validation pool, creating it on first use."""
+    global _IMPORT_POOL
+    with _IMPORT_POOL_LOCK:
+        if _IMPORT_POOL is None:
+            _IMPORT_POOL = ProcessPoolExecutor(
+                max_workers=IMPORT_WORKERS,
+                mp_context=multiprocessing.get_context(IMPORT_START_METHOD),
+            )
+        return _IMPORT_POOL
+
+
+def shutdown_import_pool() -> None:
+    """Stop the validation pool's workers; the next parallel import starts a new one."""
+    global _IMPORT_POOL
+    with _IMPORT_POOL_LOCK:
+        pool, _IMPORT_POOL = _IMPORT_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+atexit.register(shutdown_import_pool)
+
+
+def _read_import_records(b: bytes) -> Tuple[List[str], List[List[str]]]:
+    """Return (fieldnames, records); blank records are dropped as DictReader does."""
     text = (b or b"").decode("utf-8")
     # Normalize escaped underscores in headers/body just in case
     text = text.replace("\\_", "_")
-    buf = io.StringIO(text)
-    reader = csv.DictReader(buf)
-    created = 0
-    updated = 0
-    errors: List[Dict[str, object]] = []
-    rows: List[Dict[str, str]] = []
-    seen_ext: Dict[str, int] = {}
+    reader = csv.reader(io.StringIO(text))
+    fieldnames = next(reader, [])
+    return fieldnames, [rec for rec in reader if rec]
+
+
+def _validate_records(fieldnames: List[str], records: List[List[str]]) -> List[ChunkResult]:
+    """Validate all records, on the process pool when enabled and the file is large enough.
+
+    Results come back in chunk order, so merged errors stay in line order.
+    """
+    first_line = 2  # header is line 1
+    if IMPORT_WORKERS <= 1 or len(records) < IMPORT_PARALLEL_MIN_ROWS:
+        return [validate_chunk(fieldnames, first_line, records)]
+    starts = range(0, len(records), IMPORT_CHUNK_ROWS)
+    try:
+        return list(
+            _import_pool().map(
+                validate_chunk,
+                [fieldnames] * len(starts),
+                [first_line + s for s in starts],
+                [records[s : s + IMPORT_CHUNK_ROWS] for s in starts],
+            )
+        )
+    except (OSError, BrokenProcessPool):
+        # No usable worker processes (e.g. restricted sandbox): validate inline
+        # and drop the pool so a later import can start a fresh one
+        logger.warning("csv_import_process_pool_unavailable rows=%s", len(records), exc_info=True)
+        shutdown_import_pool()
+        return [validate_chunk(fieldnames, first_line, records)]
+
+
+_IMPORT_SNAPSHOT_SQL = sql_text(
+    """
+    SELECT q.external_qid, q.question_id, q.screen_id, q.screen_key, q.question_order, q.question_text,
+           q.answer_kind, q.mandatory, q.placeholder_code, o.value AS option_value, o.label AS option_label
+    FROM questionnaire_question q
+    LEFT JOIN answer_option o ON o.question_id = q.question_id
+    WHERE q.external_qid IS NOT NULL
+    ORDER BY q.question_id ASC, o.sort_index ASC
+    """
+)
+
+
+class _ExistingQuestion(NamedTuple):
+    question_id: str
+    # (screen_id, screen_key, question_order, question_text, answer_kind, mandatory, placeholder_code)
+    columns: Tuple[object, ...]
+    options: Tuple[Tuple[str, str | None], ...]
+
+
+@dataclass
+class ImportPlan:
+    """Writes needed to bring the DB in line with a validated import.
+
+    Rows whose question columns and (for enum_single) options already match
+    the snapshot are counted in `noops` and produce no statements at all.
+    """
+
+    inserts: List[Dict[str, object]] = field(default_factory=list)
+    updates: List[Dict[str, object]] = field(default_factory=list)
+    option_clears: List[Dict[str, object]] = field(default_factory=list)
+    option_rows: List[Dict[str, object]] = field(default_factory=list)
+    # Existing questions matched by external_qid, changed or not (the `updated` count)
+    matched: int = 0
+    noops: int = 0
+
+    def summary(self) -> Dict[str, int]:
+        """Counts of planned changes plus a statement/row cost estimate."""
+        batches = [self.updates, self.inserts, self.option_clears, self.option_rows]
+        return {
+            "creates": len(self.inserts),
+            "updates": len(self.updates),
+            "option_replacements": len(self.option_clears),
+            "noops": self.noops,
+            "estimated_statements": sum(1 for b in batches if b),
+            "estimated_rows_written": sum(len(b) for b in batches),
+        }
+
+
+def _load_import_snapshot(conn) -> Tuple[Dict[str, _ExistingQuestion], Dict[str, str]]:
+    """Read existing questions (with options) keyed by external_qid, and screen ids by key."""
+    existing: Dict[str, _ExistingQuestion] = {}
+    cur_qid: str | None = None
+    cur_ext = ""
+    cur_cols: Tuple[object, ...] = ()
+    cur_opts: List[Tuple[str, str | None]] = []
+    for r in conn.execute(_IMPORT_SNAPSHOT_SQL).mappings():
+        qid = str(r["question_id"])
+        if qid != cur_qid:
+            if cur_qid is not None:
+                existing[cur_ext] = _ExistingQuestion(cur_qid, cur_cols, tuple(cur_opts))
+            cur_qid = qid
+            cur_ext = str(r["external_qid"])
+            cur_cols = (
+                None if r["screen_id"] is None else str(r["screen_id"]),
+                r["screen_key"],
+                int(r["question_order"] or 0),
+                r["question_text"],
+                r["answer_kind"],
+                bool(r["mandatory"]),
+                r["placeholder_code"],
+            )
+            cur_opts = []
+        if r["option_value"] is not None:
+            cur_opts.append((str(r["option_value"]), r["option_label"]))
+    if cur_qid is not None:
+        existing[cur_ext] = _ExistingQuestion(cur_qid, cur_cols, tuple(cur_opts))
+
+    screen_id_by_key: Dict[str, str] = {}
+    for r in conn.execute(sql_text("SELECT screen_key, screen_id FROM screen")).fetchall():
+        if r[0] is not None and r[1] is not None:
+            # First match wins, as the former per-row lookup did
+            screen_id_by_key.setdefault(str(r[0]), str(r[1]))
+    return existing, screen_id_by_key
+
+
+def plan_import_rows(
+    rows: Iterable[ImportRow],
+    existing: Mapping[str, _ExistingQuestion],
+    screen_id_by_key: Mapping[str, str],
+) -> ImportPlan:
+    """Diff validated rows against a snapshot; pure, performs no I/O."""
+    plan = ImportPlan()
+    for row in rows:
+        sid = screen_id_by_key.get(row.screen_key)
+        columns = (sid, row.screen_key, row.question_order, row.question_text, row.answer_kind, row.mandatory, row.placeholder_code)
+        params: Dict[str, object] = {
+            "sid": sid,
+            "skey": row.screen_key,
+            "ext": row.external_qid,
+            "ord": row.question_order,
+            "qtext": row.question_text,
+            "akind": row.answer_kind,
+            "mand": row.mandatory,
+            "ph": row.placeholder_code,
+        }
+        current = existing.get(row.external_qid)
+        if current is None:
+            question_id = str(uuid4())
+            plan.inserts.append({"qid": question_id, **params})
+        else:
+            question_id = current.question_id
+            plan.matched += 1
+            columns_changed = current.columns != columns
+            # Options are replaced wholesale for enum_single, and only when they differ
+            options_changed = row.answer_kind == "enum_single" and current.options != row.options
+            if not (columns_changed or options_changed):
+                plan.noops += 1
+                continue
+            if columns_changed:
+                # Keyed on the snapshot's question_id (primary key), not external_qid
+                plan.updates.append({"qid": question_id, **params})
+            if not options_changed:
+                continue
+            plan.option_clears.append({"qid": question_id})
+        for sort_index, (value, label) in enumerate(row.options, start=1):
+            plan.option_rows.append(
+                {"oid": str(uuid4()), "qid": question_id, "val": value, "lbl": label, "idx": sort_index}
+            )
+    return plan
+
+
+def _apply_import_plan(conn, plan: ImportPlan) -> None:
+    """Execute a plan with one executemany per statement kind."""
+    if plan.updates:
+        conn.execute(_UPDATE_QUESTION_SQL, plan.updates)
+    if plan.inserts:
+        conn.execute(_INSERT_QUESTION_SQL, plan.inserts)
+    if plan.option_clears:
+        conn.execute(_DELETE_OPTIONS_SQL, plan.option_clears)
+    if plan.option_rows:
+        conn.execute(_UPSERT_OPTION_SQL, plan.option_rows)
+
+
+def _validated_import_rows(b: bytes) -> Tuple[List[ImportRow] | None, List[Dict[str, object]]]:
+    """Parse and validate an import file into (rows, errors).
+
+    Rows are normalized and validated (in parallel chunks for large files)
+    and the per-chunk results merged with their original line numbers.
+    `rows` is None when the file has duplicate external_qids, which rejects
+    the whole import.
+    """
+    fieldnames, records = _read_import_records(b)
+    chunks = _validate_records(fieldnames, records)
+    errors: List[Dict[str, object]] = [e for c in chunks for e in c.missing_ext]
     ext_lines: Dict[str, List[int]] = {}
-    for i, row in enumerate(reader, start=2):  # header is line 1
-        ext = (row.get("external_qid") or "").strip()
-        if not ext:
-            errors.append({"line": i, "message": "missing external_qid"})
-        rows.append(row)  # preserve original row order for options sort_index
-        if ext:
-            seen_ext[ext] = seen_ext.get(ext, 0) + 1
-            ext_lines.setdefault(ext, []).append(i)
+    for c in chunks:
+        for ext, line_no in c.ext_lines:
+            ext_lines.setdefault(ext, []).append(line_no)
     # Reject duplicate external_qid within the same file
-    dup_exts = [ext for ext, cnt in seen_ext.items() if cnt > 1]
+    dup_exts = [ext for ext, lines in ext_lines.items() if len(lines) > 1]
     if dup_exts:
         for ext in dup_exts:
-            for ln in ext_lines.get(ext, []):
+            for ln in ext_lines[ext]:
                 errors.append({"line": ln, "message": f"duplicate external_qid in file: {ext}"})
+        return None, errors
+    errors.extend(e for c in chunks for e in c.invalid)
+    return [r for c in chunks for r in c.rows], errors
+
+
+def plan_import_csv(b: bytes) -> Dict[str, object]:
+    """Dry-run an import: report what `parse_import_csv` would change, without writing."""
+    rows, errors = _validated_import_rows(b)
+    if rows is None:
+        return {"created": 0, "updated": 0, "errors": errors, "plan": ImportPlan().summary()}
+    eng = get_engine()
+    with eng.connect() as conn:
+        existing, screen_id_by_key = _load_import_snapshot(conn)
+    plan = plan_import_rows(rows, existing, screen_id_by_key)
+    return {"created": len(plan.inserts), "updated": plan.matched, "errors": errors, "plan": plan.summary()}
+
+
+def parse_import_csv(b: bytes) -> Dict[str, object]:
+    """Import questionnaire questions (and enum options) keyed by external_qid.
+
+    Validated rows are planned against one snapshot of existing questions
+    and options inside the write transaction, then the plan is applied;
+    rows that already match the snapshot cause no writes.
+    """
+    rows, errors = _validated_import_rows(b)
+    if rows is None:
         return {"created": 0, "updated": 0, "errors": errors}
 
     eng = get_engine()
     with eng.begin() as conn:
-        for row in rows:
-            external_qid = (row.get("external_qid") or "").strip()
-            screen_key = (row.get("screen_key") or "").strip()
-            question_text = (row.get("question_text") or "").strip()
-            answer_kind = (row.get("answer_kind") or "").strip()
-            mandatory = str(row.get("mandatory") or "").strip().lower() in {"true", "1", "yes"}
-            order = int(str(row.get("question_order") or 0) or 0)
-            placeholder = (row.get("placeholder_code") or "").strip() or None
-            # Basic row validation: must have external_qid, question_text, answer_kind
-            if not (external_qid and question_text and answer_kind):
-                # Compute the original CSV line number for this row
-                # Note: rows list preserves order with header at line 1
-                idx = rows.index(row)
-                line_no = idx + 2  # offset for header
-                errors.append({"line": line_no, "message": f"invalid row for external_qid={external_qid or '?'}"})
-                continue
-            # Determine if question exists
-            existing = conn.execute(
-                sql_text("SELECT question_id FROM questionnaire_question WHERE external_qid = :ext"),
-                {"ext": external_qid},
-            ).fetchone()
-            # Resolve screen_id for the provided screen_key (required by schema)
-            sid_row = conn.execute(
-                sql_text("SELECT screen_id FROM screen WHERE screen_key = :skey"),
-                {"skey": screen_key},
-            ).fetchone()
-            screen_id_val = str(sid_row[0]) if sid_row and sid_row[0] is not None else None
-            if existing:
-                question_id = str(existing[0])
-                conn.execute(
-                    sql_text(
-                        """
-                        UPDATE questionnaire_question
-                        SET screen_id=:sid, screen_key=:skey, question_order=:ord, question_text=:qtext, answer_kind=:akind, mandatory=:mand, placeholder_code=:ph
-                        WHERE external_qid = :ext
-                        """
-                    ),
-                    {
-                        "sid": screen_id_val,
-                        "skey": screen_key,
-                        "ord": order,
-                        "qtext": question_text,
-                        "akind": answer_kind,
-                        "mand": mandatory,
-                        "ph": placeholder,
-                        "ext": external_qid,
-                    },
-                )
-                updated += 1
-                # Clear and repopulate options when enum_single
-                if answer_kind == "enum_single":
-                    conn.execute(
-                        sql_text("DELETE FROM answer_option WHERE question_id = :qid"),
-                        {"qid": question_id},
-                    )
-            else:
-                question_id = str(uuid4())
-                conn.execute(
-                    sql_text(
-                        """
-                        INSERT INTO questionnaire_question (question_id, screen_id, screen_key, external_qid, question_order, question_text, answer_kind, mandatory, placeholder_code)
-                        VALUES (:qid, :sid, :skey, :ext, :ord, :qtext, :akind, :mand, :ph)
-                        """
-                    ),
-                    {
-                        "qid": question_id,
-                        "sid": screen_id_val,
-                        "skey": screen_key,
-                        "ext": external_qid,
-                        "ord": order,
-                        "qtext": question_text,
-                        "akind": answer_kind,
-                        "mand": mandatory,
-                        "ph": placeholder,
-                    },
-                )
-                created += 1
-            # Insert options when enum_single
-            if answer_kind == "enum_single":
-                raw_options = (row.get("options") or "").strip()
-                if raw_options:
-                    parts = [part for part in raw_options.split("|") if part]
-                    sort_index = 1
-                    for part in parts:
-                        # Unescape escaped colon (\:) used in feature literals
-                        part = part.replace("\\:", ":")
-                        if ":" in part:
-                            value, label = part.split(":", 1)
-                        else:
-                            value, label = part, part
-                        conn.execute(
-                            sql_text(
-                                """
-                                INSERT INTO answer_option (option_id, question_id, value, label, sort_index)
-                                VALUES (:oid, :qid, :val, :lbl, :idx)
-                                ON CONFLICT (question_id, value) DO UPDATE SET label=EXCLUDED.label, sort_index=EXCLUDED.sort_index
-                                """
-                            ),
-                            {
-                                "oid": str(uuid4()),
-                                "qid": question_id,
-                                "val": value,
-                                "lbl": label,
-                                "idx": sort_index,
-                            },
-                        )
-                        sort_index += 1
-
-    return {"created": created, "updated": updated, "errors": errors}
+        existing, screen_id_by_key = _load_import_snapshot(conn)
+        plan = plan_import_rows(rows, existing, screen_id_by_key)
+        _apply_import_plan(conn, plan)
+    logger.info("csv_import_applied %s", plan.summary())
+
+    # Imported rows may move questions between screens; drop compiled rules
+    invalidate_visibility_rules_cache()
+    invalidate_questionnaire_graph()
+    invalidate_question_meta()
+    invalidate_parent_index()
+    return {"created": len(plan.inserts), "updated": plan.matched, "errors": errors}
@@ -0,0 +1,78 @@
+"""Row validation for questionnaire CSV imports.
+
+Pure CPU helpers that turn raw CSV records into normalized `ImportRow`s plus
+per-line errors. Import-pool workers unpickle `validate_chunk` from here, so
+this module imports only the standard library: a spawned worker then starts
+in milliseconds instead of loading the application.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, NamedTuple, Tuple
+
+
+class ImportRow(NamedTuple):
+    """One validated, normalized import row."""
+
+    line: int
+    external_qid: str
+    screen_key: str
+    question_order: int
+    question_text: str
+    answer_kind: str
+    mandatory: bool
+    placeholder_code: str | None
+    options: Tuple[Tuple[str, str], ...]
+
+
+class ChunkResult(NamedTuple):
+    rows: List[ImportRow]
+    ext_lines: List[Tuple[str, int]]
+    missing_ext: List[Dict[str, object]]
+    invalid: List[Dict[str, object]]
+
+
+def parse_options(raw_options: str) -> List[Tuple[str, str]]:
+    """Split a `value:label|value:label` cell into (value, label) pairs."""
+    out: List[Tuple[str, str]] = []
+    for part in (p for p in raw_options.split("|") if p):
+        # Unescape escaped colon (\:) used in feature literals
+        part = part.replace("\\:", ":")
+        if ":" in part:
+            value, label = part.split(":", 1)
+        else:
+            value, label = part, part
+        out.append((value, label))
+    return out
+
+
+def validate_chunk(fieldnames: List[str], first_line: int, records: List[List[str]]) -> ChunkResult:
+    """Normalize and validate a run of records starting at CSV line `first_line`."""
+    out = ChunkResult([], [], [], [])
+    for line_no, rec in enumerate(records, start=first_line):
+        row = dict(zip(fieldnames, rec))
+        external_qid = (row.get("external_qid") or "").strip()
+        if external_qid:
+            out.ext_lines.append((external_qid, line_no))
+        else:
+            out.missing_ext.append({"line": line_no, "message": "missing external_qid"})
+        screen_key = (row.get("screen_key") or "").strip()
+        question_text = (row.get("question_text") or "").strip()
+        answer_kind = (row.get("answer_kind") or "").strip()
+        mandatory = str(row.get("mandatory") or "").strip().lower() in {"true", "1", "yes"}
+        order = int(str(row.get("question_order") or 0) or 0)
+        placeholder = (row.get("placeholder_code") or "").strip() or None
+        # Basic row validation: must have external_qid, question_text, answer_kind
+        if not (external_qid and question_text and answer_kind):
+            out.invalid.append({"line": line_no, "message": f"invalid row for external_qid={external_qid or '?'}"})
+            continue
+        options: Tuple[Tuple[str, str], ...] = ()
+        if answer_kind == "enum_single":
+            options = tuple(parse_options((row.get("options") or "").strip()))
+        out.rows.append(
+            ImportRow(line_no, external_qid, screen_key, order, question_text, answer_kind, mandatory, placeholder, options)
+        )
+    return out
+
+
+__all__ = ["ImportRow", "ChunkResult", "parse_options", "validate_chunk"]
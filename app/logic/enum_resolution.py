@@ -1,14 +1,91 @@
 """Enum resolution helpers.
 
 Resolves enum_single submissions to a canonical option_id for a question.
+
+Options come from an in-memory index built per questionnaire from the
+question metadata cache: (question_id, value) -> option_id for resolution
+and option_id -> value for canonicalising option-only answers. An index is
+rebuilt when the metadata generation moves (authoring writes, CSV imports
+and metadata expiry) or when `invalidate_enum_index` drops it. An index miss
+is confirmed in SQL, since an import handled by another worker may have
+added the option; a hit there drops the questionnaire's metadata so the
+index rebuilds. Known options therefore resolve without SQL.
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Dict, NamedTuple, Tuple
+import logging
+
 from sqlalchemy import text as sql_text
 
 from app.db.base import get_engine
+from app.logic.question_meta import (
+    get_question_meta,
+    get_questionnaire_meta,
+    invalidate_question_meta,
+    question_meta_generation,
+)
+
+logger = logging.getLogger(__name__)
+
+_OPTION_BY_VALUE_SQL = sql_text(
+    "SELECT option_id FROM answer_option WHERE question_id = :qid AND value = :val LIMIT 1"
+)
+_OPTION_VALUE_SQL = sql_text(
+    "SELECT value FROM answer_option WHERE question_id = :qid AND option_id = :oid LIMIT 1"
+)
+
+
+class _OptionIndex(NamedTuple):
+    generation: int
+    by_value: Dict[Tuple[str, str], str]
+    by_option: Dict[Tuple[str, str], str]
+
+
+# questionnaire_id -> option index built under a metadata generation
+_INDEXES: Dict[str, _OptionIndex] = {}
+# question_id -> questionnaire_id for every indexed question
+_INDEXED_QUESTIONS: Dict[str, str] = {}
+
+
+def invalidate_enum_index(question_id: str | None = None) -> None:
+    """Drop the option index holding a question, or all indexes when None.
+
+    Called when a question's options or model change outside the authoring
+    paths that already invalidate question metadata (placeholder binding).
+    """
+    if question_id is None:
+        _INDEXES.clear()
+        _INDEXED_QUESTIONS.clear()
+        return
+    qn = _INDEXED_QUESTIONS.get(str(question_id))
+    if qn is not None:
+        _INDEXES.pop(qn, None)
+
+
+def _index_for(questionnaire_id: str) -> _OptionIndex:
+    generation = question_meta_generation()
+    index = _INDEXES.get(questionnaire_id)
+    if index is not None and index.generation == generation:
+        return index
+    by_value: Dict[Tuple[str, str], str] = {}
+    by_option: Dict[Tuple[str, str], str] = {}
+    for qid, meta in get_questionnaire_meta(questionnaire_id).items():
+        _INDEXED_QUESTIONS[qid] = questionnaire_id
+        for option_id, value in meta.options:
+            # First option wins for duplicate values, as the LIMIT 1 probe did
+            by_value.setdefault((qid, value), option_id)
+            by_option[(qid, option_id)] = value
+    index = _OptionIndex(generation, by_value, by_option)
+    _INDEXES[questionnaire_id] = index
+    return index
+
+
+def _index_stale(questionnaire_id: str, question_id: str) -> None:
+    """Drop metadata (and so the option index) that missed an option SQL has."""
+    logger.info("enum_index_stale questionnaire_id=%s q_id=%s", questionnaire_id, question_id)
+    invalidate_question_meta(questionnaire_id)
 
 
 def resolve_enum_option(question_id: str, *, option_id: str | None = None, value_token: str | None = None) -> str | None:
@@ -21,16 +98,45 @@ def resolve_enum_option(question_id: str, *, option_id: str | None = None, value
         return option_id
     if not value_token:
         return None
+    qid = str(question_id)
+    try:
+        meta = get_question_meta(qid)
+    except Exception:
+        logger.error("enum_index_meta_failed q_id=%s", qid, exc_info=True)
+        meta = None
+    if meta is not None:
+        option_id = _index_for(meta.questionnaire_id).by_value.get((qid, str(value_token)))
+        if option_id is not None:
+            return option_id
     eng = get_engine()
     with eng.connect() as conn:
-        row = conn.execute(
-            sql_text(
-                "SELECT option_id FROM answer_option WHERE question_id = :qid AND value = :val LIMIT 1"
-            ),
-            {"qid": question_id, "val": value_token},
-        ).fetchone()
+        row = conn.execute(_OPTION_BY_VALUE_SQL, {"qid": qid, "val": value_token}).fetchone()
+    if row and meta is not None:
+        _index_stale(meta.questionnaire_id, qid)
     return str(row[0]) if row else None
 
 
-__all__ = ["resolve_enum_option"]
+def enum_option_value(question_id: str, option_id: str) -> str | None:
+    """Return the value token of an option (reverse of `resolve_enum_option`).
+
+    Lets option-only enum answers carry the same canonical value as answers
+    submitted by token, so visibility rules on enum parents compare equal.
+    """
+    qid = str(question_id)
+    try:
+        meta = get_question_meta(qid)
+        if meta is not None:
+            value = _index_for(meta.questionnaire_id).by_option.get((qid, str(option_id)))
+            if value is not None:
+                return value
+        with get_engine().connect() as conn:
+            row = conn.execute(_OPTION_VALUE_SQL, {"qid": qid, "oid": str(option_id)}).fetchone()
+        if row and meta is not None:
+            _index_stale(meta.questionnaire_id, qid)
+    except Exception:
+        logger.error("enum_option_value_failed q_id=%s option_id=%s", qid, option_id, exc_info=True)
+        return None
+    return str(row[0]) if row else None
+
 
+__all__ = ["resolve_enum_option", "enum_option_value", "invalidate_enum_index"]
@@ -10,11 +10,13 @@ import hashlib
 from sqlalchemy import text as sql_text
 import logging
 
-from app.logic.repository_screens import get_visibility_rules_for_screen
 from app.db.base import get_engine
-from app.logic.repository_answers import get_existing_answer, get_screen_version
-from app.logic.answer_canonical import canonicalize_answer_value
-from app.logic.visibility_rules import compute_visible_set
+from app.logic.repository_answers import (
+    ScreenSnapshot,
+    get_screen_version,
+    load_screen_snapshot,
+)
+from app.logic.screen_state import get_screen_state, screen_etag_token
 
 # Lock the public API surface for Phase-0 baseline
 __all__ = [
@@ -58,42 +60,61 @@ def compute_authoring_question_etag(question_id: str, question_text: str, order:
     token = f"{question_id}|{question_text}|{int(order)}".encode("utf-8")
     return f'W/"{hashlib.sha1(token).hexdigest()}"'
 
-def compute_screen_etag(response_set_id: str, screen_key: str) -> str:
+def compute_screen_etag(
+    response_set_id: str,
+    screen_key: str,
+    *,
+    snapshot: ScreenSnapshot | None = None,
+) -> str:
     """Compute a weak ETag for a screen within a response set.
 
     Deterministic across identical state and stable between GET→PATCH precheck.
     Incorporates both a per-(response_set, screen) monotonic version AND a
     stable fingerprint of the currently visible question_id set so that ETag
-    changes when visibility changes.
+    changes when visibility changes. Reuses the caller's `ScreenSnapshot`
+    when given so screen assembly and ETag share one read. Without a
+    snapshot, the maintained per-screen state record answers in O(1); only a
+    screen with no record (or a stale version) is loaded and hashed.
     """
+    if snapshot is None:
+        state = get_screen_state(response_set_id, screen_key)
+        if state is not None and state.version == get_screen_version(response_set_id, screen_key):
+            return state.etag
+        try:
+            snapshot = load_screen_snapshot(response_set_id, screen_key)
+        except Exception:
+            logger.error(
+                "compute_screen_etag snapshot load failed response_set_id=%s screen_key=%s",
+                response_set_id,
+                screen_key,
+                exc_info=True,
+            )
+    return _screen_etag_from_snapshot(response_set_id, screen_key, snapshot)
+
+
+def _screen_etag_from_snapshot(
+    response_set_id: str, screen_key: str, snapshot: ScreenSnapshot | None
+) -> str:
     # Version component (in-memory first for read-your-writes)
-    try:
-        version = int(get_screen_version(response_set_id, screen_key))
-    except Exception:
-        logger.error(
-            "compute_screen_etag version compute failed response_set_id=%s screen_key=%s",
-            response_set_id,
-            screen_key,
-            exc_info=True,
-        )
-        version = 0
+    if snapshot is not None:
+        version = int(snapshot.version)
+    else:
+        try:
+            version = int(get_screen_version(response_set_id, screen_key))
+        except Exception:
+            logger.error(
+                "compute_screen_etag version compute failed response_set_id=%s screen_key=%s",
+                response_set_id,
+                screen_key,
+                exc_info=True,
+            )
+            version = 0
 
     # Visibility fingerprint component (rules + parent values -> visible set)
     try:
-        rules = get_visibility_rules_for_screen(screen_key)
-        # Collect parent ids as strings
-        parents = {str(p) for (p, _vis) in rules.values() if p is not None}
-        parent_values: dict[str, str | None] = {}
-        for pid in parents:
-            row = get_existing_answer(response_set_id, pid)
-            if row is None:
-                parent_values[pid] = None
-            else:
-                _opt, vtext, vnum, vbool = row
-                cv = canonicalize_answer_value(vtext, vnum, vbool)
-                parent_values[pid] = (str(cv) if cv is not None else None)
-        visible_ids = sorted(str(x) for x in compute_visible_set(rules, parent_values))
-        vis_fp = hashlib.sha1("\n".join(visible_ids).encode("utf-8")).hexdigest()
+        if snapshot is None:
+            raise LookupError("screen snapshot unavailable")
+        return screen_etag_token(response_set_id, screen_key, version, snapshot.visible_ids)
     except Exception:
         logger.error(
             "compute_screen_etag visibility fingerprint failed response_set_id=%s screen_key=%s",
@@ -101,10 +122,8 @@ def compute_screen_etag(response_set_id: str, screen_key: str) -> str:
             screen_key,
             exc_info=True,
         )
-        # Conservative fallback when rules/answers unavailable
-        vis_fp = "none"
-
-    token = f"{response_set_id}:{screen_key}:v{version}|vis:{vis_fp}".encode("utf-8")
+    # Conservative fallback when rules/answers unavailable
+    token = f"{response_set_id}:{screen_key}:v{version}|vis:none".encode("utf-8")
     digest = hashlib.sha1(token).hexdigest()
     etag = f'W/"{digest}"'
     return etag  # deterministic across identical state
@@ -135,12 +154,27 @@ def compute_document_list_etag(docs: list[dict]) -> str:
     return hashlib.sha1(b"\n".join(parts)).hexdigest()
 
 
-def compute_questionnaire_etag_for_authoring(questionnaire_id: str) -> str:
+_QUESTIONNAIRE_CONTENT_SQL = sql_text(
+    """
+    SELECT q.question_id, q.question_text, q.answer_kind
+    FROM questionnaire_question q
+    JOIN screen s ON s.screen_key = q.screen_key
+    WHERE s.questionnaire_id = :qid
+    ORDER BY q.screen_key ASC, q.question_order ASC, q.question_id ASC
+    """
+)
+
+
+def compute_questionnaire_etag_for_authoring(questionnaire_id: str, *, include_questions: bool = False) -> str:
     """Compute a weak ETag over the questionnaire's authoring state (screens).
 
     The digest is derived from the ordered set of (screen_key, title, screen_order)
     for all screens within the questionnaire, ordered by screen_order ascending
     and then screen_key for stability. Returns a weak ETag string (W/"<hex>").
+
+    With ``include_questions`` the digest also covers the exported question
+    columns in export order, so it changes exactly when the CSV export would;
+    the export endpoint uses this form for conditional GET.
     """
     try:
         eng = get_engine()
@@ -160,6 +194,13 @@ def compute_questionnaire_etag_for_authoring(questionnaire_id: str) -> str:
                 ),
                 {"qid": questionnaire_id},
             ).fetchall()
+            content_digest = None
+            if include_questions:
+                hasher = hashlib.sha1()
+                for q in conn.execute(_QUESTIONNAIRE_CONTENT_SQL, {"qid": questionnaire_id}):
+                    hasher.update("\x1f".join("" if v is None else str(v) for v in q).encode("utf-8"))
+                    hasher.update(b"\n")
+                content_digest = hasher.hexdigest()
     except Exception:
         logger.error(
             "compute_questionnaire_etag_for_authoring DB read failed qid=%s",
@@ -167,6 +208,7 @@ def compute_questionnaire_etag_for_authoring(questionnaire_id: str) -> str:
             exc_info=True,
         )
         rows = []
+        content_digest = None
 
     if not rows:
         digest = hashlib.sha1(b"empty").hexdigest()
@@ -187,6 +229,8 @@ def compute_questionnaire_etag_for_authoring(questionnaire_id: str) -> str:
                 order_val = 0
         token = f"{skey}|{title}|{order_val}".encode("utf-8")
         parts.append(token)
+    if content_digest is not None:
+        parts.append(f"questions|{content_digest}".encode("utf-8"))
     digest = hashlib.sha1(b"\n".join(parts)).hexdigest()
     return f'W/"{digest}"'
 
@@ -6,7 +6,7 @@ save and delete flows.
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,11 +20,29 @@ ETAG_EMIT = "etag.emit"
 def publish(event_type: str, payload: Dict[str, Any]) -> None:  # pragma: no cover - side-effect only
     """Publish a domain event.
 
-    In this minimal implementation, we log the event for observability.
+    In this minimal implementation, we log the event for observability and
+    call any in-process subscribers; a failing subscriber is logged and does
+    not affect the publisher or other subscribers.
     """
     logger.info("event_publish type=%s payload=%s", event_type, payload)
     # Buffer events in-memory for test observation
     EVENT_BUFFER.append({"type": event_type, "payload": payload})
+    for handler in list(_SUBSCRIBERS.get(event_type, ())):
+        try:
+            handler(payload)
+        except Exception:
+            logger.error("event_subscriber_failed type=%s handler=%r", event_type, handler, exc_info=True)
+
+
+# In-process subscribers per event type (cache eviction and similar hooks)
+_SUBSCRIBERS: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+
+
+def subscribe(event_type: str, handler: Callable[[Dict[str, Any]], None]) -> None:
+    """Register `handler(payload)` to run on each publish of `event_type`."""
+    handlers = _SUBSCRIBERS.setdefault(event_type, [])
+    if handler not in handlers:
+        handlers.append(handler)
 
 
 # In-memory buffer for domain events (test-only visibility)
@@ -44,6 +62,7 @@ __all__ = [
     "ETAG_ENFORCE",
     "ETAG_EMIT",
     "publish",
+    "subscribe",
     "get_buffered_events",
     "EVENT_BUFFER",
 ]
@@ -3,65 +3,164 @@
 Computes a basic gating verdict with the shape `{ ok: bool, blocking_items: [] }`.
 The actual checklist aggregation is handled by upstream repositories; this module
 only performs boolean derivation.
+
+Gating is scoped to the response set's questionnaire: the checklist's
+`questionnaire_id` when given, else the questionnaires of its answered
+questions (response sets carry no questionnaire column). Each questionnaire's
+mandatory set is precomputed from the question metadata cache, and the
+missing-mandatory set per response set is seeded once from its answered
+question_ids and then maintained by answer writes (`gating_state`), so a
+check with nothing missing needs no query. With a shared answer state
+backend that state cannot see other workers' writes, so every check reads
+the answered question_ids (one query) and diffs them against the
+precomputed mandatory set instead. Missing questions currently hidden
+by visibility rules do not block. A response set with no answers and no
+explicit questionnaire falls back to the unscoped mandatory scan.
 """
 
 from __future__ import annotations
 
-from typing import Any, Dict, List
+from typing import Any, Dict, FrozenSet, List, Sequence, Tuple
 import logging
 from sqlalchemy import text as sql_text
 
 from app.db.base import get_engine
+from app.logic.gating_state import GatingState, gating_write_count, get_gating_state, record_gating_state
+from app.logic.question_meta import get_questionnaire_meta, get_questions_meta, question_meta_generation
+from app.logic.visibility_graph import visible_questions
+
+logger = logging.getLogger(__name__)
+
+_MISSING_MANDATORY_SQL = sql_text(
+    """
+    SELECT q.question_id
+    FROM questionnaire_question q
+    WHERE q.mandatory = TRUE
+      AND NOT EXISTS (
+        SELECT 1 FROM response r WHERE r.response_set_id = :rs AND r.question_id = q.question_id
+      )
+    ORDER BY q.question_id ASC
+    """
+)
+
+_TOTAL_MANDATORY_SQL = sql_text("SELECT COUNT(*) FROM questionnaire_question WHERE mandatory = TRUE")
+
+_ANSWERED_QUESTIONS_SQL = sql_text("SELECT question_id FROM response WHERE response_set_id = :rs")
+
+# questionnaire_id -> (metadata generation, mandatory question_ids, all question_ids)
+_QUESTIONNAIRE_SETS: Dict[str, Tuple[int, FrozenSet[str], FrozenSet[str]]] = {}
+
+
+def _questionnaire_sets(questionnaire_id: str) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """Return (mandatory, all) question_ids of a questionnaire, built once per generation."""
+    generation = question_meta_generation()
+    cached = _QUESTIONNAIRE_SETS.get(questionnaire_id)
+    if cached is not None and cached[0] == generation:
+        return cached[1], cached[2]
+    metas = get_questionnaire_meta(questionnaire_id)
+    mandatory = frozenset(qid for qid, meta in metas.items() if meta.mandatory)
+    questions = frozenset(metas)
+    _QUESTIONNAIRE_SETS[questionnaire_id] = (generation, mandatory, questions)
+    return mandatory, questions
+
+
+def _current_state(rs_id: str, checklist: Dict[str, Any]) -> GatingState | None:
+    """Return the maintained state when it matches the requested scope."""
+    state = get_gating_state(rs_id)
+    explicit = checklist.get("questionnaire_id")
+    if state is not None and explicit and state.questionnaire_ids != {str(explicit)}:
+        return None
+    return state
+
+
+def _seed_state(
+    rs_id: str, checklist: Dict[str, Any], rows: Sequence[Sequence[Any]], write_count: int
+) -> GatingState | None:
+    """Seed gating state from answered question_ids; None when no scope is known."""
+    answered = {str(row[0]) for row in rows}
+    generation = question_meta_generation()
+    explicit = checklist.get("questionnaire_id")
+    if explicit:
+        scope = {str(explicit)}
+    else:
+        scope = {meta.questionnaire_id for meta in get_questions_meta(answered).values()}
+    if not scope:
+        return None
+    mandatory: FrozenSet[str] = frozenset()
+    questions: FrozenSet[str] = frozenset()
+    for qn in scope:
+        qn_mandatory, qn_questions = _questionnaire_sets(qn)
+        # Single-questionnaire scopes share the precomputed sets
+        mandatory = qn_mandatory if not mandatory else mandatory | qn_mandatory
+        questions = qn_questions if not questions else questions | qn_questions
+    logger.info(
+        "gating_state_seeded rs_id=%s questionnaires=%s mandatory=%s", rs_id, sorted(scope), len(mandatory)
+    )
+    return record_gating_state(
+        rs_id, scope, generation, mandatory, questions, answered, write_count=write_count
+    )
+
+
+def _blocking_ids(rs_id: str, state: GatingState) -> List[str]:
+    """Missing mandatory question_ids that are currently visible, sorted."""
+    missing = set(state.missing)
+    if not missing:
+        return []
+    try:
+        missing &= visible_questions(rs_id, missing)
+    except Exception:
+        # Without visibility, every missing mandatory question blocks
+        logger.error("gating_visibility_failed rs_id=%s", rs_id, exc_info=True)
+    return sorted(missing)
+
+
+def _verdict(rs_id: str, rows: Sequence[Sequence[Any]], total_mand: int | None) -> Dict[str, Any]:
+    # Include a reason for each blocking item to satisfy schema/contract
+    missing_ids = [str(row[0]) for row in rows]
+    items: List[Dict[str, Any]] = [
+        {"question_id": mid, "reason": "missing_required_answer"}
+        for mid in missing_ids
+    ]
+    logger.info(
+        "gating_verdict rs_id=%s missing=%s total_mandatory=%s",
+        rs_id,
+        missing_ids,
+        total_mand,
+    )
+    return {"ok": len(items) == 0, "blocking_items": items}
+
+
+def _state_verdict(rs_id: str, state: GatingState) -> Dict[str, Any]:
+    return _verdict(rs_id, [(qid,) for qid in _blocking_ids(rs_id, state)], len(state.mandatory))
 
 
 def evaluate_gating(checklist: Dict[str, Any]) -> Dict[str, Any]:
-    """Compute gating verdict using DB-backed mandatory checks.
+    """Compute gating verdict for the response set's questionnaire.
 
-    A question is considered blocking if it is marked mandatory and the
-    response_set has no response row for it.
+    A question is considered blocking if it is marked mandatory, visible,
+    and the response_set has no response row for it.
     """
     rs_id = str(checklist.get("response_set_id") or "")
-    logger = logging.getLogger(__name__)
     logger.info("gating_check_start rs_id=%s", rs_id)
-    items: List[Dict[str, Any]] = []
+    rows: Sequence[Sequence[Any]] = []
+    total_mand: int | None = None
     if rs_id:
+        state = _current_state(rs_id, checklist)
         eng = get_engine()
+        if state is None:
+            write_count = gating_write_count(rs_id)
+            with eng.connect() as conn:
+                # Log SQL parameters for traceability
+                logger.info("gating_sql_params rs_id=%s", rs_id)
+                answered = conn.execute(_ANSWERED_QUESTIONS_SQL, {"rs": rs_id}).fetchall()
+            state = _seed_state(rs_id, checklist, answered, write_count)
+        if state is not None:
+            return _state_verdict(rs_id, state)
         with eng.connect() as conn:
-            # Log SQL parameters for traceability
-            logger.info("gating_sql_params rs_id=%s", rs_id)
-            rows = conn.execute(
-                sql_text(
-                    """
-                    SELECT q.question_id
-                    FROM questionnaire_question q
-                    WHERE q.mandatory = TRUE
-                      AND NOT EXISTS (
-                        SELECT 1 FROM response r WHERE r.response_set_id = :rs AND r.question_id = q.question_id
-                      )
-                    ORDER BY q.question_id ASC
-                    """
-                ),
-                {"rs": rs_id},
-            ).fetchall()
+            rows = conn.execute(_MISSING_MANDATORY_SQL, {"rs": rs_id}).fetchall()
             # Optionally capture the number of mandatory questions for coarse diagnostics
             try:
-                total_mand = conn.execute(
-                    sql_text("SELECT COUNT(*) FROM questionnaire_question WHERE mandatory = TRUE")
-                ).fetchone()[0]
+                total_mand = conn.execute(_TOTAL_MANDATORY_SQL).fetchone()[0]
             except Exception:
                 logger.error("gating_total_mandatory_count_failed rs_id=%s", rs_id, exc_info=True)
-                total_mand = None
-        # Include a reason for each blocking item to satisfy schema/contract
-        missing_ids = [str(row[0]) for row in rows]
-        items = [
-            {"question_id": mid, "reason": "missing_required_answer"}
-            for mid in missing_ids
-        ]
-    ok = len(items) == 0
-    logger.info(
-        "gating_verdict rs_id=%s missing=%s total_mandatory=%s",
-        rs_id,
-        missing_ids,
-        total_mand if 'total_mand' in locals() else None,
-    )
-    return {"ok": ok, "blocking_items": items}
+    return _verdict(rs_id, rows, total_mand)
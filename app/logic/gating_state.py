@@ -0,0 +1,160 @@
+"""Maintained per-response-set missing-mandatory state for O(1) gating checks.
+
+Each record holds the questionnaires a response set is scoped to, their
+precomputed mandatory and question sets, and the mandatory questions still
+unanswered. Records are seeded by the first gating check for a response set
+and then kept current by answer writes: an upsert removes its question from
+the missing set and a delete or clear puts a mandatory question back. A
+record is stale once the question metadata generation moves (authoring
+writes, imports) and is reseeded by the next check.
+
+Records only see this process's writes, so they are kept and trusted only
+with the per-process answer state backend. With a shared backend other
+workers write answers too, and gating reads the answered set from the DB on
+every check instead. Writes are recorded only after the DB commit, so a
+record never counts an answer that exists only in the in-memory fallback.
+Records and write stamps are bounded like the answer cache (see
+`app.logic.bounded_state`); an evicted record is reseeded by the next check.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, MutableMapping, Optional
+import itertools
+import logging
+
+from app.logic.answer_state_backend import is_shared_answer_state
+from app.logic.bounded_state import open_response_state_map
+from app.logic.question_meta import get_question_meta, question_meta_generation
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class GatingState:
+    questionnaire_ids: frozenset
+    generation: int
+    mandatory: frozenset
+    questions: frozenset
+    missing: set
+
+
+# Process-wide records keyed by response_set_id
+_GATING_STATES: MutableMapping[str, GatingState] = open_response_state_map("gating_states")
+# response_set_id -> stamp of the last answer write, so a seed racing a write
+# is not kept. Stamps come from one process-wide sequence, so an evicted
+# response set written again never matches a stamp read before the eviction.
+_WRITE_COUNTS: MutableMapping[str, int] = open_response_state_map("gating_write_stamps")
+_WRITE_SEQUENCE = itertools.count(1)
+
+
+def gating_write_count(response_set_id: str) -> int:
+    """Return the last answer write stamp for a response set (seed race guard)."""
+    return _WRITE_COUNTS.get(str(response_set_id), 0)
+
+
+def record_gating_state(
+    response_set_id: str,
+    questionnaire_ids: Iterable[str],
+    generation: int,
+    mandatory: frozenset,
+    questions: frozenset,
+    answered: Iterable[str],
+    *,
+    write_count: int,
+) -> GatingState:
+    """Seed the record for a response set from its answered question_ids.
+
+    `write_count` is `gating_write_count` read before the answers were
+    loaded; when a write landed since, or when answers are shared with
+    other workers, the state is returned but not kept.
+    """
+    rs_id = str(response_set_id)
+    state = GatingState(
+        questionnaire_ids=frozenset(str(q) for q in questionnaire_ids),
+        generation=int(generation),
+        mandatory=mandatory,
+        questions=questions,
+        missing=set(mandatory) - {str(q) for q in answered},
+    )
+    if _WRITE_COUNTS.get(rs_id, 0) == write_count and not is_shared_answer_state():
+        _GATING_STATES[rs_id] = state
+    return state
+
+
+def get_gating_state(response_set_id: str) -> Optional[GatingState]:
+    """Return the record for a response set when current with question metadata.
+
+    Always None with a shared answer state backend, where other workers'
+    writes never reach this process's records.
+    """
+    if is_shared_answer_state():
+        return None
+    state = _GATING_STATES.get(str(response_set_id))
+    if state is None or state.generation != question_meta_generation():
+        return None
+    return state
+
+
+def _in_scope(rs_id: str, state: GatingState, question_id: str) -> bool:
+    if question_id in state.questions:
+        return True
+    try:
+        meta = get_question_meta(question_id)
+    except Exception:
+        logger.error("gating_state_scope_lookup_failed rs_id=%s q_id=%s", rs_id, question_id, exc_info=True)
+        meta = None
+    if meta is None:
+        # Questions outside any questionnaire never gate
+        return True
+    # Answering another questionnaire widens the scope; reseed on next check
+    _GATING_STATES.pop(rs_id, None)
+    return False
+
+
+def mark_answered(response_set_id: str, question_ids: Iterable[str]) -> None:
+    """Remove answered questions from the response set's missing set."""
+    rs_id = str(response_set_id)
+    _WRITE_COUNTS[rs_id] = next(_WRITE_SEQUENCE)
+    state = _GATING_STATES.get(rs_id)
+    if state is None:
+        return
+    for qid in map(str, question_ids):
+        if not _in_scope(rs_id, state, qid):
+            return
+        state.missing.discard(qid)
+
+
+def mark_cleared(response_set_id: str, question_ids: Iterable[str]) -> None:
+    """Return cleared mandatory questions to the response set's missing set."""
+    rs_id = str(response_set_id)
+    _WRITE_COUNTS[rs_id] = next(_WRITE_SEQUENCE)
+    state = _GATING_STATES.get(rs_id)
+    if state is None:
+        return
+    for qid in map(str, question_ids):
+        if qid in state.mandatory:
+            state.missing.add(qid)
+
+
+def invalidate_gating_states(response_set_id: str | None = None) -> None:
+    """Drop the record for one response set, or all records when None."""
+    if response_set_id is None:
+        _GATING_STATES.clear()
+        _WRITE_COUNTS.clear()
+        return
+    rs_id = str(response_set_id)
+    _GATING_STATES.pop(rs_id, None)
+    _WRITE_COUNTS.pop(rs_id, None)
+
+
+__all__ = [
+    "GatingState",
+    "gating_write_count",
+    "record_gating_state",
+    "get_gating_state",
+    "mark_answered",
+    "mark_cleared",
+    "invalidate_gating_states",
+]
@@ -7,8 +7,11 @@ duplicated globals across modules and supports explicit dependency injection.
 
 from __future__ import annotations
 
+from collections.abc import MutableMapping
 from typing import Dict
 
+from app.logic.replay_store import open_replay_store
+
 # Document metadata store: document_id -> document dict
 DOCUMENTS_STORE: Dict[str, Dict] = {}
 
@@ -22,16 +25,17 @@ IDEMPOTENCY_STORE: Dict[str, Dict[str, int]] = {}
 # Placeholder storage and replay of idempotent binds.
 PLACEHOLDERS_BY_ID: Dict[str, Dict] = {}
 PLACEHOLDERS_BY_QUESTION: Dict[str, list[Dict]] = {}
+# Replay stores are bounded and expire (see app.logic.replay_store).
 # Composite-key (Idempotency-Key + payload hash) -> placeholder_id
-IDEMPOTENT_BINDS: Dict[str, str] = {}
+IDEMPOTENT_BINDS: MutableMapping = open_replay_store("placeholder_binds")
 # Full response replay store (generic): Idempotency-Key -> {body, etag}
-IDEMPOTENT_RESULTS: Dict[str, dict] = {}
+IDEMPOTENT_RESULTS: MutableMapping = open_replay_store("placeholder_results")
 # Epic E answers replay store: Idempotency-Key -> {body, etag, screen_etag}
-ANSWERS_IDEMPOTENT_RESULTS: Dict[str, dict] = {}
+ANSWERS_IDEMPOTENT_RESULTS: MutableMapping = open_replay_store("answers")
 """Token-based replay cache for Epic E answer saves."""
 
 # Tokenless last-success replay cache keyed by (response_set_id, question_id, body_hash)
-ANSWERS_LAST_SUCCESS: Dict[str, dict] = {}
+ANSWERS_LAST_SUCCESS: MutableMapping = open_replay_store("answers_last_success")
 """Tokenless replay cache to support idempotent short-circuit when only the
 second request supplies Idempotency-Key; survives within-process across requests."""
 # Track per-question model (answer_kind) and last ETag for conflict/precondition checks
@@ -0,0 +1,158 @@
+"""In-memory parent adjacency index for authoring cycle checks.
+
+Holds question_id -> parent question_id for every question, seeded once from
+the question metadata loader (`get_all_question_meta`) and then maintained
+in place by authoring writes (question creation and visibility updates)
+rather than re-read per check. Cycle checks
+walk parent pointers upward, so they cost O(depth) and catch cycles of any
+length. Other workers' authoring writes never reach this process's index, so
+each check re-reads the walked ancestors in one keyed query and walks again
+from the refreshed links before answering.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Optional
+import logging
+
+from sqlalchemy import bindparam, text as sql_text
+
+from app.db.base import get_engine
+from app.logic.question_meta import get_all_question_meta, resolve_parent_token
+
+logger = logging.getLogger(__name__)
+
+
+# Process-wide adjacency: question_id -> resolved parent question_id (or None).
+# None means the index has not been loaded yet.
+_PARENT_OF: Optional[Dict[str, Optional[str]]] = None
+# external_qid (lower-cased) -> question_id, for legacy non-UUID parent tokens
+_EXT_TO_QID: Dict[str, str] = {}
+
+_PARENTS_OF_SQL = sql_text(
+    "SELECT question_id, parent_question_id, external_qid FROM questionnaire_question "
+    "WHERE question_id IN :ids OR external_qid IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+
+def invalidate_parent_index() -> None:
+    """Drop the index; the next check reloads it from the database."""
+    global _PARENT_OF
+    _PARENT_OF = None
+    _EXT_TO_QID.clear()
+    logger.info("parent_index_invalidated")
+
+
+def _resolve_parent_token(token: object | None) -> Optional[str]:
+    # Unmatched external_qids are kept so the walk can confirm them later
+    return resolve_parent_token(token, _EXT_TO_QID, keep_unresolved=True)
+
+
+def _load_parent_index() -> Dict[str, Optional[str]]:
+    """Seed the index from question metadata.
+
+    Questions outside any screen-linked questionnaire are absent; a walk that
+    reaches one confirms it from the database like any other unread link.
+    """
+    global _PARENT_OF
+    metas = get_all_question_meta()
+    _EXT_TO_QID.clear()
+    for qid, meta in metas.items():
+        if meta.external_qid is not None:
+            _EXT_TO_QID[meta.external_qid.strip().lower()] = qid
+    _PARENT_OF = {qid: meta.parent_question_id for qid, meta in metas.items()}
+    logger.info("parent_index_loaded questions=%s", len(_PARENT_OF))
+    return _PARENT_OF
+
+
+def _index() -> Dict[str, Optional[str]]:
+    return _PARENT_OF if _PARENT_OF is not None else _load_parent_index()
+
+
+def record_question(question_id: str, external_qid: str | None = None) -> None:
+    """Register a newly created (parentless) question in a loaded index."""
+    if _PARENT_OF is None:
+        return
+    _PARENT_OF.setdefault(str(question_id), None)
+    if external_qid:
+        _EXT_TO_QID[str(external_qid).strip().lower()] = str(question_id)
+
+
+def record_parent_link(question_id: str, parent_qid: str | None) -> None:
+    """Apply a persisted parent change to a loaded index."""
+    if _PARENT_OF is None:
+        return
+    _PARENT_OF[str(question_id)] = _resolve_parent_token(parent_qid)
+
+
+def _walk(start: Optional[str], target: str, parent_of: Mapping[str, Optional[str]]) -> List[str]:
+    """Return the ancestors walked upward from `start`, ending at `target` if reached."""
+    path: List[str] = []
+    seen: set[str] = set()
+    node = start
+    while node is not None and node not in seen:
+        path.append(node)
+        if node == target:
+            break
+        seen.add(node)
+        node = parent_of.get(node)
+        if node is not None and node not in parent_of:
+            # External_qid tokens read before their question was mapped
+            node = _EXT_TO_QID.get(node.lower(), node)
+    return path
+
+
+def _refresh_links(tokens: Iterable[str]) -> set[str]:
+    """Re-read the parent links of `tokens` into the index; return the ids read.
+
+    Tokens without a row (questions deleted elsewhere) are dropped from the
+    index so walks stop there.
+    """
+    ids = list(tokens)
+    eng = get_engine()
+    with eng.connect() as conn:
+        rows = conn.execute(_PARENTS_OF_SQL, {"ids": ids}).fetchall()
+    parent_of = _index()
+    for r in rows:
+        if r[2] is not None:
+            _EXT_TO_QID[str(r[2]).strip().lower()] = str(r[0])
+    read: set[str] = set()
+    for r in rows:
+        read.add(str(r[0]))
+        parent_of[str(r[0])] = _resolve_parent_token(r[1])
+    for token in ids:
+        if token not in read and _EXT_TO_QID.get(token.lower()) is None:
+            parent_of.pop(token, None)
+    return read | set(ids)
+
+
+def would_create_cycle(question_id: str, parent_qid: str | None) -> bool:
+    """Return True if making `parent_qid` the parent of `question_id` forms a cycle.
+
+    Walks from the proposed parent up through its ancestors; the link is
+    cyclic exactly when that walk reaches the child itself. Links on the walk
+    are confirmed against the database (one query for the whole path) and the
+    walk is repeated until every link it follows has been confirmed, so cycles
+    closed by another worker's write are still caught.
+    """
+    if parent_qid is None:
+        return False
+    child = str(question_id)
+    confirmed: set[str] = set()
+    while True:
+        parent = _resolve_parent_token(parent_qid)
+        if parent == child:
+            return True
+        path = _walk(parent, child, _index())
+        pending = [n for n in path if n not in confirmed]
+        if not pending:
+            return bool(path) and path[-1] == child
+        confirmed |= _refresh_links(pending)
+
+
+__all__ = [
+    "invalidate_parent_index",
+    "record_question",
+    "record_parent_link",
+    "would_create_cycle",
+]
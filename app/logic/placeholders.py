@@ -25,6 +25,7 @@ from app.logic.inmemory_state import (
     QUESTION_ETAGS,
 )
 import app.logic.transform_engine as transform_engine
+from app.logic.enum_resolution import invalidate_enum_index
 
 
 def purge_bindings(document_id: str) -> Tuple[Dict[str, Any], bool]:
@@ -63,6 +64,7 @@ def purge_bindings(document_id: str) -> Tuple[Dict[str, Any], bool]:
         remaining = PLACEHOLDERS_BY_QUESTION.get(q) or []
         if not remaining and q in QUESTION_MODELS:
             QUESTION_MODELS.pop(q, None)
+            invalidate_enum_index(q)
         _ = QUESTION_ETAGS.get(q)
 
     return {
@@ -95,8 +97,9 @@ def bind_placeholder(headers: Dict[str, str], body: Dict[str, Any]) -> Tuple[Dic
     idem_hash = hashlib.sha1(payload_key.encode("utf-8")).hexdigest()
     composite = f"{idem_key}:{idem_hash}" if idem_key else None
 
-    if composite and composite in IDEMPOTENT_RESULTS:
-        stored = IDEMPOTENT_RESULTS[composite]
+    # Single lookups: replay stores expire entries and may be DB-backed
+    stored = IDEMPOTENT_RESULTS.get(composite) if composite else None
+    if stored:
         body_out = dict(stored.get("body") or {})
         # Clarke: always include options for enum_single during replay
         try:
@@ -111,8 +114,9 @@ def bind_placeholder(headers: Dict[str, str], body: Dict[str, Any]) -> Tuple[Dic
         et = stored.get("etag") or current_etag
         return body_out, et, 200
 
-    if composite and composite in IDEMPOTENT_BINDS:
-        ph_id = IDEMPOTENT_BINDS[composite]
+    bound_id = IDEMPOTENT_BINDS.get(composite) if composite else None
+    if bound_id:
+        ph_id = bound_id
         ak = QUESTION_MODELS.get(qid)
         resp = {
             "bound": True,
@@ -186,8 +190,8 @@ def bind_placeholder(headers: Dict[str, str], body: Dict[str, Any]) -> Tuple[Dic
             return problem, current_etag, 422
 
     # Idempotency: assign/create
-    if composite and composite in IDEMPOTENT_BINDS:
-        ph_id = IDEMPOTENT_BINDS[composite]
+    if bound_id:
+        ph_id = bound_id
     else:
         if composite:
             ph_id = str(uuid.uuid5(uuid.NAMESPACE_URL, composite))
@@ -274,6 +278,7 @@ def bind_placeholder(headers: Dict[str, str], body: Dict[str, Any]) -> Tuple[Dic
                     PLACEHOLDERS_BY_ID[parent_id] = parent_rec
                     PLACEHOLDERS_BY_QUESTION.setdefault(q_enum_id, []).append(parent_rec)
                     QUESTION_MODELS[q_enum_id] = "enum_single"
+                    invalidate_enum_index(q_enum_id)
                     QUESTION_ETAGS.setdefault(q_enum_id, current_etag)
 
         if answer_kind == "enum_single":
@@ -291,6 +296,8 @@ def bind_placeholder(headers: Dict[str, str], body: Dict[str, Any]) -> Tuple[Dic
         PLACEHOLDERS_BY_ID[ph_id] = record
         PLACEHOLDERS_BY_QUESTION.setdefault(qid, []).append(record)
         QUESTION_MODELS[qid] = answer_kind
+        # Binding can change the question's model and options
+        invalidate_enum_index(qid)
 
     QUESTION_ETAGS[qid] = current_etag
     resp = {
@@ -357,6 +364,7 @@ def unbind_placeholder(headers: Dict[str, str], body: Dict[str, Any]) -> Tuple[D
     remaining = PLACEHOLDERS_BY_QUESTION.get(str(qid)) or []
     if not remaining and str(qid) in QUESTION_MODELS:
         QUESTION_MODELS.pop(str(qid), None)
+        invalidate_enum_index(str(qid))
 
     QUESTION_ETAGS[str(qid)] = current_etag
     return {"ok": True, "question_id": qid, "etag": current_etag}, current_etag, 200
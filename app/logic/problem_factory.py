@@ -13,13 +13,13 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def problem_pre_request_content_type_unsupported() -> Dict[str, object]:
-    """Return a 415 problem indicating Content-Type must be application/json."""
+def problem_pre_request_content_type_unsupported(expected: str = "application/json") -> Dict[str, object]:
+    """Return a 415 problem indicating Content-Type must be `expected`."""
     problem = {
         "title": "Unsupported Media Type",
         "status": 415,
-        "detail": "Content-Type must be application/json",
-        "message": "Content-Type must be application/json",
+        "detail": f"Content-Type must be {expected}",
+        "message": f"Content-Type must be {expected}",
         "code": "PRE_REQUEST_CONTENT_TYPE_UNSUPPORTED",
     }
     try:
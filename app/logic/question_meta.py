@@ -0,0 +1,293 @@
+"""Process-wide question metadata cache for runtime answer writes.
+
+Maps question_id -> `QuestionMeta` (screen_key, answer_kind, mandatory,
+resolved parent, visible-if value and enum options). Metadata is loaded in
+bulk, two queries per questionnaire, the first time any of its questions is
+looked up, so answer writes resolve screen and kind in memory instead of
+probing `questionnaire_question` per item. This is the one loader of
+`questionnaire_question` rows for runtime lookups: the visibility graph and
+the authoring parent index are built from it, and it owns the only
+question_id -> questionnaire_id map.
+
+Authoring writes (question create/move/visibility, CSV import) must call
+`invalidate_question_meta`. Invalidation bumps a generation counter; a load
+that started before an invalidation is returned to its caller but not
+cached, so a concurrent authoring write is never masked by stale metadata.
+Questions that belong to no screen-linked questionnaire are remembered as
+unknown until the next invalidation; callers fall back to their SQL probes.
+
+Invalidation only reaches this process, so authoring writes handled by other
+workers would go unseen: the whole cache therefore also expires every
+`QUESTION_META_TTL_SECONDS` (default 30; 0 disables expiry for single-worker
+deployments). Expiry is an invalidation, so caches keyed by the generation
+(enum option index, gating sets) rebuild with it.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+import logging
+import os
+import time
+from uuid import UUID
+
+from sqlalchemy import bindparam
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionMeta(NamedTuple):
+    question_id: str
+    questionnaire_id: str
+    screen_key: Optional[str]
+    answer_kind: Optional[str]
+    mandatory: bool
+    parent_question_id: Optional[str]
+    # (option_id, value) in sort order; empty for non-enum questions
+    options: Tuple[Tuple[str, str], ...]
+    external_qid: Optional[str] = None
+    # Stored visible_if_value as the driver returns it (JSON text or a list)
+    visible_if_value: Any = None
+
+
+_QUESTIONNAIRE_OF_SQL = sql_text(
+    """
+    SELECT q.question_id, s.questionnaire_id
+    FROM questionnaire_question q
+    JOIN screen s ON s.screen_id = q.screen_id
+    WHERE q.question_id IN :qids
+    """
+).bindparams(bindparam("qids", expanding=True))
+
+_QUESTIONS_SELECT = """
+    SELECT s.questionnaire_id, q.question_id, COALESCE(q.screen_key, s.screen_key), q.answer_kind,
+           q.mandatory, q.parent_question_id, q.external_qid, q.visible_if_value
+    FROM questionnaire_question q
+    JOIN screen s ON s.screen_id = q.screen_id
+"""
+_QUESTIONNAIRE_QUESTIONS_SQL = sql_text(_QUESTIONS_SELECT + " WHERE s.questionnaire_id = :qn")
+_ALL_QUESTIONS_SQL = sql_text(_QUESTIONS_SELECT)
+
+_OPTIONS_SELECT = """
+    SELECT o.question_id, o.option_id, o.value
+    FROM answer_option o
+    JOIN questionnaire_question q ON q.question_id = o.question_id
+    JOIN screen s ON s.screen_id = q.screen_id
+"""
+_OPTIONS_ORDER = " ORDER BY o.question_id ASC, o.sort_index ASC, o.value ASC"
+_QUESTIONNAIRE_OPTIONS_SQL = sql_text(_OPTIONS_SELECT + " WHERE s.questionnaire_id = :qn" + _OPTIONS_ORDER)
+_ALL_OPTIONS_SQL = sql_text(_OPTIONS_SELECT + _OPTIONS_ORDER)
+
+
+# questionnaire_id -> {question_id: QuestionMeta}
+_META_CACHE: Dict[str, Dict[str, QuestionMeta]] = {}
+# question_id -> questionnaire_id, or None for questions outside any questionnaire
+_QUESTION_QUESTIONNAIRE: Dict[str, Optional[str]] = {}
+# Bumped by every invalidation; loads only cache under the generation they began in
+_GENERATION = 0
+
+QUESTION_META_TTL_SECONDS = float(os.getenv("QUESTION_META_TTL_SECONDS", "30"))
+# Monotonic deadline after which the whole cache is dropped
+_EXPIRES_AT = 0.0
+
+
+def invalidate_question_meta(questionnaire_id: str | None = None) -> None:
+    """Drop cached metadata for one questionnaire, or for all when None."""
+    global _GENERATION, _EXPIRES_AT
+    _GENERATION += 1
+    if questionnaire_id is None:
+        _META_CACHE.clear()
+        _QUESTION_QUESTIONNAIRE.clear()
+        _EXPIRES_AT = time.monotonic() + QUESTION_META_TTL_SECONDS
+    else:
+        dropped = _META_CACHE.pop(str(questionnaire_id), None) or {}
+        for qid in dropped:
+            _QUESTION_QUESTIONNAIRE.pop(qid, None)
+    logger.info("question_meta_invalidated questionnaire_id=%s", questionnaire_id)
+
+
+def _expire_if_due() -> None:
+    if QUESTION_META_TTL_SECONDS > 0 and time.monotonic() >= _EXPIRES_AT:
+        invalidate_question_meta()
+
+
+def question_meta_generation() -> int:
+    """Return the invalidation generation (changes on every authoring write and expiry)."""
+    _expire_if_due()
+    return _GENERATION
+
+
+def resolve_parent_token(
+    token: object | None, ext_to_qid: Mapping[str, str], *, keep_unresolved: bool = False
+) -> Optional[str]:
+    """Resolve a stored parent_question_id to a question_id.
+
+    UUID tokens are question_ids. Other tokens are looked up (trimmed,
+    lower-cased) in `ext_to_qid`; unmatched ones resolve to None, or to the
+    trimmed token itself with `keep_unresolved`.
+    """
+    if token is None:
+        return None
+    s = str(token).strip()
+    if not s:
+        return None
+    try:
+        UUID(s)
+        return s
+    except Exception:
+        # Non-UUID parent tokens are external_qids (SQLite/local schemas)
+        return ext_to_qid.get(s.lower(), s if keep_unresolved else None)
+
+
+def _build_meta(rows: Iterable[Any], option_rows: Iterable[Any]) -> Dict[str, Dict[str, QuestionMeta]]:
+    """Group question and option rows into {questionnaire_id: {question_id: QuestionMeta}}."""
+    options: Dict[str, list] = {}
+    for r in option_rows:
+        options.setdefault(str(r[0]), []).append((str(r[1]), str(r[2])))
+    by_qn: Dict[str, list] = {}
+    for r in rows:
+        by_qn.setdefault(str(r[0]), []).append(r)
+    out: Dict[str, Dict[str, QuestionMeta]] = {}
+    for qn, qn_rows in by_qn.items():
+        # Parents resolve within their own questionnaire
+        ext_to_qid = {str(r[6]).strip().lower(): str(r[1]) for r in qn_rows if r[6] is not None}
+        metas = out[qn] = {}
+        for r in qn_rows:
+            qid = str(r[1])
+            metas[qid] = QuestionMeta(
+                question_id=qid,
+                questionnaire_id=qn,
+                screen_key=str(r[2]) if r[2] is not None else None,
+                answer_kind=str(r[3]) if r[3] is not None else None,
+                mandatory=bool(r[4]),
+                parent_question_id=resolve_parent_token(r[5], ext_to_qid),
+                options=tuple(options.get(qid, ())),
+                external_qid=str(r[6]) if r[6] is not None else None,
+                visible_if_value=r[7],
+            )
+    return out
+
+
+def _load_meta(questionnaire_id: str | None) -> Dict[str, Dict[str, QuestionMeta]]:
+    """Load one questionnaire's metadata, or every questionnaire's when None."""
+    if questionnaire_id is None:
+        questions_sql, options_sql, params = _ALL_QUESTIONS_SQL, _ALL_OPTIONS_SQL, {}
+    else:
+        questions_sql, options_sql = _QUESTIONNAIRE_QUESTIONS_SQL, _QUESTIONNAIRE_OPTIONS_SQL
+        params = {"qn": questionnaire_id}
+    with get_engine().connect() as conn:
+        rows = conn.execute(questions_sql, params).fetchall()
+        try:
+            option_rows = conn.execute(options_sql, params).fetchall()
+        except Exception:
+            logger.error("question_meta_options_load_failed questionnaire_id=%s", questionnaire_id, exc_info=True)
+            option_rows = []
+    return _build_meta(rows, option_rows)
+
+
+def _remember(questionnaire_id: str, metas: Dict[str, QuestionMeta]) -> None:
+    _META_CACHE[questionnaire_id] = metas
+    for qid in metas:
+        _QUESTION_QUESTIONNAIRE[qid] = questionnaire_id
+
+
+def get_questionnaire_meta(questionnaire_id: str) -> Mapping[str, QuestionMeta]:
+    """Return metadata for every question of a questionnaire, loading it once."""
+    _expire_if_due()
+    qn = str(questionnaire_id)
+    cached = _META_CACHE.get(qn)
+    if cached is not None:
+        return cached
+    generation = _GENERATION
+    loaded = _load_meta(qn).get(qn, {})
+    if generation == _GENERATION:
+        _remember(qn, loaded)
+        logger.info("question_meta_loaded questionnaire_id=%s questions=%s", qn, len(loaded))
+    return loaded
+
+
+def get_all_question_meta() -> Dict[str, QuestionMeta]:
+    """Return {question_id: QuestionMeta} for every screen-linked question.
+
+    Loads all questionnaires in one pass (two queries) and caches each of
+    them under the current generation; used to seed process-wide indexes.
+    """
+    _expire_if_due()
+    generation = _GENERATION
+    loaded = _load_meta(None)
+    out: Dict[str, QuestionMeta] = {}
+    for qn, metas in loaded.items():
+        if generation == _GENERATION:
+            _remember(qn, metas)
+        out.update(metas)
+    logger.info("question_meta_loaded_all questionnaires=%s questions=%s", len(loaded), len(out))
+    return out
+
+
+def get_questions_meta(question_ids: Iterable[str]) -> Dict[str, QuestionMeta]:
+    """Return {question_id: QuestionMeta} for the known questions among `question_ids`.
+
+    Unknown questionnaires are resolved for all uncached ids in one query and
+    each is then loaded in bulk. Ids outside any screen-linked questionnaire
+    are absent from the result. Database errors are logged and yield the
+    metadata resolved so far.
+    """
+    _expire_if_due()
+    ids = {str(q) for q in question_ids if q}
+    unresolved = sorted(q for q in ids if q not in _QUESTION_QUESTIONNAIRE)
+    owners: Dict[str, Optional[str]] = {q: _QUESTION_QUESTIONNAIRE[q] for q in ids if q in _QUESTION_QUESTIONNAIRE}
+    if unresolved:
+        generation = _GENERATION
+        try:
+            with get_engine().connect() as conn:
+                rows = conn.execute(_QUESTIONNAIRE_OF_SQL, {"qids": unresolved}).fetchall()
+        except Exception:
+            logger.error("question_meta_owner_lookup_failed count=%s", len(unresolved), exc_info=True)
+            rows = None
+        if rows is not None:
+            found = {str(r[0]): (str(r[1]) if r[1] is not None else None) for r in rows}
+            for qid in unresolved:
+                owners[qid] = found.get(qid)
+                if generation == _GENERATION and owners[qid] is None:
+                    _QUESTION_QUESTIONNAIRE[qid] = None
+    out: Dict[str, QuestionMeta] = {}
+    for qn in {o for o in owners.values() if o is not None}:
+        try:
+            metas = get_questionnaire_meta(qn)
+        except Exception:
+            logger.error("question_meta_load_failed questionnaire_id=%s", qn, exc_info=True)
+            continue
+        for qid in ids:
+            meta = metas.get(qid)
+            if meta is not None:
+                out[qid] = meta
+    return out
+
+
+def get_question_meta(question_id: str) -> QuestionMeta | None:
+    """Return cached metadata for one question, or None when unknown."""
+    _expire_if_due()
+    qid = str(question_id)
+    qn = _QUESTION_QUESTIONNAIRE.get(qid)
+    if qn is not None:
+        cached = _META_CACHE.get(qn)
+        if cached is not None and qid in cached:
+            return cached[qid]
+    elif qid in _QUESTION_QUESTIONNAIRE:
+        return None
+    return get_questions_meta([qid]).get(qid)
+
+
+__all__ = [
+    "QuestionMeta",
+    "get_all_question_meta",
+    "get_question_meta",
+    "get_questions_meta",
+    "get_questionnaire_meta",
+    "invalidate_question_meta",
+    "question_meta_generation",
+    "resolve_parent_token",
+]
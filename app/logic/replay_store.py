@@ -0,0 +1,346 @@
+"""Bounded, expiring stores for idempotent-replay state.
+
+Replay state (answer replays, tokenless last-success replays, placeholder
+bind results and bind ids) used to live in plain dicts that grew forever.
+Each store here is a mapping from a replay key to a JSON-serialisable value
+with a TTL; implementations are selected by `REPLAY_STORE_BACKEND`:
+
+- ``memory`` (default): per-process LRU/TTL store bounded by
+  `REPLAY_STORE_MAX_ENTRIES` entries per namespace.
+- ``sql``: rows in the `idempotency_key` table (`expires_at` enforces the
+  TTL), so a replay recorded by one worker is honoured by every worker.
+
+`REPLAY_STORE_TTL_SECONDS` sets the TTL for both. Expired entries read as
+misses; `start_replay_sweeper` additionally purges them in the background so
+memory (or table size) tracks live entries only.
+
+Both backends key entries by a fixed-size BLAKE2b digest of the caller's key
+(replay keys embed tokens and SHA-256 hex strings, so are long), which means
+iteration yields digests rather than the original keys. The in-process store
+also keeps values as zlib-compressed JSON and decodes a fresh copy per read.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterator, List, Tuple
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+import zlib
+
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+
+logger = logging.getLogger(__name__)
+
+
+_KEY_DIGEST_SIZE = 16
+
+
+def replay_key_digest(key: object) -> bytes:
+    """Return the fixed-size binary digest a replay key is stored under."""
+    if isinstance(key, bytes) and len(key) == _KEY_DIGEST_SIZE:
+        return key
+    return hashlib.blake2b(str(key).encode("utf-8"), digest_size=_KEY_DIGEST_SIZE).digest()
+
+
+def _pack(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, separators=(",", ":"), default=str).encode("utf-8"))
+
+
+def _unpack(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob))
+
+
+class BoundedReplayStore(MutableMapping):
+    """Per-process replay store with a size bound and a TTL.
+
+    Inserting past `max_entries` evicts the least-recently-used entry;
+    entries older than `ttl_seconds` read as misses and are dropped. Entries
+    are `(expires_at, zlib'd JSON)` under a 16-byte key digest. Request
+    threads and the sweeper thread share a store, so every access to the
+    entries holds a lock.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_entries: int = 10_000,
+        ttl_seconds: float = 86_400.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.namespace = namespace
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = float(ttl_seconds)
+        self._clock = clock
+        self._entries: "OrderedDict[bytes, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __getitem__(self, key: object) -> Any:
+        digest = replay_key_digest(key)
+        with self._lock:
+            try:
+                expires_at, blob = self._entries[digest]
+            except KeyError:
+                raise KeyError(key) from None
+            if expires_at <= self._clock():
+                del self._entries[digest]
+                self.expirations += 1
+                raise KeyError(key)
+            self._entries.move_to_end(digest)
+        return _unpack(blob)
+
+    def __setitem__(self, key: object, value: Any) -> None:
+        digest = replay_key_digest(key)
+        blob = _pack(value)
+        with self._lock:
+            self._entries[digest] = (self._clock() + self.ttl_seconds, blob)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def __delitem__(self, key: object) -> None:
+        digest = replay_key_digest(key)
+        with self._lock:
+            try:
+                del self._entries[digest]
+            except KeyError:
+                raise KeyError(key) from None
+
+    def __iter__(self) -> Iterator[bytes]:
+        with self._lock:
+            now = self._clock()
+            return iter([k for k, (exp, _) in self._entries.items() if exp > now])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]  # type: ignore[index]
+        except KeyError:
+            return False
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def sweep(self) -> int:
+        """Drop every expired entry; return how many were removed."""
+        with self._lock:
+            now = self._clock()
+            expired = [k for k, (exp, _) in self._entries.items() if exp <= now]
+            for k in expired:
+                self._entries.pop(k, None)
+            self.expirations += len(expired)
+        return len(expired)
+
+
+class SqlReplayStore(MutableMapping):
+    """Replay store in the `idempotency_key` table, shared by all workers.
+
+    Keys are stored as ``"{namespace}:{hex key digest}"`` in
+    `idempotency_key`, values as JSON in `response_body`, and `expires_at`
+    carries the TTL. Read failures are logged and treated as misses, as a
+    replay lookup must not fail the request it guards.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: float = 86_400.0) -> None:
+        self.namespace = namespace
+        self.ttl_seconds = float(ttl_seconds)
+        self._prefix = f"{namespace}:"
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def _row_key(self, key: object) -> str:
+        return self._prefix + replay_key_digest(key).hex()
+
+    def __getitem__(self, key: object) -> Any:
+        try:
+            with get_engine().connect() as conn:
+                row = conn.execute(
+                    sql_text(
+                        "SELECT response_body FROM idempotency_key WHERE idempotency_key = :k AND expires_at > :now"
+                    ),
+                    {"k": self._row_key(key), "now": self._now()},
+                ).fetchone()
+        except Exception:
+            # A replay lookup must never fail the request; read as a miss
+            logger.error("replay_store_read_failed namespace=%s", self.namespace, exc_info=True)
+            raise KeyError(key) from None
+        if row is None or row[0] is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key: object, value: Any) -> None:
+        now = self._now()
+        with get_engine().begin() as conn:
+            conn.execute(
+                sql_text(
+                    """
+                    INSERT INTO idempotency_key (key_id, idempotency_key, response_body, created_at, expires_at)
+                    VALUES (:id, :k, :body, :now, :exp)
+                    ON CONFLICT (idempotency_key) DO UPDATE
+                    SET response_body = EXCLUDED.response_body, created_at = EXCLUDED.created_at,
+                        expires_at = EXCLUDED.expires_at
+                    """
+                ),
+                {
+                    "id": str(uuid.uuid4()),
+                    "k": self._row_key(key),
+                    "body": json.dumps(value, separators=(",", ":"), default=str),
+                    "now": now,
+                    "exp": now + timedelta(seconds=self.ttl_seconds),
+                },
+            )
+
+    def __delitem__(self, key: object) -> None:
+        with get_engine().begin() as conn:
+            res = conn.execute(
+                sql_text("DELETE FROM idempotency_key WHERE idempotency_key = :k"),
+                {"k": self._row_key(key)},
+            )
+        if not res.rowcount:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[bytes]:
+        with get_engine().connect() as conn:
+            rows = conn.execute(
+                sql_text(
+                    "SELECT idempotency_key FROM idempotency_key WHERE idempotency_key LIKE :p AND expires_at > :now"
+                ),
+                {"p": self._prefix + "%", "now": self._now()},
+            ).fetchall()
+        return iter([bytes.fromhex(str(r[0])[len(self._prefix):]) for r in rows])
+
+    def __len__(self) -> int:
+        with get_engine().connect() as conn:
+            return int(
+                conn.execute(
+                    sql_text(
+                        "SELECT COUNT(*) FROM idempotency_key WHERE idempotency_key LIKE :p AND expires_at > :now"
+                    ),
+                    {"p": self._prefix + "%", "now": self._now()},
+                ).scalar()
+                or 0
+            )
+
+    def clear(self) -> None:
+        with get_engine().begin() as conn:
+            conn.execute(
+                sql_text("DELETE FROM idempotency_key WHERE idempotency_key LIKE :p"),
+                {"p": self._prefix + "%"},
+            )
+
+    def sweep(self) -> int:
+        """Delete this namespace's expired rows; return how many were removed."""
+        with get_engine().begin() as conn:
+            res = conn.execute(
+                sql_text("DELETE FROM idempotency_key WHERE idempotency_key LIKE :p AND expires_at <= :now"),
+                {"p": self._prefix + "%", "now": self._now()},
+            )
+        return int(res.rowcount or 0)
+
+
+# ---------------------------------------------------------------------------
+# Selection and sweeping
+# ---------------------------------------------------------------------------
+
+_STORES: List[MutableMapping] = []
+_SWEEPER: threading.Thread | None = None
+_SWEEPER_LOCK = threading.Lock()
+
+
+def replay_store_backend_name() -> str:
+    return (os.getenv("REPLAY_STORE_BACKEND") or "memory").strip().lower()
+
+
+def open_replay_store(namespace: str) -> MutableMapping:
+    """Return a replay store for `namespace` on the configured backend.
+
+    Unknown backend names fall back to the in-process store with an error log.
+    """
+    try:
+        max_entries = int(os.getenv("REPLAY_STORE_MAX_ENTRIES") or 10_000)
+        ttl_seconds = float(os.getenv("REPLAY_STORE_TTL_SECONDS") or 86_400)
+    except ValueError:
+        logger.error("replay_store_config_invalid; using defaults", exc_info=True)
+        max_entries, ttl_seconds = 10_000, 86_400.0
+    name = replay_store_backend_name()
+    store: MutableMapping
+    if name == "sql":
+        store = SqlReplayStore(namespace, ttl_seconds)
+    else:
+        if name != "memory":
+            logger.error("replay_store_backend_unknown name=%s; using in-process store", name)
+        store = BoundedReplayStore(namespace, max_entries, ttl_seconds)
+    _STORES.append(store)
+    return store
+
+
+def sweep_replay_stores() -> int:
+    """Purge expired entries from every opened store; return the total removed."""
+    removed = 0
+    for store in list(_STORES):
+        try:
+            removed += int(store.sweep())  # type: ignore[attr-defined]
+        except Exception:
+            logger.error(
+                "replay_store_sweep_failed namespace=%s", getattr(store, "namespace", "?"), exc_info=True
+            )
+    return removed
+
+
+def _sweep_forever(interval_seconds: float) -> None:
+    while True:
+        time.sleep(interval_seconds)
+        removed = sweep_replay_stores()
+        if removed:
+            logger.info("replay_store_swept removed=%s", removed)
+
+
+def start_replay_sweeper(interval_seconds: float | None = None) -> None:
+    """Start the daemon thread that periodically sweeps expired replay entries.
+
+    Idempotent: later calls are no-ops once the sweeper is running.
+    `REPLAY_STORE_SWEEP_SECONDS` (default 60) sets the interval.
+    """
+    global _SWEEPER
+    with _SWEEPER_LOCK:
+        if _SWEEPER is not None and _SWEEPER.is_alive():
+            return
+        if interval_seconds is None:
+            try:
+                interval_seconds = float(os.getenv("REPLAY_STORE_SWEEP_SECONDS") or 60)
+            except ValueError:
+                interval_seconds = 60.0
+        _SWEEPER = threading.Thread(
+            target=_sweep_forever, args=(max(1.0, interval_seconds),), name="replay-store-sweeper", daemon=True
+        )
+        _SWEEPER.start()
+
+
+__all__ = [
+    "BoundedReplayStore",
+    "SqlReplayStore",
+    "replay_key_digest",
+    "replay_store_backend_name",
+    "open_replay_store",
+    "sweep_replay_stores",
+    "start_replay_sweeper",
+]
@@ -5,37 +5,70 @@ Encapsulates queries and writes for autosave routes.
 
 from __future__ import annotations
 
-from typing import Any, Dict, Tuple
+from dataclasses import dataclass, field
+from functools import cached_property
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, MutableMapping, Sequence, Tuple
 
+from sqlalchemy import bindparam
 from sqlalchemy import text as sql_text
 
+from app.logging_setup import route_module_logger
 from app.db.base import get_engine
+from app.logic.answer_canonical import canonicalize_answer_value
+from app.logic.enum_resolution import enum_option_value
+from app.logic.question_meta import get_question_meta, get_questions_meta
 from app.logic.repository_screens import (
     get_screen_key_for_question as _screen_key_from_screens,
+    get_visibility_rules_for_screen,
+    list_questions_for_screen,
 )
+from app.logic.visibility_rules import compute_visible_set
+from app.logic.visibility_graph import (
+    QuestionnaireGraph,
+    descendant_visibility_delta,
+    effective_values,
+    get_graph_for_question,
+)
+from app.logic.answer_state_backend import is_shared_answer_state, open_answer_state
+from app.logic.bounded_state import open_response_state_map
+from app.logic.events import RESPONSE_SET_DELETED, subscribe
+from app.logic.gating_state import invalidate_gating_states, mark_answered, mark_cleared
+from app.logic.screen_state import (
+    advance_screen_version,
+    apply_visibility_flips,
+    has_screen_states,
+    invalidate_screen_states,
+    record_screen_state,
+)
+import itertools
 import json
+import uuid
 import logging
-import sys
 
 logger = logging.getLogger(__name__)
-# Ensure module INFO logs are emitted to stdout during integration runs
+# Ensure module INFO logs reach stdout (via the shared logging queue) during integration runs
 try:
-    if not logger.handlers:
-        _handler = logging.StreamHandler(stream=sys.stdout)
-        _handler.setLevel(logging.INFO)
-        _handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:%(name)s:%(message)s'))
-        logger.addHandler(_handler)
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
+    route_module_logger(logger)
 except Exception:
     logger.error("answers_logging_setup_failed", exc_info=True)
 
-# In-memory fallback store used in skeleton mode or when DB is unavailable.
-# Keys are (response_set_id, question_id) -> tuple(option_id, value_text, value_number, value_bool)
-_INMEM_ANSWERS: Dict[Tuple[str, str], Tuple[str | None, str | None, float | None, bool | None]] = {}
+# Answer read-through cache, also the fallback store in skeleton mode or when
+# the DB is unavailable. Keys are (response_set_id, question_id) ->
+# tuple(option_id, value_text, value_number, value_bool).
+# Per-(response_set_id, screen_key) version counters feed the weak Screen-ETag.
+# Both come from the configured backend (ANSWER_STATE_BACKEND): per-process
+# dicts by default, or stores shared across workers.
+_INMEM_ANSWERS: MutableMapping[Tuple[str, str], Tuple[str | None, str | None, float | None, bool | None]]
+_SCREEN_VERSIONS: MutableMapping[Tuple[str, str], int]
+_INMEM_ANSWERS, _SCREEN_VERSIONS = open_answer_state()
 
-# Per-(response_set_id, screen_key) version counter to support weak Screen-ETag fallback.
-_SCREEN_VERSIONS: Dict[Tuple[str, str], int] = {}
+# Per-response_set write generation; moved on every answer write or delete so
+# request-scoped memos can key screen state without re-reading it. Bounded
+# like the answer cache; generations are drawn from one process-wide sequence
+# so a response set evicted and written again never repeats an old value.
+_WRITE_GENERATIONS: MutableMapping[str, int] = open_response_state_map("write_generations")
+_WRITE_SEQUENCE = itertools.count(1)
 
 # Instrumentation: log cache object id once to verify shared instance across modules
 try:
@@ -46,10 +79,123 @@ except Exception:
 
 def _bump_screen_version(response_set_id: str, screen_key: str) -> None:
     key = (response_set_id, screen_key)
-    _SCREEN_VERSIONS[key] = int(_SCREEN_VERSIONS.get(key, 0)) + 1
+    version = _SCREEN_VERSIONS.increment(key)  # atomic on shared backends
+    rs_id = str(response_set_id)
+    _WRITE_GENERATIONS[rs_id] = next(_WRITE_SEQUENCE)
+    advance_screen_version(response_set_id, screen_key, version)
+
+
+def _tracks_screen_states(response_set_id: str) -> bool:
+    """Whether writes must carry visibility changes into screen state.
+
+    Always true on shared backends, where other workers' records only learn
+    about cross-screen visibility changes through version bumps.
+    """
+    return is_shared_answer_state() or has_screen_states(response_set_id)
+
+
+def _canonical_or_none(row: tuple | None) -> str | None:
+    if row is None:
+        return None
+    _opt, vtext, vnum, vbool = row
+    cv = canonicalize_answer_value(vtext, vnum, vbool)
+    return str(cv) if cv is not None else None
+
+
+def _sync_screen_states(response_set_id: str, question_id: str, before: tuple | None) -> None:
+    """Carry an answer change into the maintained per-screen state records.
+
+    Visibility flips caused by the change (from the incremental descendant
+    walk) are applied to every recorded screen they land on. On shared
+    backends, screens other than the written question's also get a version
+    bump so other workers' records go stale. When the change cannot be
+    evaluated incrementally the response set's records are dropped and
+    reseeded by the next snapshot load.
+    """
+    rs_id = str(response_set_id)
+    if not _tracks_screen_states(rs_id):
+        return
+    after = _INMEM_ANSWERS.get((rs_id, str(question_id)))
+    value_before, value_after = _canonical_or_none(before), _canonical_or_none(after)
+    if value_before == value_after:
+        return
+    try:
+        delta = descendant_visibility_delta(rs_id, str(question_id), value_before, value_after)
+        graph = get_graph_for_question(question_id) if delta is not None else None
+    except Exception:
+        logger.error("screen_state_sync_failed rs_id=%s q_id=%s", rs_id, question_id, exc_info=True)
+        delta, graph = None, None
+    if delta is None or graph is None:
+        invalidate_screen_states(rs_id)
+        return
+    now_visible, now_hidden = delta
+    if now_visible or now_hidden:
+        apply_visibility_flips(rs_id, now_visible, now_hidden, graph.screen_of)
+        if is_shared_answer_state():
+            own_screen = graph.screen_of.get(str(question_id))
+            for skey in {graph.screen_of.get(q) for q in (*now_visible, *now_hidden)}:
+                if skey is not None and skey != own_screen:
+                    _bump_screen_version(rs_id, skey)
 
 def get_screen_version(response_set_id: str, screen_key: str) -> int:
-    return int(_SCREEN_VERSIONS.get((response_set_id, screen_key), 0))
+    return int(_SCREEN_VERSIONS.get((response_set_id, screen_key), 0) or 0)
+
+
+def get_answer_cache_stats() -> Dict[str, Any]:
+    """Return size and hit/miss/eviction counters of the answer cache, when tracked."""
+    stats = getattr(_INMEM_ANSWERS, "stats", None)
+    return dict(stats()) if stats is not None else {}
+
+
+def _on_response_set_deleted(payload: Dict[str, Any]) -> None:
+    """Evict cached answers, screen state and gating state of a deleted response set."""
+    rs_id = str((payload or {}).get("response_set_id") or "")
+    if not rs_id:
+        return
+    evict = getattr(_INMEM_ANSWERS, "evict_response_set", None)
+    if evict is not None:
+        evicted = evict(rs_id)
+    else:
+        keys = [k for k in list(_INMEM_ANSWERS) if k[0] == rs_id]
+        for key in keys:
+            _INMEM_ANSWERS.pop(key, None)
+        evicted = len(keys)
+    invalidate_screen_states(rs_id)
+    invalidate_gating_states(rs_id)
+    _WRITE_GENERATIONS.pop(rs_id, None)
+    logger.info("answers_cache_evict_response_set rs_id=%s evicted=%s", rs_id, evicted)
+
+
+subscribe(RESPONSE_SET_DELETED, _on_response_set_deleted)
+
+
+def get_write_generation(response_set_id: str) -> int:
+    """Return the response set's current write generation (0 before any write)."""
+    return int(_WRITE_GENERATIONS.get(str(response_set_id), 0))
+
+
+# Runtime lookups are module-level statements so each call reuses the same
+# compiled construct (and, on drivers that prepare, the same server statement).
+_QUESTION_SCREEN_KEY_SQL = sql_text(
+    "SELECT screen_key FROM questionnaire_question WHERE question_id = :qid"
+)
+_QUESTION_SCREEN_KEY_JOIN_SQL = sql_text(
+    "SELECT s.screen_key FROM questionnaire_question q JOIN screen s ON q.screen_id = s.screen_id WHERE q.question_id = :qid"
+)
+_ANSWER_KIND_SQL = sql_text("SELECT answer_kind FROM questionnaire_question WHERE question_id = :qid")
+_QUESTIONS_SCREEN_AND_KIND_SQL = sql_text(
+    "SELECT q.question_id, COALESCE(q.screen_key, s.screen_key), q.answer_kind "
+    "FROM questionnaire_question q LEFT JOIN screen s ON q.screen_id = s.screen_id "
+    "WHERE q.question_id IN :qids"
+).bindparams(bindparam("qids", expanding=True))
+_EXISTING_ANSWER_SQL = sql_text(
+    """
+    SELECT option_id, value_text, value_number, value_bool, value_json
+    FROM response
+    WHERE response_set_id = :rs AND question_id = :qid
+    """
+)
+_RESPONSE_ID_EXISTS_SQL = sql_text("SELECT 1 FROM response WHERE response_id = :rid")
 
 
 def get_screen_key_for_question(question_id: str) -> str | None:
@@ -76,18 +222,14 @@ def get_screen_key_for_question(question_id: str) -> str | None:
         eng = get_engine()
         with eng.connect() as conn:
             row = conn.execute(
-                sql_text(
-                    "SELECT screen_key FROM questionnaire_question WHERE question_id = :qid"
-                ),
+                _QUESTION_SCREEN_KEY_SQL,
                 {"qid": question_id},
             ).fetchone()
             if row and row[0]:
                 return str(row[0])
             # Fallback join: resolve via screens when only screen_id exists
             row2 = conn.execute(
-                sql_text(
-                    "SELECT s.screen_key FROM questionnaire_question q JOIN screen s ON q.screen_id = s.screen_id WHERE q.question_id = :qid"
-                ),
+                _QUESTION_SCREEN_KEY_JOIN_SQL,
                 {"qid": question_id},
             ).fetchone()
             if row2 and row2[0]:
@@ -103,11 +245,17 @@ def get_screen_key_for_question(question_id: str) -> str | None:
 
 
 def get_answer_kind_for_question(question_id: str) -> str | None:
+    try:
+        meta = get_question_meta(question_id)
+        if meta is not None:
+            return meta.answer_kind
+    except Exception:
+        logger.error("question_meta lookup failed for %s", question_id, exc_info=True)
     try:
         eng = get_engine()
         with eng.connect() as conn:
             row = conn.execute(
-                sql_text("SELECT answer_kind FROM questionnaire_question WHERE question_id = :qid"),
+                _ANSWER_KIND_SQL,
                 {"qid": question_id},
             ).fetchone()
         return str(row[0]) if row else None
@@ -116,6 +264,78 @@ def get_answer_kind_for_question(question_id: str) -> str | None:
         return None
 
 
+def get_questions_screen_and_kind(question_ids: list[str]) -> Dict[str, Tuple[str | None, str | None]]:
+    """Return {question_id: (screen_key, answer_kind)} for many questions in one query.
+
+    Unknown question_ids are absent from the result. Questions of a
+    questionnaire come from the metadata cache; only the rest are queried,
+    with rows lacking a stored screen_key resolved through the screen table.
+    """
+    ids = sorted({str(q) for q in question_ids if q})
+    if not ids:
+        return {}
+    out: Dict[str, Tuple[str | None, str | None]] = {
+        qid: (meta.screen_key, meta.answer_kind) for qid, meta in get_questions_meta(ids).items()
+    }
+    ids = [qid for qid in ids if qid not in out]
+    if not ids:
+        return out
+    try:
+        eng = get_engine()
+        with eng.connect() as conn:
+            rows = conn.execute(
+                _QUESTIONS_SCREEN_AND_KIND_SQL,
+                {"qids": ids},
+            ).fetchall()
+    except Exception:
+        logger.error("get_questions_screen_and_kind failed count=%s", len(ids), exc_info=True)
+        return out
+    for r in rows:
+        out[str(r[0])] = (str(r[1]) if r[1] else None, str(r[2]) if r[2] is not None else None)
+    return out
+
+
+def _answer_tuple_from_columns(opt: Any, vtext: Any, vnum: Any, vbool: Any, vjson: Any) -> tuple:
+    """Normalize raw response columns into (option_id, value_text, value_number, value_bool).
+
+    When only value_json is populated it is parsed into the first matching
+    scalar slot; option_id is string-cast for stable equality checks.
+    """
+    if (opt is None) and (vtext is None) and (vnum is None) and (vbool is None) and (vjson is not None):
+        parsed = None
+        try:
+            if isinstance(vjson, (bytes, bytearray)):
+                s = vjson.decode(errors="ignore")
+            else:
+                s = vjson if isinstance(vjson, str) else None
+            if s is not None:
+                s_trim = s.strip()
+                lo = s_trim.lower()
+                if lo in {"true", "false"}:
+                    parsed = (lo == "true")
+                elif lo in {"null"}:
+                    parsed = None
+                else:
+                    parsed = json.loads(s_trim)
+            else:
+                parsed = vjson
+        except Exception:
+            parsed = None
+        if isinstance(parsed, bool):
+            vbool = bool(parsed)
+        elif isinstance(parsed, (int, float)) and not isinstance(parsed, bool):
+            vnum = float(parsed)
+        elif isinstance(parsed, str):
+            vtext = parsed
+    # Normalize option_id to string for consistency before mirroring
+    try:
+        opt = str(opt) if (opt is not None) else None
+    except Exception:
+        # If normalization fails, retain original value
+        pass
+    return (opt, vtext, vnum, vbool)
+
+
 def get_existing_answer(response_set_id: str, question_id: str) -> tuple | None:
     """Return a tuple (option_id, value_text, value_number, value_bool) if present.
 
@@ -144,50 +364,11 @@ def get_existing_answer(response_set_id: str, question_id: str) -> tuple | None:
         eng = get_engine()
         with eng.connect() as conn:
             row = conn.execute(
-                sql_text(
-                    """
-                    SELECT option_id, value_text, value_number, value_bool, value_json
-                    FROM response
-                    WHERE response_set_id = :rs AND question_id = :qid
-                    """
-                ),
+                _EXISTING_ANSWER_SQL,
                 {"rs": rs_id, "qid": q_id},
             ).fetchone()
         if row is not None:
-            opt, vtext, vnum, vbool, vjson = row
-            # If only value_json is populated, parse into the first matching scalar slot
-            if (opt is None) and (vtext is None) and (vnum is None) and (vbool is None) and (vjson is not None):
-                parsed = None
-                try:
-                    if isinstance(vjson, (bytes, bytearray)):
-                        s = vjson.decode(errors="ignore")
-                    else:
-                        s = vjson if isinstance(vjson, str) else None
-                    if s is not None:
-                        s_trim = s.strip()
-                        lo = s_trim.lower()
-                        if lo in {"true", "false"}:
-                            parsed = (lo == "true")
-                        elif lo in {"null"}:
-                            parsed = None
-                        else:
-                            parsed = json.loads(s_trim)
-                    else:
-                        parsed = vjson
-                except Exception:
-                    parsed = None
-                if isinstance(parsed, bool):
-                    vbool = bool(parsed)
-                elif isinstance(parsed, (int, float)) and not isinstance(parsed, bool):
-                    vnum = float(parsed)
-                elif isinstance(parsed, str):
-                    vtext = parsed
-            # Normalize option_id to string for consistency before mirroring
-            try:
-                opt = str(opt) if (opt is not None) else None
-            except Exception:
-                # If normalization fails, retain original value
-                pass
+            opt, vtext, vnum, vbool = _answer_tuple_from_columns(*row)
             # Mirror normalized tuple to in-memory cache for read-your-writes
             try:
                 _INMEM_ANSWERS[(rs_id, q_id)] = (opt, vtext, vnum, vbool)
@@ -256,6 +437,117 @@ def get_existing_answer(response_set_id: str, question_id: str) -> tuple | None:
         return fallback
 
 
+_UPSERT_SQLITE_SQL = sql_text(
+    """
+    INSERT INTO response (response_id, response_set_id, question_id, option_id, value_text, value_number, value_bool, value_json, answered_at)
+    VALUES (:rid, :rs, :qid, :opt, :vtext, :vnum, :vbool, :vjson, CURRENT_TIMESTAMP)
+    ON CONFLICT(response_set_id, question_id)
+    DO UPDATE SET option_id = excluded.option_id,
+                  value_text = excluded.value_text,
+                  value_number = excluded.value_number,
+                  value_bool = excluded.value_bool,
+                  value_json = excluded.value_json,
+                  answered_at = CURRENT_TIMESTAMP
+    """
+)
+
+_UPSERT_PG_SQL = sql_text(
+    """
+    INSERT INTO response (response_id, response_set_id, question_id, option_id, value_text, value_number, value_bool, value_json, answered_at)
+    VALUES (:rid, :rs, :qid, :opt, :vtext, :vnum, :vbool, CAST(:vjson AS JSONB), now())
+    ON CONFLICT (response_set_id, question_id)
+    DO UPDATE SET option_id = EXCLUDED.option_id,
+                  value_text = EXCLUDED.value_text,
+                  value_number = EXCLUDED.value_number,
+                  value_bool = EXCLUDED.value_bool,
+                  value_json = EXCLUDED.value_json,
+                  answered_at = now()
+    """
+)
+
+_DELETE_ANSWER_SQL = sql_text(
+    "DELETE FROM response WHERE response_set_id = :rs AND question_id = :qid"
+)
+
+
+def _with_option_value(question_id: str, value: Any, option_id: Any) -> Any:
+    """Fill the value token of an option-only enum answer from the option index."""
+    if value is not None or option_id is None:
+        return value
+    return enum_option_value(str(question_id), str(option_id))
+
+
+def _upsert_statement(eng: Any) -> Any:
+    """Return the dialect-specific upsert (SQLite in local dev/CI, else Postgres)."""
+    dialect = getattr(eng, "dialect", None)
+    dname = getattr(dialect, "name", "") if dialect else ""
+    return _UPSERT_SQLITE_SQL if dname == "sqlite" else _UPSERT_PG_SQL
+
+
+def _upsert_params(
+    response_set_id: str, question_id: str, value: Any, option_id: Any, *, is_sqlite: bool
+) -> Dict[str, Any]:
+    return {
+        "rid": str(
+            uuid.uuid5(
+                uuid.NAMESPACE_URL,
+                f"epic-b:{response_set_id}:{question_id}",
+            )
+        ),
+        "rs": response_set_id,
+        "qid": question_id,
+        "opt": option_id,
+        "vtext": value if isinstance(value, str) else None,
+        # Only populate value_number for numeric (non-bool) values
+        "vnum": float(value) if (isinstance(value, (int, float)) and not isinstance(value, bool)) else None,
+        # Booleans populate value_bool exclusively
+        "vbool": bool(value) if isinstance(value, bool) else None,
+        "vjson": json.dumps(value) if value is not None else (None if is_sqlite else "null"),
+    }
+
+
+def _mirror_answer(
+    response_set_id: str, question_id: str, value: Any, option_id: Any, *, pinned: bool
+) -> None:
+    """Store canonicalized parts in the answer cache.
+
+    `pinned` marks answers whose DB write failed: the cache then holds the
+    only copy and must not evict it.
+    """
+    vtext: str | None = value if isinstance(value, str) else None
+    vnum: float | None = (
+        float(value)
+        if (isinstance(value, (int, float)) and not isinstance(value, bool))
+        else None
+    )
+    vbool: bool | None = (bool(value) if isinstance(value, bool) else None)
+    # Clarke: normalize option_id to string to ensure equality checks are stable
+    opt_str: str | None = (str(option_id) if option_id is not None else None)
+    key = (str(response_set_id), str(question_id))
+    _INMEM_ANSWERS[key] = (opt_str, vtext, vnum, vbool)
+    if pinned:
+        pin = getattr(_INMEM_ANSWERS, "pin", None)
+        if pin is not None:
+            pin(key)
+
+
+def _mirror_fallback_answer(response_set_id: str, question_id: str, value: Any, option_id: Any) -> None:
+    """Pin an answer whose DB write failed, logging instead of raising.
+
+    Shared SQL stores live in the same database that just failed, so the
+    fallback copy can fail too; the write then degrades to a logged loss.
+    """
+    try:
+        _mirror_answer(response_set_id, question_id, value, option_id, pinned=True)
+    except Exception:
+        logger.error(
+            "in-memory fallback failed rs_id=%s q_id=%s",
+            response_set_id,
+            question_id,
+            exc_info=True,
+        )
+
+
 def upsert_answer(
     response_set_id: str,
     question_id: str,
@@ -269,99 +561,22 @@ def upsert_answer(
     still producing a new Screen-ETag. Only bump the screen version after a
     successful DB commit or after storing the fallback tuple.
     """
+    before = get_existing_answer(response_set_id, question_id) if _tracks_screen_states(response_set_id) else None
+    option_id = payload.get("option_id") if isinstance(payload, dict) else None
+    value = _with_option_value(question_id, payload.get("value") if isinstance(payload, dict) else None, option_id)
     try:
-        option_id = payload.get("option_id") if isinstance(payload, dict) else None
-        value = payload.get("value") if isinstance(payload, dict) else None
         eng = get_engine()
+        stmt = _upsert_statement(eng)
         with eng.begin() as conn:
-            # Dialect-specific upsert to support SQLite in local dev/CI
-            dialect = getattr(eng, "dialect", None)
-            dname = getattr(dialect, "name", "") if dialect else ""
-            is_sqlite = (dname == "sqlite")
-
-            if is_sqlite:
-                conn.execute(
-                    sql_text(
-                        """
-                        INSERT INTO response (response_id, response_set_id, question_id, option_id, value_text, value_number, value_bool, value_json, answered_at)
-                        VALUES (:rid, :rs, :qid, :opt, :vtext, :vnum, :vbool, :vjson, CURRENT_TIMESTAMP)
-                        ON CONFLICT(response_set_id, question_id)
-                        DO UPDATE SET option_id = excluded.option_id,
-                                      value_text = excluded.value_text,
-                                      value_number = excluded.value_number,
-                                      value_bool = excluded.value_bool,
-                                      value_json = excluded.value_json,
-                                      answered_at = CURRENT_TIMESTAMP
-                        """
-                    ),
-                    {
-                        "rid": str(
-                            uuid.uuid5(
-                                uuid.NAMESPACE_URL,
-                                f"epic-b:{response_set_id}:{question_id}",
-                            )
-                        ),
-                        "rs": response_set_id,
-                        "qid": question_id,
-                        "opt": option_id,
-                        "vtext": value if isinstance(value, str) else None,
-                        # Only populate value_number for numeric (non-bool) values
-                        "vnum": float(value) if (isinstance(value, (int, float)) and not isinstance(value, bool)) else None,
-                        # Booleans populate value_bool exclusively
-                        "vbool": bool(value) if isinstance(value, bool) else None,
-                        "vjson": json.dumps(value) if value is not None else None,
-                    },
-                )
-            else:
-                conn.execute(
-                    sql_text(
-                        """
-                        INSERT INTO response (response_id, response_set_id, question_id, option_id, value_text, value_number, value_bool, value_json, answered_at)
-                        VALUES (:rid, :rs, :qid, :opt, :vtext, :vnum, :vbool, CAST(:vjson AS JSONB), now())
-                        ON CONFLICT (response_set_id, question_id)
-                        DO UPDATE SET option_id = EXCLUDED.option_id,
-                                      value_text = EXCLUDED.value_text,
-                                      value_number = EXCLUDED.value_number,
-                                      value_bool = EXCLUDED.value_bool,
-                                      value_json = EXCLUDED.value_json,
-                                      answered_at = now()
-                        """
-                    ),
-                    {
-                        "rid": str(
-                            uuid.uuid5(
-                                uuid.NAMESPACE_URL,
-                                f"epic-b:{response_set_id}:{question_id}",
-                            )
-                        ),
-                        "rs": response_set_id,
-                        "qid": question_id,
-                        "opt": option_id,
-                        "vtext": value if isinstance(value, str) else None,
-                        # Only populate value_number for numeric (non-bool) values
-                        "vnum": float(value) if (isinstance(value, (int, float)) and not isinstance(value, bool)) else None,
-                        # Booleans populate value_bool exclusively
-                        "vbool": bool(value) if isinstance(value, bool) else None,
-                        "vjson": json.dumps(value) if value is not None else "null",
-                    },
-                )
+            conn.execute(
+                stmt,
+                _upsert_params(
+                    response_set_id, question_id, value, option_id, is_sqlite=stmt is _UPSERT_SQLITE_SQL
+                ),
+            )
         # After successful commit, mirror canonicalized parts into in-memory store
         try:
-            vtext: str | None = value if isinstance(value, str) else None
-            vnum: float | None = (
-                float(value)
-                if (isinstance(value, (int, float)) and not isinstance(value, bool))
-                else None
-            )
-            vbool: bool | None = (bool(value) if isinstance(value, bool) else None)
-            # Clarke: normalize option_id to string to ensure equality checks are stable
-            opt_str: str | None = (str(option_id) if option_id is not None else None)
-            _INMEM_ANSWERS[(str(response_set_id), str(question_id))] = (
-                opt_str,
-                vtext,
-                vnum,
-                vbool,
-            )
+            _mirror_answer(response_set_id, question_id, value, option_id, pinned=False)
         except Exception:
             # Mirroring must not break the success path
             logger.error(
@@ -375,10 +590,6 @@ def upsert_answer(
             logger.info("answers_write rs_id=%s q_id=%s path=%s", response_set_id, question_id, "db_ok")
         except Exception:
             pass
-        screen_key = get_screen_key_for_question(question_id) or "profile"
-        _bump_screen_version(response_set_id, screen_key)
-        state_version = get_screen_version(response_set_id, screen_key)
-        return {"state_version": int(state_version), "question_id": str(question_id)}
     except Exception:
         # Fallback: capture canonicalized value parts and persist in-memory,
         # then bump the screen version so ETag changes are observable.
@@ -388,32 +599,109 @@ def upsert_answer(
             question_id,
             exc_info=True,
         )
-        vtext: str | None = value if isinstance(value, str) else None
-        vnum: float | None = (
-            float(value)
-            if (isinstance(value, (int, float)) and not isinstance(value, bool))
-            else None
+        _mirror_fallback_answer(response_set_id, question_id, value, option_id)
+    else:
+        mark_answered(response_set_id, [question_id])
+    _sync_screen_states(response_set_id, question_id, before)
+    screen_key = get_screen_key_for_question(question_id) or "profile"
+    _bump_screen_version(response_set_id, screen_key)
+    state_version = get_screen_version(response_set_id, screen_key)
+    return {"state_version": int(state_version), "question_id": str(question_id)}
+
+
+def bulk_upsert_answers(
+    response_set_id: str,
+    upserts: list[tuple[str, Any, Any]],
+    clears: list[str],
+    screen_of: Mapping[str, str],
+) -> Dict[str, int]:
+    """Write many answers for one response set in a single transaction.
+
+    `upserts` holds (question_id, value, option_id) and `clears` question_ids
+    to delete; `screen_of` maps every touched question to its screen_key.
+    Upserts are written before clears, so each question_id must appear at
+    most once across both lists: callers collapse a batch to the last
+    operation per question first.
+    Rows go through one executemany upsert plus one executemany delete. On
+    DB failure the whole batch falls back to the in-memory store, as
+    `upsert_answer` does per item. Each affected screen's version is bumped
+    once; returns {screen_key: new_version}.
+    """
+    rs_id = str(response_set_id)
+    touched = [q for q, _v, _o in upserts] + list(clears)
+    if not touched:
+        return {}
+    single = len(set(touched)) == 1
+    before = (
+        get_existing_answer(rs_id, touched[0]) if single and _tracks_screen_states(rs_id) else None
+    )
+    upserts = [(q, _with_option_value(q, v, o), o) for q, v, o in upserts]
+    pinned = False
+    try:
+        eng = get_engine()
+        stmt = _upsert_statement(eng)
+        is_sqlite = stmt is _UPSERT_SQLITE_SQL
+        with eng.begin() as conn:
+            if upserts:
+                conn.execute(
+                    stmt,
+                    [_upsert_params(rs_id, q, v, o, is_sqlite=is_sqlite) for q, v, o in upserts],
+                )
+            if clears:
+                conn.execute(_DELETE_ANSWER_SQL, [{"rs": rs_id, "qid": q} for q in clears])
+        logger.info(
+            "answers_bulk_write rs_id=%s upserts=%s clears=%s path=%s", rs_id, len(upserts), len(clears), "db_ok"
         )
-        vbool: bool | None = (bool(value) if isinstance(value, bool) else None)
-        # Clarke: normalize option_id to string when mirroring in fallback path as well
-        opt_str2: str | None = (str(option_id) if option_id is not None else None)
-        _INMEM_ANSWERS[(str(response_set_id), str(question_id))] = (
-            opt_str2,
-            vtext,
-            vnum,
-            vbool,
+    except Exception:
+        logger.error(
+            "bulk_upsert_answers DB write failed rs_id=%s items=%s; falling back to in-memory",
+            rs_id,
+            len(touched),
+            exc_info=True,
         )
-        screen_key = get_screen_key_for_question(question_id) or "profile"
-        _bump_screen_version(response_set_id, screen_key)
-        state_version = get_screen_version(response_set_id, screen_key)
-        return {"state_version": int(state_version), "question_id": str(question_id)}
+        pinned = True
+    for qid, value, option_id in upserts:
+        if pinned:
+            _mirror_fallback_answer(rs_id, qid, value, option_id)
+        else:
+            _mirror_answer(rs_id, qid, value, option_id, pinned=False)
+    for qid in clears:
+        _INMEM_ANSWERS.pop((rs_id, str(qid)), None)
+    if not pinned:
+        mark_answered(rs_id, [q for q, _v, _o in upserts])
+        mark_cleared(rs_id, clears)
+
+    screens = {screen_of.get(q) or "profile" for q in touched}
+    if single:
+        _sync_screen_states(rs_id, touched[0], before)
+    elif _tracks_screen_states(rs_id):
+        # Items in one batch can gate each other; reseed maintained state
+        # instead of replaying flips against intermediate values
+        invalidate_screen_states(rs_id)
+        if is_shared_answer_state():
+            for qid in set(touched):
+                try:
+                    graph = get_graph_for_question(qid)
+                except Exception:
+                    logger.error("bulk_upsert_answers graph lookup failed q_id=%s", qid, exc_info=True)
+                    continue
+                if graph is not None and qid in graph:
+                    screens.update(
+                        s for s in (graph.screen_of.get(d) for d in graph.descendants(qid)) if s
+                    )
+    versions: Dict[str, int] = {}
+    for skey in sorted(screens):
+        _bump_screen_version(rs_id, skey)
+        versions[skey] = get_screen_version(rs_id, skey)
+    return versions
+
 
 def response_id_exists(response_id: str) -> bool:
     """Return True if a response with the given response_id exists."""
     eng = get_engine()
     with eng.connect() as conn:
         row = conn.execute(
-            sql_text("SELECT 1 FROM response WHERE response_id = :rid"),
+            _RESPONSE_ID_EXISTS_SQL,
             {"rid": response_id},
         ).fetchone()
     return row is not None
@@ -425,17 +713,15 @@ def delete_answer(response_set_id: str, question_id: str) -> None:
     On DB failure, delete from in-memory store and bump the per-screen version
     counter so ETag reflects deletion.
     """
+    before = get_existing_answer(response_set_id, question_id) if _tracks_screen_states(response_set_id) else None
     try:
         eng = get_engine()
         with eng.begin() as conn:
-            conn.execute(
-                sql_text(
-                    "DELETE FROM response WHERE response_set_id = :rs AND question_id = :qid"
-                ),
-                {"rs": response_set_id, "qid": question_id},
-            )
+            conn.execute(_DELETE_ANSWER_SQL, {"rs": response_set_id, "qid": question_id})
         # Remove any mirrored in-memory entry to keep caches consistent
         _INMEM_ANSWERS.pop((response_set_id, question_id), None)
+        mark_cleared(response_set_id, [question_id])
+        _sync_screen_states(response_set_id, question_id, before)
         # Ensure subsequent Screen-ETag changes by bumping version after successful delete
         screen_key = get_screen_key_for_question(question_id) or "profile"
         _bump_screen_version(response_set_id, screen_key)
@@ -451,6 +737,7 @@ def delete_answer(response_set_id: str, question_id: str) -> None:
             exc_info=True,
         )
         _INMEM_ANSWERS.pop((response_set_id, question_id), None)
+        _sync_screen_states(response_set_id, question_id, before)
         screen_key = get_screen_key_for_question(question_id) or "profile"
         _bump_screen_version(response_set_id, screen_key)
         try:
@@ -458,12 +745,216 @@ def delete_answer(response_set_id: str, question_id: str) -> None:
         except Exception:
             pass
 
+@dataclass(frozen=True)
+class ScreenSnapshot:
+    """Immutable view of one screen's questions, rules and answers.
+
+    `answers` covers every question on the screen plus all ancestors of its
+    questions (which may live on other screens). Derived parent values and the
+    visible set are computed once on demand; when the questionnaire graph is
+    known, parents hidden by their own ancestors expose None so visibility is
+    transitive.
+    """
+
+    response_set_id: str
+    screen_key: str
+    questions: Tuple[Mapping[str, Any], ...]
+    rules: Mapping[str, tuple]
+    answers: Mapping[str, tuple]
+    version: int = 0
+    loaded_from: str = field(default="db", compare=False)
+    graph: QuestionnaireGraph | None = field(default=None, compare=False)
+
+    def answer_for(self, question_id: str) -> tuple | None:
+        return self.answers.get(str(question_id))
+
+    def _stored_value(self, question_id: str) -> str | None:
+        row = self.answers.get(str(question_id))
+        if row is None:
+            return None
+        _opt, vtext, vnum, vbool = row
+        cv = canonicalize_answer_value(vtext, vnum, vbool)
+        return str(cv) if cv is not None else None
+
+    @cached_property
+    def parent_values(self) -> Mapping[str, str | None]:
+        """Effective canonical value per parent question_id (None when unanswered or hidden)."""
+        out: dict[str, str | None] = {
+            str(parent_id): self._stored_value(parent_id)
+            for parent_id, _vis in self.rules.values()
+            if parent_id is not None
+        }
+        if self.graph is not None:
+            out = effective_values(self.graph, out, self._stored_value)
+        return MappingProxyType(out)
+
+    @cached_property
+    def visible_ids(self) -> frozenset[str]:
+        return frozenset(str(x) for x in compute_visible_set(self.rules, dict(self.parent_values)))
+
+
+def _remember_screen_state(snapshot: ScreenSnapshot) -> ScreenSnapshot:
+    """Seed the maintained Screen-ETag state from a freshly loaded snapshot."""
+    try:
+        record_screen_state(
+            snapshot.response_set_id, snapshot.screen_key, snapshot.version, snapshot.visible_ids
+        )
+    except Exception:
+        logger.error(
+            "screen_state_record_failed rs_id=%s screen_key=%s",
+            snapshot.response_set_id,
+            snapshot.screen_key,
+            exc_info=True,
+        )
+    return snapshot
+
+
+_SNAPSHOT_SQL = sql_text(
+    """
+    SELECT q.question_id, q.external_qid, q.question_text, q.answer_kind, q.mandatory,
+           q.question_order, q.screen_key,
+           r.response_set_id, r.option_id, r.value_text, r.value_number, r.value_bool, r.value_json
+    FROM questionnaire_question q
+    LEFT JOIN response r
+      ON r.question_id = q.question_id AND r.response_set_id = :rs
+    WHERE q.screen_key = :skey OR q.question_id IN :parents
+    ORDER BY q.question_order ASC, q.question_id ASC
+    """
+).bindparams(bindparam("parents", expanding=True))
+
+
+def _load_screen_snapshot_fallback(
+    rs_id: str,
+    skey: str,
+    rules: Mapping[str, tuple],
+    parents: list[str],
+    graph: QuestionnaireGraph | None = None,
+) -> ScreenSnapshot:
+    """Compose a snapshot from the per-call helpers (schema variance path)."""
+    questions = tuple(MappingProxyType(q) for q in list_questions_for_screen(skey))
+    answers: dict[str, tuple] = {}
+    for qid in {q["question_id"] for q in questions} | set(parents):
+        row = get_existing_answer(rs_id, qid)
+        if row is not None:
+            answers[qid] = row
+    return _remember_screen_state(
+        ScreenSnapshot(
+            response_set_id=rs_id,
+            screen_key=skey,
+            questions=questions,
+            rules=MappingProxyType(dict(rules)),
+            answers=MappingProxyType(answers),
+            version=get_screen_version(rs_id, skey),
+            loaded_from="fallback",
+            graph=graph,
+        )
+    )
+
+
+def _snapshot_inputs(skey: str) -> tuple[dict, list[str], QuestionnaireGraph | None]:
+    """Return (rules, parent ids, graph) for a screen."""
+    rules = get_visibility_rules_for_screen(skey)
+    parent_set = {str(p) for (p, _v) in rules.values() if p is not None}
+    graph: QuestionnaireGraph | None = None
+    if parent_set:
+        first = next(iter(rules))
+        try:
+            graph = get_graph_for_question(first)
+        except Exception:
+            logger.error("load_screen_snapshot graph lookup failed screen_key=%s", skey, exc_info=True)
+        if graph is not None:
+            parent_set |= graph.ancestors(rules.keys())
+    return rules, sorted(parent_set), graph
+
+
+def _snapshot_from_rows(
+    rs_id: str,
+    skey: str,
+    rules: Mapping[str, tuple],
+    graph: QuestionnaireGraph | None,
+    rows: Sequence[Sequence[Any]],
+) -> ScreenSnapshot:
+    questions: list[Mapping[str, Any]] = []
+    answers: dict[str, tuple] = {}
+    seen: set[str] = set()
+    for row in rows:
+        qid = str(row[0])
+        if qid in seen:
+            continue
+        seen.add(qid)
+        if row[6] is not None and str(row[6]) == skey:
+            questions.append(
+                MappingProxyType(
+                    {
+                        "question_id": qid,
+                        "external_qid": row[1],
+                        "question_text": row[2],
+                        "answer_kind": row[3],
+                        "mandatory": bool(row[4]),
+                        "question_order": int(row[5]),
+                    }
+                )
+            )
+        cached = _INMEM_ANSWERS.get((rs_id, qid))
+        if cached is not None:
+            answers[qid] = cached
+        elif row[7] is not None:
+            tup = _answer_tuple_from_columns(row[8], row[9], row[10], row[11], row[12])
+            _INMEM_ANSWERS[(rs_id, qid)] = tup
+            answers[qid] = tup
+    return _remember_screen_state(
+        ScreenSnapshot(
+            response_set_id=rs_id,
+            screen_key=skey,
+            questions=tuple(questions),
+            rules=MappingProxyType(dict(rules)),
+            answers=MappingProxyType(answers),
+            version=get_screen_version(rs_id, skey),
+            graph=graph,
+        )
+    )
+
+
+def load_screen_snapshot(response_set_id: str, screen_key: str) -> ScreenSnapshot:
+    """Load questions, visibility rules and relevant answers for a screen.
+
+    Rules come from the compiled per-screen cache; questions and answers for
+    the screen and every ancestor of its questions (from the cached
+    questionnaire graph) are fetched in a single joined query.
+    In-memory answers take precedence over DB rows (read-your-writes) and DB
+    rows are mirrored into the in-memory store, matching get_existing_answer.
+    """
+    rs_id = str(response_set_id)
+    skey = str(screen_key)
+    rules, parents, graph = _snapshot_inputs(skey)
+    try:
+        with get_engine().connect() as conn:
+            rows = conn.execute(
+                _SNAPSHOT_SQL, {"rs": rs_id, "skey": skey, "parents": parents}
+            ).fetchall()
+    except Exception:
+        logger.error(
+            "load_screen_snapshot joined read failed rs_id=%s screen_key=%s; composing from helpers",
+            rs_id,
+            skey,
+            exc_info=True,
+        )
+        return _load_screen_snapshot_fallback(rs_id, skey, rules, parents, graph)
+    return _snapshot_from_rows(rs_id, skey, rules, graph, rows)
+
+
 __all__ = [
     "get_screen_key_for_question",
     "get_answer_kind_for_question",
     "get_existing_answer",
+    "get_questions_screen_and_kind",
     "upsert_answer",
+    "bulk_upsert_answers",
     "response_id_exists",
     "delete_answer",
     "get_screen_version",
+    "get_write_generation",
+    "get_answer_cache_stats",
+    "ScreenSnapshot",
+    "load_screen_snapshot",
 ]
@@ -10,6 +10,10 @@ import logging
 from sqlalchemy import text as sql_text
 
 from app.db.base import get_engine
+from app.logic.repository_screens import invalidate_visibility_rules_cache
+from app.logic.visibility_graph import invalidate_questionnaire_graph
+from app.logic.question_meta import invalidate_question_meta
+from app.logic.parent_index import record_parent_link, record_question, would_create_cycle
 
 logger = logging.getLogger(__name__)
 
@@ -88,6 +92,10 @@ def move_question_to_screen(question_id: str, target_screen_key: str) -> None:
             exc_info=True,
         )
         raise
+    # Both source and target screens change membership; drop all compiled rules
+    invalidate_visibility_rules_cache()
+    invalidate_questionnaire_graph()
+    invalidate_question_meta()
 
 
 def update_question_text(question_id: str, new_text: str) -> None:
@@ -179,6 +187,10 @@ def create_question(*, screen_id: str, question_text: str, order_value: int) ->
             exc_info=True,
         )
         raise
+    invalidate_visibility_rules_cache(resolved_screen_key)
+    invalidate_questionnaire_graph()
+    invalidate_question_meta()
+    record_question(new_qid, new_qid)
     return {"question_id": new_qid, "external_qid": new_qid}
 
 
@@ -268,6 +280,10 @@ def update_question_visibility(*, question_id: str, parent_qid: str | None, visi
             exc_info=True,
         )
         raise
+    invalidate_visibility_rules_cache()
+    invalidate_questionnaire_graph()
+    invalidate_question_meta()
+    record_parent_link(question_id, parent_qid)
 
 
 def get_question_text_and_order(question_id: str) -> tuple[str, int] | None:
@@ -340,23 +356,16 @@ def resolve_question_identifier(token: str) -> str | None:
 
 
 def is_parent_cycle(question_id: str, parent_qid: str) -> bool:
-    """Return True if setting `parent_qid` would create a two-node cycle.
+    """Return True if setting `parent_qid` would create a parent cycle.
 
-    Detects self-parenting and the case where the parent already points back
-    to the child. Uses read-only queries and logs errors.
+    Detects self-parenting and cycles of any length by walking the proposed
+    parent's ancestors in the in-memory parent index, confirming the walked
+    links with one keyed query (O(depth) rows). Logs errors.
     """
     if str(question_id) == str(parent_qid):
         return True
-    eng = get_engine()
     try:
-        with eng.connect() as conn:
-            row = conn.execute(
-                sql_text(
-                    "SELECT parent_question_id FROM questionnaire_question WHERE question_id = :pid"
-                ),
-                {"pid": parent_qid},
-            ).fetchone()
-        return bool(row and row[0] is not None and str(row[0]) == str(question_id))
+        return would_create_cycle(question_id, parent_qid)
     except Exception:
         logger.error(
             "is_parent_cycle read failed child=%s parent=%s",
@@ -9,6 +9,8 @@ from sqlalchemy import text as sql_text
 
 from app.db.base import get_engine
 
+_RESPONSE_SET_EXISTS_SQL = sql_text("SELECT 1 FROM response_set WHERE response_set_id = :rs LIMIT 1")
+
 # In-memory registry for skeleton mode to recognise created ids without DB
 _INMEM_RS_REGISTRY: set[str] = set()
 
@@ -44,7 +46,7 @@ def response_set_exists(response_set_id: str) -> bool:
         eng = get_engine()
         with eng.connect() as conn:
             row = conn.execute(
-                sql_text("SELECT 1 FROM response_set WHERE response_set_id = :rs LIMIT 1"),
+                _RESPONSE_SET_EXISTS_SQL,
                 {"rs": response_set_id},
             ).fetchone()
         return row is not None
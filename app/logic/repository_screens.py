@@ -16,9 +16,53 @@ from sqlalchemy import text as sql_text
 from sqlalchemy.exc import ProgrammingError
 
 from app.db.base import get_engine
+from app.logic.question_meta import get_question_meta, question_meta_generation
 
 logger = logging.getLogger(__name__)
 
+# Statements on the runtime read path (screen GET, answer PATCH) are built once
+# at import: SQLAlchemy's compiled cache and the driver's prepared-statement
+# cache are keyed on the SQL string, so reusing one construct also skips
+# re-parsing its bind parameters on every call.
+_SCREEN_META_BY_ID_SQL = sql_text("SELECT screen_key, title FROM screen WHERE screen_id = :sid")
+_SCREEN_META_BY_KEY_SQL = sql_text("SELECT screen_key, title FROM screen WHERE screen_key = :skey")
+_SCREEN_ID_FOR_KEY_SQL = sql_text("SELECT screen_id FROM screen WHERE screen_key = :skey")
+_SCREEN_BY_KEY_SQL = sql_text("SELECT screen_id, screen_key FROM screen WHERE screen_key = :skey")
+_QUESTION_SCREEN_KEY_SQL = sql_text(
+    "SELECT screen_key FROM questionnaire_question WHERE question_id = :qid"
+)
+_QUESTION_SCREEN_KEY_JOIN_SQL = sql_text(
+    "SELECT s.screen_key FROM questionnaire_question q JOIN screen s ON q.screen_id = s.screen_id WHERE q.question_id = :qid"
+)
+_SCREEN_QUESTIONS_SQL = sql_text(
+    """
+    SELECT question_id, external_qid, question_text, answer_kind, mandatory, question_order
+    FROM questionnaire_question
+    WHERE screen_key = :skey
+    ORDER BY question_order ASC, question_id ASC
+    """
+)
+_SCREEN_QUESTIONS_JOIN_SQL = sql_text(
+    """
+    SELECT q.question_id, q.external_qid, q.question_text, q.answer_kind, q.mandatory, q.question_order
+    FROM questionnaire_question q
+    JOIN screen s ON q.screen_id = s.screen_id
+    WHERE s.screen_key = :skey
+    ORDER BY q.question_order ASC, q.question_id ASC
+    """
+)
+_QUESTION_EXISTS_SQL = sql_text("SELECT 1 FROM questionnaire_question WHERE question_id = :qid LIMIT 1")
+_SCREEN_RESPONSE_COUNT_SQL = sql_text(
+    """
+    SELECT COUNT(*)
+    FROM response r
+    WHERE r.response_set_id = :rs
+      AND r.question_id IN (
+          SELECT q.question_id FROM questionnaire_question q WHERE q.screen_key = :skey
+      )
+    """
+)
+
 
 def get_screen_metadata(screen_id: str) -> tuple[str, str] | None:
     """Return (screen_key, title) for a given screen identifier.
@@ -39,12 +83,12 @@ def get_screen_metadata(screen_id: str) -> tuple[str, str] | None:
     with eng.connect() as conn:
         if is_uuid:
             row = conn.execute(
-                sql_text("SELECT screen_key, title FROM screen WHERE screen_id = :sid"),
+                _SCREEN_META_BY_ID_SQL,
                 {"sid": screen_id},
             ).fetchone()
         else:
             row = conn.execute(
-                sql_text("SELECT screen_key, title FROM screen WHERE screen_key = :skey"),
+                _SCREEN_META_BY_KEY_SQL,
                 {"skey": screen_id},
             ).fetchone()
     if not row:
@@ -61,7 +105,7 @@ def get_screen_id_for_key(screen_key: str) -> str | None:
     eng = get_engine()
     with eng.connect() as conn:
         row = conn.execute(
-            sql_text("SELECT screen_id FROM screen WHERE screen_key = :skey"),
+            _SCREEN_ID_FOR_KEY_SQL,
             {"skey": screen_key},
         ).fetchone()
     if not row:
@@ -79,7 +123,7 @@ def get_screen_by_key(screen_key: str) -> dict | None:
     eng = get_engine()
     with eng.connect() as conn:
         row = conn.execute(
-            sql_text("SELECT screen_id, screen_key FROM screen WHERE screen_key = :skey"),
+            _SCREEN_BY_KEY_SQL,
             {"skey": screen_key},
         ).fetchone()
     if not row:
@@ -96,23 +140,23 @@ def get_screen_key_for_question(question_id: str) -> str | None:
     """Return the screen_key for a given question_id, or None if missing.
 
     Deterministically resolves the parent screen for a question to align
-    PATCH ETag computation with the GET screen view.
+    PATCH ETag computation with the GET screen view. Served from the question
+    metadata cache when the question belongs to a questionnaire.
     """
+    meta = get_question_meta(question_id)
+    if meta is not None and meta.screen_key:
+        return meta.screen_key
     eng = get_engine()
     try:
         with eng.connect() as conn:
             row = conn.execute(
-                sql_text(
-                    "SELECT screen_key FROM questionnaire_question WHERE question_id = :qid"
-                ),
+                _QUESTION_SCREEN_KEY_SQL,
                 {"qid": question_id},
             ).fetchone()
             # Fallback join on screens when screen_key is not directly available
             if not row or row[0] is None:
                 row = conn.execute(
-                    sql_text(
-                        "SELECT s.screen_key FROM questionnaire_question q JOIN screen s ON q.screen_id = s.screen_id WHERE q.question_id = :qid"
-                    ),
+                    _QUESTION_SCREEN_KEY_JOIN_SQL,
                     {"qid": question_id},
                 ).fetchone()
     except ProgrammingError:
@@ -120,9 +164,7 @@ def get_screen_key_for_question(question_id: str) -> str | None:
         try:
             with eng.connect() as conn:
                 row = conn.execute(
-                    sql_text(
-                        "SELECT s.screen_key FROM questionnaire_question q JOIN screen s ON q.screen_id = s.screen_id WHERE q.question_id = :qid"
-                    ),
+                    _QUESTION_SCREEN_KEY_JOIN_SQL,
                     {"qid": question_id},
                 ).fetchone()
         except Exception:
@@ -143,28 +185,13 @@ def list_questions_for_screen(screen_key: str) -> list[dict]:
         # Support both schemas: direct screen_key column or FK via screens table
         try:
             rows = conn.execute(
-                sql_text(
-                    """
-                    SELECT question_id, external_qid, question_text, answer_kind, mandatory, question_order
-                    FROM questionnaire_question
-                    WHERE screen_key = :skey
-                    ORDER BY question_order ASC, question_id ASC
-                    """
-                ),
+                _SCREEN_QUESTIONS_SQL,
                 {"skey": screen_key},
             ).fetchall()
         except Exception:
             # Fallback: resolve via join on screens when questionnaire_question has screen_id only
             rows = conn.execute(
-                sql_text(
-                    """
-                    SELECT q.question_id, q.external_qid, q.question_text, q.answer_kind, q.mandatory, q.question_order
-                    FROM questionnaire_question q
-                    JOIN screen s ON q.screen_id = s.screen_id
-                    WHERE s.screen_key = :skey
-                    ORDER BY q.question_order ASC, q.question_id ASC
-                    """
-                ),
+                _SCREEN_QUESTIONS_JOIN_SQL,
                 {"skey": screen_key},
             ).fetchall()
 
@@ -247,29 +274,89 @@ def question_exists_on_screen(question_id: str) -> bool:
     eng = get_engine()
     with eng.connect() as conn:
         row = conn.execute(
-            sql_text("SELECT 1 FROM questionnaire_question WHERE question_id = :qid LIMIT 1"),
+            _QUESTION_EXISTS_SQL,
             {"qid": question_id},
         ).fetchone()
     return row is not None
 
 
-def get_visibility_rules_for_screen(screen_key: str) -> dict[str, tuple[str | None, list | None]]:
-    """Return visibility metadata for all questions on a screen.
+# Process-wide compiled visibility rules keyed by screen_key. Entries hold the
+# resolved parent question_id and a frozenset of canonical visible-if tokens per
+# child so runtime reads never re-query or re-parse. Authoring writes that touch
+# parents, visible-if values or screen membership must call
+# `invalidate_visibility_rules_cache`. Each entry also records the question
+# metadata generation it was compiled under and is recompiled once that moves,
+# so it expires with the metadata TTL like every other authoring-derived cache.
+_VISIBILITY_RULES_CACHE: dict[str, tuple[int, dict[str, tuple[str | None, frozenset[str] | None]]]] = {}
 
-    For each question_id on the given screen_key, return a tuple of
-    (parent_question_id, visible_if_value_list_or_none).
 
-    - Base questions (no parent) map to (None, None)
-    - Child questions include their parent's UUID and a list of string values
-      that should make the child visible when equal to the parent's canonical
-      answer value.
+def invalidate_visibility_rules_cache(screen_key: str | None = None) -> None:
+    """Drop compiled visibility rules for one screen, or for all screens.
+
+    Called by authoring writes (visibility updates, question moves, question
+    creation and CSV import). Passing None clears the whole cache, which is the
+    safe choice when the affected screens are not known to the caller.
+    """
+    if screen_key is None:
+        _VISIBILITY_RULES_CACHE.clear()
+    else:
+        _VISIBILITY_RULES_CACHE.pop(str(screen_key), None)
+    logger.info("visibility_rules_cache_invalidated screen_key=%s", screen_key)
+
+
+def _canonical_visible_token(x: Any) -> str:
+    if isinstance(x, bool):
+        return "true" if x else "false"
+    xs = str(x)
+    return xs.lower() if xs.lower() in {"true", "false"} else xs
+
+
+def compile_visible_if_values(val: Any, screen_key: str) -> frozenset[str] | None:
+    """Parse a stored visible_if_value into a frozenset of canonical tokens.
+
+    Accepts native lists, JSON array text, JSON scalars and bare strings;
+    boolean-like tokens are canonicalized to 'true'/'false'.
+    """
+    if val is None:
+        return None
+    # If the DB already returns a native list/array, normalize directly
+    if isinstance(val, (list, tuple)):
+        return frozenset(_canonical_visible_token(x) for x in val)
+    s = str(val).strip()
+    if not s:
+        return None
+    # Accept JSON array in text if present, else a single value
+    try:
+        parsed = json.loads(s)
+        if isinstance(parsed, list):
+            return frozenset(_canonical_visible_token(x) for x in parsed)
+        # If JSON parses to a scalar, treat as single visible value
+        if isinstance(parsed, (str, bool)):
+            return frozenset({_canonical_visible_token(parsed)})
+    except json.JSONDecodeError:
+        logger.error(
+            "visible_if JSON decode failed for screen_key=%s payload=%s",
+            screen_key,
+            s,
+            exc_info=True,
+        )
+    # Single value path: canonicalize boolean-like tokens
+    return frozenset({_canonical_visible_token(s)})
+
+
+def _load_visibility_rules(screen_key: str) -> dict[str, tuple[str | None, frozenset[str] | None]]:
+    """Read and compile visibility rules for a screen from the database.
+
+    A single scan returns rule columns and external_qid together; non-UUID
+    parent tokens are resolved against that map first and only fall back to a
+    cross-screen external_qid lookup when unresolved.
     """
     eng = get_engine()
     with eng.connect() as conn:
         rows = conn.execute(
             sql_text(
                 """
-                SELECT question_id, parent_question_id, visible_if_value
+                SELECT question_id, parent_question_id, visible_if_value, external_qid
                 FROM questionnaire_question
                 WHERE screen_key = :skey
                 """
@@ -277,138 +364,77 @@ def get_visibility_rules_for_screen(screen_key: str) -> dict[str, tuple[str | No
             {"skey": screen_key},
         ).fetchall()
 
-    # Build a mapping of external_qid -> question_id for this screen to allow
-    # resolving non-UUID parent_question_id tokens (e.g., external_qid like 'q_parent_bool').
-    ext_to_qid: dict[str, str] = {}
-    try:
-        with eng.connect() as conn:
-            ext_rows = conn.execute(
-                sql_text(
-                    """
-                    SELECT external_qid, question_id
-                    FROM questionnaire_question
-                    WHERE screen_key = :skey
-                    """
-                ),
-                {"skey": screen_key},
-            ).fetchall()
-        for er in ext_rows:
-            ek = er[0]
-            ev = er[1]
-            if ek:
+        # Map external_qid -> question_id for this screen to allow resolving
+        # non-UUID parent_question_id tokens (e.g., external_qid like 'q_parent_bool').
+        ext_to_qid: dict[str, str] = {}
+        for row in rows:
+            if row[3]:
+                # Normalize external_qid keys to case-insensitive map with trimmed tokens
+                ext_to_qid[str(row[3]).strip().lower()] = str(row[0])
+
+        out: dict[str, tuple[str | None, frozenset[str] | None]] = {}
+        for row in rows:
+            qid = str(row[0])
+            raw_parent = row[1]
+            parent_qid: str | None
+            if raw_parent is None:
+                parent_qid = None
+            else:
+                candidate = str(raw_parent)
+                # Coerce to UUID when possible; otherwise resolve via external_qid mapping
                 try:
-                    # Normalize external_qid keys to case-insensitive map with trimmed tokens
-                    ext_to_qid[str(ek).strip().lower()] = str(ev)
+                    UUID(candidate)
+                    parent_qid = candidate
                 except Exception:
-                    continue
-    except Exception:
-        # If mapping cannot be built, proceed without it; unresolved parents remain None
-        ext_to_qid = {}
-
-    def _to_list(val: Any) -> list | None:
-        if val is None:
-            return None
-        # If the DB already returns a native list/array, normalize directly
-        if isinstance(val, (list, tuple)):
-            out_list: list[str] = []
-            for x in val:
-                if isinstance(x, bool):
-                    out_list.append("true" if x else "false")
-                else:
-                    xs = str(x)
-                    if xs.lower() in {"true", "false"}:
-                        out_list.append(xs.lower())
-                    else:
-                        out_list.append(xs)
-            return out_list
-        s = str(val).strip()
-        if not s:
-            return None
-        # Accept JSON array in text if present, else a single value
-        try:
-            parsed = json.loads(s)
-            if isinstance(parsed, list):
-                out: list[str] = []
-                for x in parsed:
-                    # Canonicalize booleans to 'true'/'false' strings
-                    if isinstance(x, bool):
-                        out.append("true" if x else "false")
-                    else:
-                        xs = str(x)
-                        if xs.lower() in {"true", "false"}:
-                            out.append(xs.lower())
-                        else:
-                            out.append(xs)
-                return out
-            # If JSON parses to a scalar, treat as single visible value
-            if isinstance(parsed, (str, bool)):
-                if isinstance(parsed, bool):
-                    return ["true" if parsed else "false"]
-                ps = str(parsed)
-                return [ps.lower() if ps.lower() in {"true", "false"} else ps]
-        except json.JSONDecodeError:
-            logger.error(
-                "visible_if JSON decode failed for screen_key=%s payload=%s",
-                screen_key,
-                s,
-                exc_info=True,
-            )
-        # Single value path: canonicalize boolean-like tokens
-        if s.lower() in {"true", "false"}:
-            return [s.lower()]
-        # Also handle literal Python boolean strings
-        if s in {"True", "False"}:
-            return [s.lower()]
-        return [s]
-
-    out: dict[str, tuple[str | None, list | None]] = {}
-    for row in rows:
-        qid = str(row[0])
-        raw_parent = row[1]
-        parent_qid: str | None
-        if raw_parent is None:
-            parent_qid = None
-        else:
-            candidate = str(raw_parent)
-            # Coerce to UUID when possible; otherwise resolve via external_qid mapping
-            try:
-                UUID(candidate)
-                parent_qid = candidate
-            except Exception:
-                # Not a UUID -> attempt resolution from external_qid on same screen
-                candidate_norm = candidate.strip().lower()
-                parent_qid = ext_to_qid.get(candidate_norm)
-                # If still unresolved, perform a fallback lookup across all questionnaire_question
-                # to avoid treating children as base-visible when the parent token is a non-UUID
-                # external_qid defined on another screen.
-                if not parent_qid:
-                    try:
-                        with eng.connect() as conn:
+                    parent_qid = ext_to_qid.get(candidate.strip().lower())
+                    # If still unresolved, the parent token may be an external_qid
+                    # defined on another screen; resolve it once at compile time.
+                    if not parent_qid:
+                        try:
                             prow = conn.execute(
                                 sql_text(
                                     "SELECT question_id FROM questionnaire_question WHERE external_qid = :ext LIMIT 1"
                                 ),
                                 {"ext": candidate},
                             ).fetchone()
-                        if prow:
-                            parent_qid = str(prow[0])
-                    except Exception:
-                        # Leave as None when not resolvable; caller will treat as base question
-                        parent_qid = None
-        vis_list = _to_list(row[2])
-        if parent_qid:
-            logger.info(
-                "rules_parse screen_key=%s qid=%s parent=%s raw_visible_if=%s parsed=%s",
-                screen_key,
-                qid,
-                parent_qid,
-                row[2],
-                vis_list,
-            )
-        out[qid] = (parent_qid, vis_list)
+                            if prow:
+                                parent_qid = str(prow[0])
+                        except Exception:
+                            # Leave as None when not resolvable; caller will treat as base question
+                            parent_qid = None
+            out[qid] = (parent_qid, compile_visible_if_values(row[2], screen_key))
     return out
 
 
+def get_visibility_rules_for_screen(screen_key: str) -> dict[str, tuple[str | None, frozenset[str] | None]]:
+    """Return visibility metadata for all questions on a screen.
+
+    For each question_id on the given screen_key, return a tuple of
+    (parent_question_id, visible_if_values_or_none).
+
+    - Base questions (no parent) map to (None, None)
+    - Child questions include their parent's UUID and a frozenset of canonical
+      string values that make the child visible when equal to the parent's
+      canonical answer value.
+
+    Rules are compiled once per screen and served from a process-wide cache
+    until invalidated by an authoring write or the question metadata
+    generation moves (including its TTL expiry). Callers receive a shallow
+    copy.
+    """
+    skey = str(screen_key)
+    generation = question_meta_generation()
+    entry = _VISIBILITY_RULES_CACHE.get(skey)
+    if entry is not None and entry[0] == generation:
+        return dict(entry[1])
+    rules = _load_visibility_rules(skey)
+    # A load racing an invalidation is returned but not cached
+    if question_meta_generation() == generation:
+        _VISIBILITY_RULES_CACHE[skey] = (generation, rules)
+    logger.info("visibility_rules_compiled screen_key=%s count=%s", skey, len(rules))
+    return dict(rules)
+
+
 def get_screen_row_for_update(screen_key: str) -> dict | None:
     """Return screen metadata for update operations.
 
@@ -460,16 +486,7 @@ def count_responses_for_screen(response_set_id: str, screen_key: str) -> int:
     eng = get_engine()
     with eng.connect() as conn:
         count = conn.execute(
-            sql_text(
-                """
-                SELECT COUNT(*)
-                FROM response r
-                WHERE r.response_set_id = :rs
-                  AND r.question_id IN (
-                      SELECT q.question_id FROM questionnaire_question q WHERE q.screen_key = :skey
-                  )
-                """
-            ),
+            _SCREEN_RESPONSE_COUNT_SQL,
             {"rs": response_set_id, "skey": screen_key},
         ).scalar_one()
     return int(count)
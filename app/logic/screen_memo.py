@@ -0,0 +1,88 @@
+"""Request-scoped memo for assembled screen views.
+
+A single answers PATCH needs the same screen state in several places (guard
+ETag, pre-write visibility, post-write refresh, header emission). Within a
+request scope, views are memoised by (response_set_id, screen_key, write
+generation) so each distinct screen state is assembled at most once; any
+answer write bumps the generation and naturally invalidates earlier entries.
+Outside a scope every call assembles afresh.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Tuple
+import logging
+
+from app.logic.repository_answers import get_write_generation
+from app.logic.screen_builder import assemble_screen_view
+
+logger = logging.getLogger(__name__)
+
+_MemoKey = Tuple[str, str, int]
+
+# Active memo for the current request; None when no scope is open
+_REQUEST_MEMO: ContextVar[Dict[_MemoKey, Dict[str, Any]] | None] = ContextVar(
+    "screen_view_memo", default=None
+)
+
+# Process-wide counters: hits/misses inside scopes, unscoped = calls with no scope
+SCREEN_MEMO_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "unscoped": 0}
+
+
+@contextmanager
+def screen_memo_scope() -> Iterator[None]:
+    """Open a fresh memo for the duration of one request."""
+    memo: Dict[_MemoKey, Dict[str, Any]] = {}
+    token = _REQUEST_MEMO.set(memo)
+    try:
+        yield
+    finally:
+        _REQUEST_MEMO.reset(token)
+        if memo:
+            logger.debug("screen_memo_scope_closed entries=%s", len(memo))
+
+
+def _copy_view(view: Dict[str, Any]) -> Dict[str, Any]:
+    # Callers may mutate the payload or its question dicts; hand out copies
+    return {**view, "questions": [dict(q) for q in (view.get("questions") or [])]}
+
+
+def memoized_screen_view(response_set_id: str, screen_key: str) -> Dict[str, Any]:
+    """Return `assemble_screen_view` output, reusing it within the request scope."""
+    memo = _REQUEST_MEMO.get()
+    if memo is None:
+        SCREEN_MEMO_STATS["unscoped"] += 1
+        return assemble_screen_view(response_set_id, screen_key)
+    key = (str(response_set_id), str(screen_key), get_write_generation(response_set_id))
+    view = memo.get(key)
+    if view is None:
+        SCREEN_MEMO_STATS["misses"] += 1
+        view = assemble_screen_view(response_set_id, screen_key)
+        memo[key] = view
+    else:
+        SCREEN_MEMO_STATS["hits"] += 1
+    return _copy_view(view)
+
+
+def memoized_screen_etag(response_set_id: str, screen_key: str) -> str:
+    """Return the Screen-ETag of the memoised view for the current screen state."""
+    return str(memoized_screen_view(response_set_id, screen_key).get("etag") or "")
+
+
+def get_screen_memo_stats() -> Dict[str, Any]:
+    """Return a copy of the memo counters plus the in-scope hit rate."""
+    stats: Dict[str, Any] = dict(SCREEN_MEMO_STATS)
+    scoped = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = (stats["hits"] / scoped) if scoped else 0.0
+    return stats
+
+
+__all__ = [
+    "screen_memo_scope",
+    "memoized_screen_view",
+    "memoized_screen_etag",
+    "get_screen_memo_stats",
+    "SCREEN_MEMO_STATS",
+]
@@ -0,0 +1,133 @@
+"""Maintained per-(response_set, screen) state for O(1) Screen-ETag reads.
+
+Each record holds the screen's version counter, its visible question_id set
+and the Screen-ETag derived from both. Records are seeded from the first
+`ScreenSnapshot` load for a screen and then kept current by answer writes:
+the version advances with `_bump_screen_version` and visibility flips found
+by the incremental descendant walk are applied to every affected screen.
+Authoring changes (rules, screens, imports) drop all records, and a record
+built under an older question metadata generation (which also moves on its
+TTL expiry) reads as missing. Records are
+grouped per response set and bounded like the answer cache (see
+`app.logic.bounded_state`); an evicted or expired set is reseeded by its
+next snapshot load.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, MutableMapping, Optional
+import hashlib
+import logging
+
+from app.logic.bounded_state import open_response_state_map
+from app.logic.question_meta import question_meta_generation
+
+logger = logging.getLogger(__name__)
+
+
+def screen_etag_token(response_set_id: str, screen_key: str, version: int, visible_ids: Iterable[str]) -> str:
+    """Return the weak Screen-ETag for a version and visible question set."""
+    vis_fp = hashlib.sha1("\n".join(sorted(visible_ids)).encode("utf-8")).hexdigest()
+    token = f"{response_set_id}:{screen_key}:v{int(version)}|vis:{vis_fp}".encode("utf-8")
+    return f'W/"{hashlib.sha1(token).hexdigest()}"'
+
+
+@dataclass(frozen=True)
+class ScreenState:
+    version: int
+    visible_ids: frozenset
+    etag: str
+    generation: int
+
+
+# Process-wide records: response_set_id -> {screen_key: ScreenState}
+_SCREEN_STATES: MutableMapping[str, Dict[str, ScreenState]] = open_response_state_map("screen_states")
+
+
+def _lookup(rs_id: str, skey: str) -> Optional[ScreenState]:
+    screens = _SCREEN_STATES.get(rs_id)
+    state = screens.get(skey) if screens is not None else None
+    if state is None or state.generation != question_meta_generation():
+        return None
+    return state
+
+
+def _store(rs_id: str, skey: str, version: int, visible_ids: frozenset) -> ScreenState:
+    state = ScreenState(
+        int(version),
+        visible_ids,
+        screen_etag_token(rs_id, skey, version, visible_ids),
+        question_meta_generation(),
+    )
+    screens = _SCREEN_STATES.get(rs_id) or {}
+    screens[skey] = state
+    # Reassign so the response set's TTL runs from its latest update
+    _SCREEN_STATES[rs_id] = screens
+    return state
+
+
+def record_screen_state(
+    response_set_id: str, screen_key: str, version: int, visible_ids: Iterable[str]
+) -> ScreenState:
+    """Seed or refresh the record for a screen from freshly loaded state."""
+    return _store(str(response_set_id), str(screen_key), version, frozenset(str(q) for q in visible_ids))
+
+
+def get_screen_state(response_set_id: str, screen_key: str) -> Optional[ScreenState]:
+    return _lookup(str(response_set_id), str(screen_key))
+
+
+def has_screen_states(response_set_id: str) -> bool:
+    return bool(_SCREEN_STATES.get(str(response_set_id)))
+
+
+def advance_screen_version(response_set_id: str, screen_key: str, version: int) -> None:
+    """Move a recorded screen to a new version (no-op when not recorded)."""
+    rs_id, skey = str(response_set_id), str(screen_key)
+    state = _lookup(rs_id, skey)
+    if state is not None:
+        _store(rs_id, skey, version, state.visible_ids)
+
+
+def apply_visibility_flips(
+    response_set_id: str,
+    now_visible: Iterable[str],
+    now_hidden: Iterable[str],
+    screen_of: Mapping[str, Optional[str]],
+) -> None:
+    """Apply visibility changes to every recorded screen they fall on."""
+    rs_id = str(response_set_id)
+    shown: Dict[str, set] = {}
+    hidden: Dict[str, set] = {}
+    for qid in now_visible:
+        shown.setdefault(str(screen_of.get(qid)), set()).add(str(qid))
+    for qid in now_hidden:
+        hidden.setdefault(str(screen_of.get(qid)), set()).add(str(qid))
+    for skey in set(shown) | set(hidden):
+        state = _lookup(rs_id, skey)
+        if state is None:
+            continue
+        visible = (state.visible_ids | shown.get(skey, set())) - hidden.get(skey, set())
+        if visible != state.visible_ids:
+            _store(rs_id, skey, state.version, frozenset(visible))
+
+
+def invalidate_screen_states(response_set_id: str | None = None) -> None:
+    """Drop records for one response set, or all records when None."""
+    if response_set_id is None:
+        _SCREEN_STATES.clear()
+        return
+    _SCREEN_STATES.pop(str(response_set_id), None)
+
+
+__all__ = [
+    "ScreenState",
+    "screen_etag_token",
+    "record_screen_state",
+    "get_screen_state",
+    "has_screen_states",
+    "advance_screen_version",
+    "apply_visibility_flips",
+    "invalidate_screen_states",
+]
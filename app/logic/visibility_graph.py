@@ -0,0 +1,374 @@
+"""Questionnaire-wide visibility graph and incremental re-evaluation.
+
+Keeps a process-wide parent→children index per questionnaire, built from the
+cached question metadata (`parent_question_id`, `visible_if_value`). A write to question X
+only re-evaluates X's descendants (across screens) instead of recomputing and
+diffing whole visible sets. Visibility is transitive: a question hidden by its
+own ancestors exposes no value, so its children are hidden too. Full
+evaluation is a single pass over a cached topological order. Authoring writes
+invalidate the index alongside the per-screen rule cache in
+`repository_screens`.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from functools import cached_property
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import logging
+
+from app.logic.question_meta import get_question_meta, get_questionnaire_meta, question_meta_generation
+from app.logic.repository_screens import compile_visible_if_values
+from app.logic.screen_state import invalidate_screen_states
+from app.logic.visibility_rules import is_child_visible
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionnaireGraph:
+    """Parent graph of one questionnaire's questions.
+
+    - parent_of:   question_id -> resolved parent question_id (or None)
+    - visible_if:  question_id -> frozenset of canonical visible-if tokens
+    - children_of: question_id -> tuple of direct child question_ids
+    - screen_of:   question_id -> screen_key
+    """
+
+    def __init__(
+        self,
+        questionnaire_id: str,
+        parent_of: Dict[str, Optional[str]],
+        visible_if: Dict[str, Optional[frozenset]],
+        screen_of: Dict[str, Optional[str]],
+    ) -> None:
+        self.questionnaire_id = questionnaire_id
+        self.parent_of = parent_of
+        self.visible_if = visible_if
+        self.screen_of = screen_of
+        children: Dict[str, List[str]] = {}
+        for qid, pid in parent_of.items():
+            if pid is not None:
+                children.setdefault(pid, []).append(qid)
+        self.children_of: Dict[str, Tuple[str, ...]] = {
+            pid: tuple(sorted(kids)) for pid, kids in children.items()
+        }
+
+    def __contains__(self, question_id: object) -> bool:
+        return str(question_id) in self.parent_of
+
+    @cached_property
+    def topological_order(self) -> Tuple[str, ...]:
+        """Question ids ordered parents-first (Kahn), computed once per graph.
+
+        Members of a parent cycle never reach in-degree zero; they are appended
+        last so they evaluate as hidden instead of looping.
+        """
+        indegree = {
+            qid: (1 if pid is not None and pid in self.parent_of else 0)
+            for qid, pid in self.parent_of.items()
+        }
+        queue = deque(sorted(q for q, d in indegree.items() if d == 0))
+        order: List[str] = []
+        while queue:
+            qid = queue.popleft()
+            order.append(qid)
+            for child in self.children_of.get(qid, ()):
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    queue.append(child)
+        if len(order) < len(indegree):
+            placed = set(order)
+            order.extend(sorted(q for q in indegree if q not in placed))
+        return tuple(order)
+
+    @cached_property
+    def topological_index(self) -> Dict[str, int]:
+        return {qid: i for i, qid in enumerate(self.topological_order)}
+
+    def ancestors(self, question_ids: Iterable[str]) -> Set[str]:
+        """Return every ancestor of the given questions (excluding themselves)."""
+        out: Set[str] = set()
+        for qid in question_ids:
+            pid = self.parent_of.get(str(qid))
+            while pid is not None and pid not in out and pid in self.parent_of:
+                out.add(pid)
+                pid = self.parent_of.get(pid)
+        return out
+
+    def descendants(self, question_id: str) -> List[str]:
+        """Return all descendants of a question in breadth-first order."""
+        out: List[str] = []
+        seen = {str(question_id)}
+        queue = deque(self.children_of.get(str(question_id), ()))
+        while queue:
+            qid = queue.popleft()
+            if qid in seen:
+                continue
+            seen.add(qid)
+            out.append(qid)
+            queue.extend(self.children_of.get(qid, ()))
+        return out
+
+
+# Process-wide graph cache keyed by questionnaire_id; question ownership is
+# resolved through the question metadata cache. Each entry records the
+# question metadata generation it was built under and is rebuilt once that
+# moves, so graphs expire with the metadata TTL.
+_GRAPH_CACHE: Dict[str, Tuple[int, QuestionnaireGraph]] = {}
+
+
+def invalidate_questionnaire_graph(questionnaire_id: str | None = None) -> None:
+    """Drop the cached graph for one questionnaire, or all graphs when None."""
+    if questionnaire_id is None:
+        _GRAPH_CACHE.clear()
+    else:
+        _GRAPH_CACHE.pop(str(questionnaire_id), None)
+    # Maintained visible sets were derived from the old rules
+    invalidate_screen_states()
+    logger.info("questionnaire_graph_invalidated questionnaire_id=%s", questionnaire_id)
+
+
+def _load_graph(questionnaire_id: str) -> QuestionnaireGraph:
+    metas = get_questionnaire_meta(questionnaire_id)
+    parent_of: Dict[str, Optional[str]] = {}
+    visible_if: Dict[str, Optional[frozenset]] = {}
+    screen_of: Dict[str, Optional[str]] = {}
+    for qid, meta in metas.items():
+        parent_of[qid] = meta.parent_question_id
+        visible_if[qid] = compile_visible_if_values(meta.visible_if_value, str(meta.screen_key))
+        screen_of[qid] = meta.screen_key
+    return QuestionnaireGraph(questionnaire_id, parent_of, visible_if, screen_of)
+
+
+def get_questionnaire_graph(questionnaire_id: str) -> QuestionnaireGraph:
+    """Return the cached parent graph for a questionnaire, loading it once per generation."""
+    qn = str(questionnaire_id)
+    generation = question_meta_generation()
+    entry = _GRAPH_CACHE.get(qn)
+    if entry is not None and entry[0] == generation:
+        return entry[1]
+    graph = _load_graph(qn)
+    # A load racing an invalidation is returned but not cached
+    if question_meta_generation() == generation:
+        _GRAPH_CACHE[qn] = (generation, graph)
+    logger.info("questionnaire_graph_loaded questionnaire_id=%s questions=%s", qn, len(graph.parent_of))
+    return graph
+
+
+def get_graph_for_question(question_id: str) -> QuestionnaireGraph | None:
+    """Return the graph of the questionnaire owning a question, or None if unknown.
+
+    Ownership comes from the question metadata cache, whose lookup errors are
+    logged and read as unknown.
+    """
+    meta = get_question_meta(question_id)
+    if meta is None:
+        return None
+    return get_questionnaire_graph(meta.questionnaire_id)
+
+
+def _effective_value(stored: str | None, visible: bool) -> str | None:
+    """Value a question exposes to its children's visible-if checks.
+
+    Hidden questions expose nothing, so a hidden parent hides its subtree even
+    when it still holds a matching stored answer.
+    """
+    return stored if visible else None
+
+
+def evaluate_visibility(
+    graph: QuestionnaireGraph,
+    value_of: Callable[[str], str | None],
+    question_ids: Iterable[str] | None = None,
+) -> Set[str]:
+    """Return the visible subset of `question_ids` (or of the whole questionnaire).
+
+    One pass in topological order: a question is visible when it has no parent,
+    or its parent is visible and the parent's stored value matches. Only the
+    requested questions and their ancestors are evaluated, and `value_of` is
+    called only for parents that are themselves visible.
+    """
+    if question_ids is None:
+        scope: Iterable[str] = graph.topological_order
+        wanted: Set[str] | None = None
+    else:
+        wanted = {str(q) for q in question_ids if str(q) in graph}
+        index = graph.topological_index
+        scope = sorted(wanted | graph.ancestors(wanted), key=index.__getitem__)
+    visible: Set[str] = set()
+    for qid in scope:
+        pid = graph.parent_of.get(qid)
+        if pid is None:
+            visible.add(qid)
+        elif pid not in graph:
+            # Parent outside this questionnaire: fall back to the one-level rule
+            if is_child_visible(value_of(pid), graph.visible_if.get(qid)):
+                visible.add(qid)
+        elif pid in visible and is_child_visible(value_of(pid), graph.visible_if.get(qid)):
+            visible.add(qid)
+    return visible if wanted is None else visible & wanted
+
+
+def effective_values(
+    graph: QuestionnaireGraph,
+    values: Mapping[str, str | None],
+    value_of: Callable[[str], str | None],
+) -> Dict[str, str | None]:
+    """Map stored parent values to the values their children actually see.
+
+    Keys present in `values` keep their stored value when visible and become
+    None when hidden by an ancestor; ancestors outside `values` are read
+    through `value_of`.
+    """
+
+    def _lookup(qid: str) -> str | None:
+        return values[qid] if qid in values else value_of(qid)
+
+    visible = evaluate_visibility(graph, _lookup, values.keys())
+    return {
+        qid: (_effective_value(val, qid in visible) if qid in graph else val)
+        for qid, val in values.items()
+    }
+
+
+def reevaluate_descendants(
+    graph: QuestionnaireGraph,
+    question_id: str,
+    value_before: str | None,
+    value_after: str | None,
+    value_of: Callable[[str], str | None],
+) -> Tuple[List[str], List[str]]:
+    """Return (now_visible, now_hidden) caused by changing one question's value.
+
+    Walks outward from the written question. A node's children are only
+    re-evaluated when the value they are gated on changed, and a child whose
+    visibility flipped is itself queued with its before/after effective value
+    (looked up lazily via `value_of`), so cost is bounded by the affected part
+    of the subtree rather than by screen or questionnaire size.
+    """
+    qid = str(question_id)
+    flipped: Dict[str, bool] = {}
+    changed: Dict[str, Tuple[str | None, str | None]] = {qid: (value_before, value_after)}
+    queue = deque([qid])
+    while queue:
+        node = queue.popleft()
+        before, after = changed[node]
+        if before == after:
+            continue
+        for child in graph.children_of.get(node, ()):
+            if child in changed:
+                # Cycle guard: each question is re-evaluated at most once
+                continue
+            vis = graph.visible_if.get(child)
+            was_visible = is_child_visible(before, vis)
+            is_visible = is_child_visible(after, vis)
+            if was_visible == is_visible:
+                continue
+            flipped[child] = is_visible
+            stored = value_of(child)
+            changed[child] = (
+                _effective_value(stored, was_visible),
+                _effective_value(stored, is_visible),
+            )
+            queue.append(child)
+    now_visible = sorted(q for q, vis in flipped.items() if vis)
+    now_hidden = sorted(q for q, vis in flipped.items() if not vis)
+    return now_visible, now_hidden
+
+
+def descendant_visibility_delta(
+    response_set_id: str,
+    question_id: str,
+    value_before: str | None,
+    value_after: str | None,
+) -> Tuple[List[str], List[str]] | None:
+    """Incremental now_visible/now_hidden for a write, or None when no graph applies.
+
+    Values of other questions are read through `get_existing_answer` only for
+    questions whose visibility flipped. Callers fall back to full-set diffing
+    (`compute_visibility_delta`) on None.
+    """
+    try:
+        graph = get_graph_for_question(question_id)
+    except Exception:
+        logger.error("descendant_visibility_graph_failed qid=%s", question_id, exc_info=True)
+        return None
+    if graph is None or str(question_id) not in graph:
+        return None
+
+    value_of = _stored_value_reader(response_set_id)
+    # A question hidden by its ancestors exposes no value before or after
+    if not evaluate_visibility(graph, value_of, [str(question_id)]):
+        return [], []
+    return reevaluate_descendants(graph, question_id, value_before, value_after, value_of)
+
+
+def _stored_value_reader(response_set_id: str) -> Callable[[str], str | None]:
+    """Return a canonical stored-value lookup for one response set."""
+    from app.logic.repository_answers import get_existing_answer
+    from app.logic.answer_canonical import canonicalize_answer_value
+
+    def _value_of(qid: str) -> str | None:
+        row = get_existing_answer(response_set_id, qid)
+        if row is None:
+            return None
+        _opt, vtext, vnum, vbool = row
+        return canonicalize_answer_value(vtext, vnum, vbool)
+
+    return _value_of
+
+
+def visible_questions(response_set_id: str, question_ids: Iterable[str]) -> Set[str]:
+    """Return the subset of `question_ids` visible for a response set.
+
+    Evaluates each owning questionnaire's graph once over the requested
+    questions and their ancestors. Questions outside any graph count as
+    visible.
+    """
+    value_of = _stored_value_reader(response_set_id)
+    grouped: Dict[int, Tuple[QuestionnaireGraph, List[str]]] = {}
+    visible: Set[str] = set()
+    for qid in {str(q) for q in question_ids}:
+        graph = get_graph_for_question(qid)
+        if graph is None or qid not in graph:
+            visible.add(qid)
+        else:
+            grouped.setdefault(id(graph), (graph, []))[1].append(qid)
+    for graph, qids in grouped.values():
+        visible |= evaluate_visibility(graph, value_of, qids)
+    return visible
+
+
+def effective_parent_values(
+    response_set_id: str, parent_values: Mapping[str, str | None]
+) -> Dict[str, str | None]:
+    """Hide parent values whose questions are themselves hidden by ancestors.
+
+    Feeding the result to `compute_visible_set` makes its one-level check
+    transitive. Returns the input unchanged when no graph applies.
+    """
+    values = {str(k): v for k, v in parent_values.items()}
+    if not values:
+        return values
+    try:
+        graph = get_graph_for_question(next(iter(values)))
+    except Exception:
+        logger.error("effective_parent_values_graph_failed rs_id=%s", response_set_id, exc_info=True)
+        return values
+    if graph is None:
+        return values
+    return effective_values(graph, values, _stored_value_reader(response_set_id))
+
+
+__all__ = [
+    "QuestionnaireGraph",
+    "get_questionnaire_graph",
+    "get_graph_for_question",
+    "invalidate_questionnaire_graph",
+    "evaluate_visibility",
+    "visible_questions",
+    "effective_values",
+    "effective_parent_values",
+    "reevaluate_descendants",
+    "descendant_visibility_delta",
+]
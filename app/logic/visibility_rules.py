@@ -35,6 +35,9 @@ def is_child_visible(parent_value: str | None, visible_if_values: Iterable | Non
             return str(tok)
 
     pv_norm = _canon(parent_value)
+    # Compiled rules from the repository cache are already canonical frozensets
+    if isinstance(visible_if_values, frozenset):
+        return pv_norm in visible_if_values
     targets = {_canon(x) for x in visible_if_values}
     return pv_norm in targets
 
@@ -48,6 +51,9 @@ def compute_visible_set(
     - Base questions (no parent) are always visible.
     - Child questions are visible only if their parent's canonical value matches
       one of the configured visible-if values.
+    - Callers pass effective parent values (see
+      `visibility_graph.effective_parent_values`), where a parent hidden by its
+      own ancestors maps to None, so hiding is transitive.
     """
     visible: set[str] = set()
     for qid, (parent_id, vis_list) in rules.items():
@@ -13,6 +13,7 @@ from sqlalchemy.exc import SQLAlchemyError
 
 from app.logic.repository_answers import get_existing_answer
 from app.logic.answer_canonical import canonicalize_answer_value
+from app.logic.visibility_graph import effective_parent_values
 
 
 logger = logging.getLogger(__name__)
@@ -26,7 +27,9 @@ def hydrate_parent_values(
     """Hydrate canonical parent values from the repository.
 
     Returns a mapping of parent question_id -> canonical string (or None).
-    Narrowly logs SQL errors and defaults missing values to None.
+    Parents hidden by their own ancestors map to None so one-level rule
+    checks stay transitive. Narrowly logs SQL errors and defaults missing
+    values to None.
     """
     parents: Set[str] = {str(p) for (p, _v) in rules.values() if p is not None}
     parent_value_pre: Dict[str, Optional[str]] = {}
@@ -46,7 +49,8 @@ def hydrate_parent_values(
             exc_info=True,
         )
         parent_value_pre = {str(pid): None for pid in parents}
-    return parent_value_pre
+        return parent_value_pre
+    return effective_parent_values(response_set_id, parent_value_pre)
 
 
 def visible_ids_from_screen_view(screen_view) -> Set[str]:
@@ -16,6 +16,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.logging_setup import configure_logging
 from app.db.base import get_engine
 from app.db.migrations_runner import apply_migrations
+from app.logic.replay_store import start_replay_sweeper
 from app.routes import api_router
 from app.http.problem import (
     PROBLEM_MEDIA_TYPE,
@@ -26,6 +27,7 @@ from app.http.problem import (
 from app.http.request_id import RequestIdMiddleware
 from fastapi import HTTPException  # ensure symbol for add_exception_handler
 from app.middleware.preconditions import PreconditionsMiddleware
+from app.middleware.screen_memo import ScreenMemoMiddleware
 
 logger = logging.getLogger(__name__)
 
@@ -261,6 +263,8 @@ def create_app() -> FastAPI:
     app = FastAPI()
     # Register Preconditions middleware as the earliest HTTP layer (pre-body)
     app.add_middleware(PreconditionsMiddleware)
+    # Scope the screen view memo to each request (guard and handler share it)
+    app.add_middleware(ScreenMemoMiddleware)
     # Clarke 7.1.29: register global problem+json handlers using allowed module
     app.add_exception_handler(HTTPException, handle_http_exception)
     app.add_exception_handler(RequestValidationError, handle_request_validation_error)
@@ -813,6 +817,14 @@ def create_app() -> FastAPI:
 
             await self.app(scope, receive, send_wrapper)
 
+    @app.on_event("startup")
+    def _start_replay_sweeper() -> None:  # pragma: no cover - background thread
+        # Purge expired idempotent-replay entries off the request path
+        try:
+            start_replay_sweeper()
+        except Exception:
+            logger.error("replay_store_sweeper_start_failed", exc_info=True)
+
     # Apply migrations on startup (guarded) to avoid import-time side effects
     @app.on_event("startup")
     def _apply_migrations() -> None:  # pragma: no cover - exercised via integration
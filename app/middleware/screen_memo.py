@@ -0,0 +1,26 @@
+"""Request-scope middleware for the screen view memo.
+
+Opens `screen_memo_scope()` around every HTTP request so the guard dependency
+and the handler (which FastAPI may run in separate threadpool contexts copied
+from this one) share the same memo dict.
+"""
+
+from __future__ import annotations
+
+from fastapi import FastAPI
+
+from app.logic.screen_memo import screen_memo_scope
+
+
+class ScreenMemoMiddleware:  # pragma: no cover - exercised by functional tests
+    """ASGI middleware that scopes screen view memoisation to one request."""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):  # type: ignore[no-untyped-def]
+        if scope.get("type") != "http":
+            await self.app(scope, receive, send)
+            return
+        with screen_memo_scope():
+            await self.app(scope, receive, send)
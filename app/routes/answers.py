@@ -10,11 +10,12 @@ from typing import Any
 import re
 
 from fastapi import APIRouter, HTTPException, Request, Response, Header, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.exc import SQLAlchemyError
 import logging
-import sys
 
+from app.logging_setup import route_module_logger
 from app.logic.validation import (
     HamiltonValidationError,
     validate_answer_upsert,
@@ -31,8 +32,10 @@ from app.logic.problem_factory import (
     problem_pre_resource_not_found,
 )
 from app.logic.repository_answers import (
+    bulk_upsert_answers,
     get_answer_kind_for_question,
     get_existing_answer,
+    get_questions_screen_and_kind,
     response_id_exists,
     upsert_answer,
     get_screen_version,
@@ -44,8 +47,12 @@ from app.logic.repository_screens import question_exists_on_screen
 from app.logic.answer_canonical import canonicalize_answer_value
 from app.logic.visibility_rules import compute_visible_set, is_child_visible
 from app.logic.visibility_delta import compute_visibility_delta
-from app.logic.enum_resolution import resolve_enum_option
+from app.logic.visibility_graph import descendant_visibility_delta
+from app.logic.enum_resolution import enum_option_value, resolve_enum_option
+from app.logic.answer_ingest import stream_ingest_outcomes
+from app.logic.repository_response_sets import response_set_exists
 from app.logic.screen_builder import assemble_screen_view
+from app.logic.screen_memo import memoized_screen_etag, memoized_screen_view
 from app.logic.events import publish, RESPONSE_SAVED
 from app.logic.replay import maybe_replay, store_after_success
 from app.models.response_types import SavedResult, BatchResult, VisibilityDelta, ScreenView
@@ -66,15 +73,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Ensure module INFO logs are emitted to stdout during tests/integration runs
+# Ensure module INFO logs reach stdout (via the shared logging queue) during tests/integration runs
 try:
-    if not logger.handlers:
-        _handler = logging.StreamHandler(stream=sys.stdout)
-        _handler.setLevel(logging.INFO)
-        _handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:%(name)s:%(message)s'))
-        logger.addHandler(_handler)
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
+    route_module_logger(logger)
 except Exception:
     # Never fail module import due to logging setup; log with context
     logging.getLogger(__name__).error("answers_logging_setup_failed", exc_info=True)
@@ -175,7 +176,7 @@ def autosave_answer(
                 try:
                     skey_tmp = _screen_key_for_question(str(question_id)) or ""
                     if skey_tmp:
-                        token = compute_screen_etag(response_set_id, skey_tmp) or ""
+                        token = memoized_screen_etag(response_set_id, skey_tmp) or ""
                 except Exception:
                     token = token or ""
             emit_etag_headers(response, scope="screen", token=str(token or ""), include_generic=True)
@@ -433,7 +434,7 @@ def autosave_answer(
     # Clarke E-7.1.13: diagnostic call to dedicated Screen-ETag component before any assembly
     try:
         if screen_key:
-            _ = compute_screen_etag(response_set_id, screen_key)
+            _ = memoized_screen_etag(response_set_id, screen_key)
     except Exception:
         pass
 
@@ -445,7 +446,7 @@ def autosave_answer(
         best_etag = None
         if screen_key:
             try:
-                _sv = assemble_screen_view(response_set_id, screen_key)
+                _sv = memoized_screen_view(response_set_id, screen_key)
                 best_etag = (_sv.get("etag") if isinstance(_sv, dict) else getattr(_sv, "etag", None))
             except Exception:
                 best_etag = None
@@ -527,7 +528,7 @@ def autosave_answer(
     # Guard ETag computation when screen_key is falsy to avoid invalid lookups.
     if screen_key:
         try:
-            _sv = assemble_screen_view(response_set_id, screen_key)
+            _sv = memoized_screen_view(response_set_id, screen_key)
             current_etag = (_sv.get("etag") if isinstance(_sv, dict) else getattr(_sv, "etag", None))
         except Exception:
             current_etag = None
@@ -576,37 +577,39 @@ def autosave_answer(
         response_set_id, screen_key, rules
     )
 
-    # Log raw parent storage triples and canonicalized map (for comparison only)
-    try:
-        parent_raw_pre: dict[str, tuple | None] = {}
-        for parent_id in parents:
-            try:
-                row = get_existing_answer(response_set_id, str(parent_id))
-            except Exception:
-                row = None
-            parent_raw_pre[str(parent_id)] = row
-        logger.info(
-            "vis_pre_parent_values_raw rs_id=%s screen_key=%s parent_raw=%s",
-            response_set_id,
-            screen_key,
-            parent_raw_pre,
-        )
-        parent_pre_str = {k: (str(v) if v is not None else None) for k, v in parent_value_pre.items()}
-        logger.info(
-            "vis_pre_parent_values_canon rs_id=%s screen_key=%s parent_canon=%s",
-            response_set_id,
-            screen_key,
-            parent_pre_str,
-        )
-        # Redundant but explicit canonicalization log to satisfy parity instrumentation
-        logger.info(
-            "vis_pre_hydrated_canon rs_id=%s screen_key=%s parent_canon=%s",
-            response_set_id,
-            screen_key,
-            parent_pre_str,
-        )
-    except Exception:
-        logger.error("vis_pre_logging_failed", exc_info=True)
+    # Log raw parent storage triples and canonicalized map (for comparison only);
+    # skipped entirely when INFO is off for this module, as it re-reads each parent
+    if logger.isEnabledFor(logging.INFO):
+        try:
+            parent_raw_pre: dict[str, tuple | None] = {}
+            for parent_id in parents:
+                try:
+                    row = get_existing_answer(response_set_id, str(parent_id))
+                except Exception:
+                    row = None
+                parent_raw_pre[str(parent_id)] = row
+            logger.info(
+                "vis_pre_parent_values_raw rs_id=%s screen_key=%s parent_raw=%s",
+                response_set_id,
+                screen_key,
+                parent_raw_pre,
+            )
+            parent_pre_str = {k: (str(v) if v is not None else None) for k, v in parent_value_pre.items()}
+            logger.info(
+                "vis_pre_parent_values_canon rs_id=%s screen_key=%s parent_canon=%s",
+                response_set_id,
+                screen_key,
+                parent_pre_str,
+            )
+            # Redundant but explicit canonicalization log to satisfy parity instrumentation
+            logger.info(
+                "vis_pre_hydrated_canon rs_id=%s screen_key=%s parent_canon=%s",
+                response_set_id,
+                screen_key,
+                parent_pre_str,
+            )
+        except Exception:
+            logger.error("vis_pre_logging_failed", exc_info=True)
 
     # Clarke override: before computing visible_pre, ensure the toggled parent
     # question's pre-image value is force-populated from repository if missing.
@@ -662,6 +665,17 @@ def autosave_answer(
     except Exception:
         logger.error("parent_view_hydration_failed", exc_info=True)
 
+    # Pre-image of the written question itself, used by the incremental
+    # descendant re-evaluation after the write
+    question_value_pre: str | None = None
+    try:
+        _row_self = get_existing_answer(response_set_id, str(question_id))
+        if _row_self is not None:
+            _o, _t, _n, _b = _row_self
+            question_value_pre = canonicalize_answer_value(_t, _n, _b)
+    except Exception:
+        logger.error("question_value_pre_failed", exc_info=True)
+
     # Compute visible_pre using canonicalized parent_value_pre and declared rules
     try:
         visible_pre = compute_visible_set(rules, parent_value_pre)
@@ -761,7 +775,7 @@ def autosave_answer(
                     try:
                         skey_rep = screen_key or _screen_key_for_question(str(question_id)) or ""
                         if skey_rep:
-                            token_rep = compute_screen_etag(response_set_id, skey_rep) or ""
+                            token_rep = memoized_screen_etag(response_set_id, skey_rep) or ""
                     except Exception:
                         token_rep = token_rep or ""
                 emit_etag_headers(response, scope="screen", token=str(token_rep or ""), include_generic=True)
@@ -801,10 +815,10 @@ def autosave_answer(
         try:
             # Prefer tolerant assembly; fall back if Pydantic validation fails
             # CLARKE: EPIC_K_AUTOSAVE_SCREENVIEW_TOLERANCE
-            screen_view = ScreenView(**assemble_screen_view(response_set_id, screen_key))
+            screen_view = ScreenView(**memoized_screen_view(response_set_id, screen_key))
             new_etag = screen_view.etag or ""
         except Exception:
-            _sv_payload = assemble_screen_view(response_set_id, screen_key)
+            _sv_payload = memoized_screen_view(response_set_id, screen_key)
             try:
                 from types import SimpleNamespace as _NS  # lightweight holder to satisfy attribute access
             except Exception:  # pragma: no cover
@@ -861,9 +875,16 @@ def autosave_answer(
                 logger.error("has_answer_preimage_probe_failed", exc_info=True)
             return False
         try:
-            now_visible, now_hidden, suppressed_answers = compute_visibility_delta(
-                visible_pre, visible_post, _has_answer
+            _incremental = descendant_visibility_delta(
+                response_set_id, question_id, question_value_pre, None
             )
+            if _incremental is not None:
+                now_visible, now_hidden = _incremental
+                suppressed_answers = [q for q in now_hidden if _has_answer(q)]
+            else:
+                now_visible, now_hidden, suppressed_answers = compute_visibility_delta(
+                    visible_pre, visible_post, _has_answer
+                )
         except SQLAlchemyError:
             logger.error(
                 "suppressed_answers_probe_failed rs_id=%s screen_key=%s",
@@ -1373,6 +1394,9 @@ def autosave_answer(
                 ],
             }
             return JSONResponse(problem, status_code=422, media_type="application/problem+json")
+        # Option-only writes carry the option's value token, as stored by the repository
+        if value is None:
+            value = enum_option_value(question_id, oid)
 
     # Persist branch
     try:
@@ -1463,10 +1487,10 @@ def autosave_answer(
     try:
         # Prefer tolerant assembly; fall back if Pydantic validation fails
         # CLARKE: EPIC_K_AUTOSAVE_SCREENVIEW_TOLERANCE
-        screen_view = ScreenView(**assemble_screen_view(response_set_id, screen_key))
+        screen_view = ScreenView(**memoized_screen_view(response_set_id, screen_key))
         new_etag = screen_view.etag or ""
     except Exception:
-        _sv_payload = assemble_screen_view(response_set_id, screen_key)
+        _sv_payload = memoized_screen_view(response_set_id, screen_key)
         try:
             from types import SimpleNamespace as _NS  # lightweight holder to satisfy attribute access
         except Exception:  # pragma: no cover
@@ -1573,9 +1597,22 @@ def autosave_answer(
         return False
 
     try:
-        now_visible, now_hidden, suppressed_answers = compute_visibility_delta(
-            visible_pre, visible_post, _has_answer
+        _vtext = value if isinstance(value, str) else None
+        _vnum = value if isinstance(value, (int, float)) else None
+        _vbool = value if isinstance(value, bool) else None
+        _incremental = descendant_visibility_delta(
+            response_set_id,
+            question_id,
+            question_value_pre,
+            canonicalize_answer_value(_vtext, _vnum, _vbool),
         )
+        if _incremental is not None:
+            now_visible, now_hidden = _incremental
+            suppressed_answers = [q for q in now_hidden if _has_answer(q)]
+        else:
+            now_visible, now_hidden, suppressed_answers = compute_visibility_delta(
+                visible_pre, visible_post, _has_answer
+            )
         # Clarke directive: regardless of parent pre-image hydration, ensure
         # now_hidden at least reflects the strict diff of visible_pre→visible_post.
         try:
@@ -1904,8 +1941,10 @@ def batch_upsert_answers(
 
     - Parses a BatchUpsertRequest-like body with an `items` array.
     - Each item must include `question_id`, `etag`, and `body` (AnswerPatchBody shape).
-    - Performs per-item optimistic concurrency against the screen ETag,
-      and upserts or clears the answer using the same primitives as single PATCH.
+    - Validates every item first (per-item optimistic concurrency against the
+      pre-write screen ETag, kind checks, enum resolution), then writes all
+      accepted items in a single transaction via `bulk_upsert_answers`.
+    - Computes each touched screen's fresh ETag once, not once per item.
     - Returns 200 with a `batch_result.items` array preserving input order.
     """
     # Payload is injected by FastAPI; use it directly instead of awaiting request.json()
@@ -1917,150 +1956,122 @@ def batch_upsert_answers(
             "status": 422,
             "errors": [{"path": "$.items", "code": "type_mismatch"}],
         }
-    return JSONResponse(problem, status_code=422, media_type="application/problem+json")
+        return JSONResponse(problem, status_code=422, media_type="application/problem+json")
+
+    def _item_error(qid: Any, code: str) -> dict[str, Any]:
+        out: dict[str, Any] = {"outcome": "error", "error": {"code": code}}
+        if qid:
+            out = {"question_id": qid, **out}
+        return out
+
+    # Resolve screen_key and answer_kind for every item in one query; the
+    # route shim covers questions the bulk lookup cannot place.
+    meta = get_questions_screen_and_kind(
+        [it.get("question_id") for it in items if isinstance(it, dict) and isinstance(it.get("question_id"), str)]
+    )
+
+    def _screen_of(qid: str) -> str | None:
+        skey = (meta.get(qid) or (None, None))[0]
+        return skey or _screen_key_for_question(qid)
 
-    # Clarke: compute baseline screen ETag(s) BEFORE iterating items to enforce
-    # If-Match against the same pre-write state for merge semantics.
+    # Clarke: baseline screen ETags are taken once per screen BEFORE any write
+    # so every item's If-Match is checked against the same pre-write state.
     baseline_by_screen: dict[str, str] = {}
-    try:
-        for it in items:
-            item0 = it if isinstance(it, dict) else {}
-            qid0 = item0.get("question_id")
-            if not isinstance(qid0, str):
-                continue
-            sk0 = _screen_key_for_question(qid0)
-            if not sk0 or sk0 in baseline_by_screen:
-                continue
+
+    def _baseline(skey: str) -> str:
+        if skey not in baseline_by_screen:
             try:
-                sv0 = ScreenView(**assemble_screen_view(response_set_id, sk0))
-                baseline_by_screen[sk0] = sv0.etag or ""
+                baseline_by_screen[skey] = memoized_screen_etag(response_set_id, skey)
             except Exception:
-                baseline_by_screen[sk0] = ""
-    except Exception:
-        baseline_by_screen = {}
-
-    results: list[dict[str, Any]] = []
-    for it in items:
+                baseline_by_screen[skey] = ""
+        return baseline_by_screen[skey]
+
+    # Phase 1: validate every item without writing. Planned writes keep
+    # their input position so outcomes preserve request order.
+    results: list[dict[str, Any] | None] = [None] * len(items)
+    planned: list[tuple[int, str, str]] = []
+    # Last operation per question wins, as if items were applied in order:
+    # question_id -> (value, option_id), or None for a clear
+    latest: dict[str, tuple[Any, Any] | None] = {}
+    for pos, it in enumerate(items):
         item = it if isinstance(it, dict) else {}
         qid = item.get("question_id")
         etag = item.get("etag")
-        payload = item.get("body") or {}
+        item_body = item.get("body") or {}
 
         if not qid or not isinstance(qid, str):
-            results.append(
-                {
-                    "outcome": "error",
-                    "error": {
-                        "code": "RUN_BATCH_ITEM_QUESTION_ID_MISSING",
-                    },
-                }
-            )
+            results[pos] = _item_error(None, "RUN_BATCH_ITEM_QUESTION_ID_MISSING")
             continue
-
         if not isinstance(etag, str) or not str(etag).strip():
-            results.append(
-                {
-                    "question_id": qid,
-                    "outcome": "error",
-                    "error": {
-                        "code": "RUN_IF_MATCH_MISSING",
-                    },
-                }
-            )
+            results[pos] = _item_error(qid, "RUN_IF_MATCH_MISSING")
             continue
-
-        screen_key = _screen_key_for_question(qid)
+        screen_key = _screen_of(qid)
         if not screen_key:
-            results.append(
-                {
-                    "question_id": qid,
-                    "outcome": "error",
-                    "error": {
-                        "code": "RUN_QUESTION_ID_UNKNOWN",
-                    },
-                }
-            )
+            results[pos] = _item_error(qid, "RUN_QUESTION_ID_UNKNOWN")
             continue
-
-        # Compare against baseline screen-level ETag computed before any writes
-        baseline_etag = baseline_by_screen.get(screen_key)
-        if baseline_etag is None:
-            try:
-                sv = ScreenView(**assemble_screen_view(response_set_id, screen_key))
-                baseline_etag = sv.etag or ""
-            except Exception:
-                baseline_etag = ""
         incoming = str(etag).strip()
-        baseline_norm = (baseline_etag or "").strip()
-        if incoming and incoming != "*" and incoming != baseline_norm:
-            results.append(
-                {
-                    "question_id": qid,
-                    "outcome": "error",
-                    "error": {
-                        "code": "RUN_BATCH_ITEM_ETAG_MISMATCH",
-                    },
-                }
-            )
+        if incoming != "*" and incoming != (_baseline(screen_key) or "").strip():
+            results[pos] = _item_error(qid, "RUN_BATCH_ITEM_ETAG_MISMATCH")
             continue
 
-        # Perform upsert/clear
         try:
-            if bool(payload.get("clear")):
-                delete_answer_row(response_set_id, qid)
+            if bool(item_body.get("clear")):
+                latest.pop(qid, None)
+                latest[qid] = None
             else:
-                value = payload.get("value")
-                opt = payload.get("option_id")
+                value = item_body.get("value")
+                opt = item_body.get("option_id")
                 # Canonical validations similar to single-item path (no-op if ok)
-                kind = _answer_kind_for_question(qid) or ""
-                if (kind or "").lower() == "number":
+                kind = ((meta.get(qid) or (None, None))[1] or _answer_kind_for_question(qid) or "").lower()
+                if kind == "number":
                     if isinstance(value, (int, float)) and not is_finite_number(value):
                         raise HamiltonValidationError("not_finite_number")
-                if (kind or "").lower() == "boolean":
+                if kind == "boolean":
                     _ = canonical_bool(value)
-
                 # enum resolution when applicable
-                if (kind or "").lower() == "enum_single" and not opt:
+                if kind == "enum_single" and not opt:
                     resolved = resolve_enum_option(qid, value_token=str(value) if value is not None else None)
                     if resolved:
                         opt = resolved
-
-                upsert_answer(
-                    response_set_id=response_set_id,
-                    question_id=qid,
-                    payload={"value": value, "option_id": opt},
-                )
+                latest.pop(qid, None)
+                latest[qid] = (value, opt)
         except HamiltonValidationError:
-            results.append(
-                {
-                    "question_id": qid,
-                    "outcome": "error",
-                    "error": {
-                        "code": "VALIDATION_FAILED",
-                    },
-                }
-            )
+            results[pos] = _item_error(qid, "VALIDATION_FAILED")
             continue
         except Exception:
-            results.append(
-                {
-                    "question_id": qid,
-                    "outcome": "error",
-                    "error": {
-                        "code": "INTERNAL_ERROR",
-                    },
-                }
-            )
+            logger.error("answers_batch_item_validation_failed q_id=%s", qid, exc_info=True)
+            results[pos] = _item_error(qid, "INTERNAL_ERROR")
             continue
+        planned.append((pos, qid, screen_key))
 
-        # Recompute fresh ETag for the item/screen
+    # Phase 2: apply all accepted items in one transaction
+    write_ok = True
+    if planned:
         try:
-            sv2 = ScreenView(**assemble_screen_view(response_set_id, screen_key))
-            new_etag = sv2.etag or ""
+            bulk_upsert_answers(
+                response_set_id,
+                [(q, op[0], op[1]) for q, op in latest.items() if op is not None],
+                [q for q, op in latest.items() if op is None],
+                {qid: skey for _pos, qid, skey in planned},
+            )
         except Exception:
-            new_etag = ""
-
-        results.append({"question_id": qid, "outcome": "success", "etag": new_etag})
+            logger.error("answers_batch_write_failed rs_id=%s", response_set_id, exc_info=True)
+            write_ok = False
+
+    # Phase 3: one fresh Screen-ETag per touched screen
+    fresh_by_screen: dict[str, str] = {}
+    new_etag = ""
+    for pos, qid, screen_key in planned:
+        if not write_ok:
+            results[pos] = _item_error(qid, "INTERNAL_ERROR")
+            continue
+        if screen_key not in fresh_by_screen:
+            try:
+                fresh_by_screen[screen_key] = memoized_screen_etag(response_set_id, screen_key)
+            except Exception:
+                fresh_by_screen[screen_key] = ""
+        new_etag = fresh_by_screen[screen_key]
+        results[pos] = {"question_id": qid, "outcome": "success", "etag": new_etag}
 
     resp = JSONResponse(
         {"batch_result": {"items": results}, "events": []},
@@ -2109,6 +2120,61 @@ def batch_upsert_answers(
     except Exception:
         logger.error("answers_final_log_failed", exc_info=True)
 
+
+class _RequestBodyStreamingResponse(StreamingResponse):
+    """StreamingResponse whose iterator itself consumes the request body.
+
+    The base class listens for client disconnects by reading `receive` in
+    parallel on pre-2.4 ASGI servers, which would steal body chunks from the
+    iterator; `request.stream()` already surfaces disconnects, so stream only.
+    """
+
+    async def __call__(self, scope, receive, send):  # type: ignore[no-untyped-def]
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post(
+    "/response-sets/{response_set_id}/answers:ingest",
+    summary="Stream-ingest answers from NDJSON",
+    responses={
+        200: {"content": {"application/x-ndjson": {}}},
+        404: {"content": {"application/problem+json": {}}},
+        415: {"content": {"application/problem+json": {}}},
+    },
+)
+async def ingest_answers_ndjson(response_set_id: str, request: Request):
+    """Bulk-ingest answers from an `application/x-ndjson` body.
+
+    The body is consumed incrementally and written in chunked transactions;
+    per-line outcomes stream back as NDJSON, ending with a summary line. No
+    per-item If-Match is taken: this path serves migrations and offline sync.
+    """
+    ctype = (request.headers.get("content-type") or "").split(";", 1)[0].strip().lower()
+    if ctype not in ("application/x-ndjson", "application/ndjson"):
+        return JSONResponse(
+            problem_pre_request_content_type_unsupported("application/x-ndjson"),
+            status_code=415,
+            media_type="application/problem+json",
+        )
+    if not await run_in_threadpool(response_set_exists, response_set_id):
+        problem = {
+            "title": "Not Found",
+            "status": 404,
+            "detail": f"response_set_id '{response_set_id}' not found",
+        }
+        return JSONResponse(problem, status_code=404, media_type="application/problem+json")
+    resp = _RequestBodyStreamingResponse(
+        stream_ingest_outcomes(response_set_id, request.stream()),
+        media_type="application/x-ndjson",
+    )
+    # Screens change as chunks commit, so headers carry the placeholder token;
+    # the trailing summary line lists each touched screen's final Screen-ETag.
+    emit_etag_headers(resp, scope="screen", token="", include_generic=True)
+    return resp
+
+
 # Per-question POST route mirroring PATCH autosave semantics
 @router.post(
     "/response-sets/{response_set_id}/answers/{question_id}",
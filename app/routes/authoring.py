@@ -878,7 +878,7 @@ async def update_question_visibility(
         if resolved:
             parent_qid = resolved
 
-    # Two-node cycle detection
+    # Parent cycle detection (any length, via the in-memory parent index)
     if isinstance(parent_qid, str) and parent_qid:
         from app.logic.repository_questions import is_parent_cycle as repo_is_cycle
         if repo_is_cycle(question_id, parent_qid):
@@ -3,12 +3,24 @@
 from __future__ import annotations
 
 from fastapi import APIRouter, Body, Response, UploadFile, File, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import logging
 import csv
 import io
+import itertools
+from typing import Iterator
 
-from app.logic.csv_io import parse_import_csv, build_export_csv
+from app.logic.csv_io import (
+    parse_import_csv,
+    plan_import_csv,
+    build_export_csv,
+    get_cached_export,
+    iter_export_csv,
+    iter_export_csv_cached,
+)
+from app.logic.etag import compute_questionnaire_etag_for_authoring
+from app.guards.precondition import if_none_match_satisfied
 from app.logic.header_emitter import emit_etag_headers, SCOPE_TO_HEADER
 from app.logic.repository_questionnaires import (
     get_questionnaire_metadata,
@@ -42,6 +54,19 @@ def get_questionnaire(id: str):
     return {"questionnaire_id": id, "name": name, "description": description, "screens": []}
 
 
+async def _read_import_body(
+    request: Request, file: UploadFile | None, csv_export: bytes | None
+) -> tuple[bytes, str]:
+    """Return (csv_bytes, source) from a multipart file, bound body or raw body."""
+    if file is not None:
+        data = file.file.read() if hasattr(file, "file") else (file.read() or b"")  # type: ignore[attr-defined]
+        return data, "multipart"
+    if csv_export is not None:
+        return csv_export, "raw"
+    # Fallback: accept raw request body (e.g., text/plain or text/csv without Body binding)
+    return await request.body(), "raw"
+
+
 @router.post(
     "/questionnaires/import",
     summary="Import questionnaire CSV (v1.0)",
@@ -53,18 +78,7 @@ async def import_questionnaire(
     file: UploadFile | None = File(None),
     csv_export: bytes | None = Body(None, media_type="text/csv"),
 ):
-    data: bytes
-    source: str
-    if file is not None:
-        source = "multipart"
-        data = file.file.read() if hasattr(file, "file") else (file.read() or b"")  # type: ignore[attr-defined]
-    elif csv_export is not None:
-        source = "raw"
-        data = csv_export
-    else:
-        # Fallback: accept raw request body (e.g., text/plain or text/csv without Body binding)
-        source = "raw"
-        data = await request.body()
+    data, source = await _read_import_body(request, file, csv_export)
 
     # Pre-parse diagnostics: size and first-line preview (non-throwing)
     size_bytes = len(data)
@@ -88,7 +102,8 @@ async def import_questionnaire(
 
     # Parse with instrumentation; preserve existing semantics on failure
     try:
-        result = parse_import_csv(data)
+        # Validation and the DB apply are blocking; keep them off the event loop
+        result = await run_in_threadpool(parse_import_csv, data)
     except Exception as exc:
         try:
             logger.error(
@@ -125,6 +140,34 @@ async def import_questionnaire(
     return result
 
 
+@router.post(
+    "/questionnaires/import:dry-run",
+    summary="Plan a questionnaire CSV import without writing",
+    operation_id="planQuestionnaireCsvImport",
+    tags=["Import"],
+)
+async def plan_import_questionnaire(
+    request: Request,
+    file: UploadFile | None = File(None),
+    csv_export: bytes | None = Body(None, media_type="text/csv"),
+):
+    data, source = await _read_import_body(request, file, csv_export)
+    result = await run_in_threadpool(plan_import_csv, data)
+    try:
+        logger.info(
+            "import_questionnaire_dry_run",
+            extra={
+                "path": "/questionnaires/import:dry-run",
+                "source": source,
+                "size_bytes": len(data),
+                **result["plan"],
+            },
+        )
+    except Exception:
+        pass
+    return result
+
+
 @router.get(
     "/api/v1/questionnaires/{id}/export",
     include_in_schema=False,
@@ -135,14 +178,42 @@ async def import_questionnaire(
     operation_id="exportQuestionnaireCsv",
     tags=["Export"],
 )
-def export_questionnaire(id: str):
+def export_questionnaire(id: str, request: Request):
     # Existence check relaxed for Phase-0: always return CSV (header-only when unknown)
     id = (id or "").strip().strip('"').strip("'")
     exists = questionnaire_exists(id)
-    # Build legacy CSV (Phase-0 parity): exact 3-column header and rows via central builder
+    # Content-derived token over screens, questions and options: it changes
+    # exactly when the exported bytes would, so it keys conditional GET and
+    # the export artifact cache.
+    q_etag = compute_questionnaire_etag_for_authoring(id, include_questions=True)
+    if if_none_match_satisfied(request, q_etag):
+        not_modified = Response(status_code=304)
+        emit_etag_headers(not_modified, scope="questionnaire", token=q_etag, include_generic=True)
+        try:
+            logger.info(
+                "export_questionnaire",
+                extra={
+                    "path": f"/questionnaires/{id}/export",
+                    "questionnaire_id": id,
+                    "status": 304,
+                    "etag": q_etag,
+                },
+            )
+        except Exception:
+            pass
+        return not_modified
+    cached = get_cached_export(id, q_etag)
+    # Build legacy CSV (Phase-0 parity): exact 3-column header and rows via central builder.
+    # The export is streamed; pulling the header chunk here runs the query, so
+    # SQL failures still surface before any bytes are sent.
     # CLARKE: FINAL_GUARD epic-k-export-fallback — harden export to degrade gracefully on SQL errors
+    chunks: Iterator[bytes]
     try:
-        data = build_export_csv(id, rows=[]) if not exists else build_export_csv(id)
+        if cached is not None:
+            chunks = iter([cached])
+        else:
+            chunks = iter_export_csv(id, rows=[]) if not exists else iter_export_csv(id)
+            chunks = iter_export_csv_cached(id, q_etag, itertools.chain([next(chunks)], chunks))
     except Exception as exc:
         # Fallback to header-only CSV on any failure (e.g., sqlite3.OperationalError)
         try:
@@ -152,7 +223,8 @@ def export_questionnaire(id: str):
             _buf = io.StringIO()
             writer = csv.writer(_buf)
             writer.writerow(["question_id", "question_text", "placeholder_code"])  # legacy header
-            data = _buf.getvalue()
+            data = _buf.getvalue().encode("utf-8")
+        chunks = iter([data])
         try:
             logger.error(
                 "export_questionnaire_fallback",
@@ -166,9 +238,8 @@ def export_questionnaire(id: str):
             )
         except Exception:
             pass
-    resp = Response(content=data, media_type="text/csv; charset=utf-8")
-    # Compute and emit ETag headers defensively; ensure both Questionnaire-ETag and ETag exist.
-    q_etag = f"questionnaire:{id}"
+    resp = StreamingResponse(chunks, media_type="text/csv; charset=utf-8")
+    # Emit ETag headers defensively; ensure both Questionnaire-ETag and ETag exist.
     try:
         emit_etag_headers(resp, scope="questionnaire", token=q_etag, include_generic=True)
     except Exception:
@@ -181,6 +252,7 @@ def export_questionnaire(id: str):
                 "path": f"/questionnaires/{id}/export",
                 "questionnaire_id": id,
                 "status": 200,
+                "cache_hit": cached is not None,
                 "etag": resp.headers.get("ETag"),
                 "questionnaire_etag": resp.headers.get(SCOPE_TO_HEADER["questionnaire"]),
             },
@@ -199,5 +271,5 @@ def export_questionnaire(id: str):
     "/questionnaires/{id}/export.csv",
     include_in_schema=False,
 )
-def export_questionnaire_csv(id: str):
-    return export_questionnaire(id)
+def export_questionnaire_csv(id: str, request: Request):
+    return export_questionnaire(id, request)
@@ -16,9 +16,9 @@ from fastapi import APIRouter, Response, Request
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
 import logging
-import sys
 import uuid
 from importlib.util import find_spec
+from app.logging_setup import route_module_logger
 from app.logic.repository_response_sets import response_set_exists
 
 from app.logic.visibility_delta import compute_visibility_delta  # architectural import (in-process visibility)
@@ -49,15 +49,9 @@ from app.logic.etag import compute_screen_etag
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-# Ensure module INFO logs are emitted to stdout during integration runs
+# Ensure module INFO logs reach stdout (via the shared logging queue) during integration runs
 try:
-    if not logger.handlers:
-        _handler = logging.StreamHandler(stream=sys.stdout)
-        _handler.setLevel(logging.INFO)
-        _handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:%(name)s:%(message)s'))
-        logger.addHandler(_handler)
-    logger.setLevel(logging.INFO)
-    logger.propagate = False
+    route_module_logger(logger)
     # One-time module loaded marker
     try:
         logger.info("screens_module_loaded")
@@ -67,6 +67,30 @@ def reset_state() -> Response:
     except Exception:
         logger.error("Failed to clear answers repository state", exc_info=True)
 
+    # Clear maintained Screen-ETag state derived from the answers above
+    try:
+        from app.logic.screen_state import invalidate_screen_states
+
+        invalidate_screen_states()
+    except Exception:
+        logger.error("Failed to clear screen state records", exc_info=True)
+
+    # Clear maintained missing-mandatory state used by gating
+    try:
+        from app.logic.gating_state import invalidate_gating_states
+
+        invalidate_gating_states()
+    except Exception:
+        logger.error("Failed to clear gating state records", exc_info=True)
+
+    # Clear cached question metadata; scenarios may reseed questions
+    try:
+        from app.logic.question_meta import invalidate_question_meta
+
+        invalidate_question_meta()
+    except Exception:
+        logger.error("Failed to clear question metadata cache", exc_info=True)
+
     return Response(status_code=204)
 
 
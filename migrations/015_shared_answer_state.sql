@@ -0,0 +1,20 @@
+-- Shared answer-state backend tables (ANSWER_STATE_BACKEND=sql)
+-- Per-(response_set, screen) Screen-ETag version counters and the answer
+-- read-through cache, shared by all workers instead of per-process dicts.
+
+CREATE TABLE IF NOT EXISTS screen_state_version (
+    response_set_id TEXT NOT NULL,
+    screen_key TEXT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (response_set_id, screen_key)
+);
+
+CREATE TABLE IF NOT EXISTS screen_state_answer (
+    response_set_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    option_id TEXT,
+    value_text TEXT,
+    value_number DOUBLE PRECISION,
+    value_bool BOOLEAN,
+    PRIMARY KEY (response_set_id, question_id)
+);
@@ -0,0 +1,5 @@
+-- Replay store backend (REPLAY_STORE_BACKEND=sql)
+-- Idempotent-replay entries live in idempotency_key: the namespaced replay key
+-- in idempotency_key, the stored response as JSON text, and expires_at as TTL.
+
+ALTER TABLE idempotency_key ADD COLUMN IF NOT EXISTS response_body TEXT;
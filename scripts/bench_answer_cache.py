@@ -0,0 +1,60 @@
+"""Bytes-per-answer benchmark for the in-process answers cache.
+
+Compares the original layout (a plain dict keyed by freshly built
+``(str(response_set_id), str(question_id))`` tuples holding 4-tuples) with
+``BoundedAnswerCache`` (interned ids, slotted records grouped per response
+set). Ids are rebuilt from UUIDs per write, as the repository does, so
+uninterned layouts pay for a new string per entry.
+
+Usage: python scripts/bench_answer_cache.py [response_sets] [questions]
+"""
+
+from __future__ import annotations
+
+import gc
+import sys
+import tracemalloc
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.logic.answer_state_backend import BoundedAnswerCache  # noqa: E402
+
+
+def _fill(store, rs_ids: list[uuid.UUID], q_ids: list[uuid.UUID]) -> None:
+    for rs in rs_ids:
+        for i, q in enumerate(q_ids):
+            value = (None, None, None, True) if i % 3 == 0 else (None, f"text {i}", None, None)
+            store[(str(rs), str(q))] = value
+
+
+def _measure(factory, rs_ids: list[uuid.UUID], q_ids: list[uuid.UUID]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    store = factory()
+    _fill(store, rs_ids, q_ids)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del store
+    return used / (len(rs_ids) * len(q_ids))
+
+
+def main() -> None:
+    n_sets = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    n_questions = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rs_ids = [uuid.uuid4() for _ in range(n_sets)]
+    q_ids = [uuid.uuid4() for _ in range(n_questions)]
+    total = n_sets * n_questions
+    before = _measure(dict, rs_ids, q_ids)
+    after = _measure(lambda: BoundedAnswerCache(max_entries=total, ttl_seconds=3600), rs_ids, q_ids)
+    print(f"answers: {total} ({n_sets} response sets x {n_questions} questions)")
+    print(f"plain dict, tuple values : {before:8.1f} bytes/answer")
+    print(f"BoundedAnswerCache       : {after:8.1f} bytes/answer")
+    print(f"saving                   : {100.0 * (before - after) / before:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Questionnaire CSV import benchmark.
+
+Builds a throwaway SQLite database from ``sqlite_migrations``, seeds one
+questionnaire with a handful of screens, then times ``parse_import_csv`` on
+generated files: a first pass where every row is an insert, a second pass
+where every row updates an existing question, and a third that re-imports the
+second file unchanged (every row a no-op). A third of the rows are
+``enum_single`` questions with three options each.
+
+Usage: python scripts/bench_csv_import.py [rows ...]   (default: 10000 100000)
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+SCREENS = 20
+
+
+def _setup_engine():
+    tmp = Path(tempfile.mkdtemp(prefix="bench_csv_import_"))
+    url = f"sqlite:///{tmp / 'bench.db'}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["TEST_DATABASE_URL"] = url
+    os.environ["AUTO_APPLY_MIGRATIONS"] = "0"
+    from app.db.base import get_engine  # noqa: E402
+    from app.db.migrations_runner import apply_migrations  # noqa: E402
+
+    migrations = tmp / "migrations"
+    shutil.copytree(ROOT / "sqlite_migrations", migrations)
+    (migrations / "_journal.json").unlink(missing_ok=True)
+    eng = get_engine(url)
+    apply_migrations(eng, migrations_dir=str(migrations))
+    return eng, tmp
+
+
+def _seed_screens(eng) -> None:
+    from sqlalchemy import text as sql_text
+
+    qn = str(uuid.uuid4())
+    with eng.begin() as conn:
+        conn.execute(sql_text("INSERT INTO questionnaire (questionnaire_id, name) VALUES (:q, 'bench')"), {"q": qn})
+        conn.execute(
+            sql_text(
+                "INSERT INTO screen (screen_id, questionnaire_id, screen_key, title, screen_order) "
+                "VALUES (:s, :q, :k, :k, :o)"
+            ),
+            [{"s": str(uuid.uuid4()), "q": qn, "k": f"screen_{i}", "o": i} for i in range(SCREENS)],
+        )
+
+
+def _build_csv(n_rows: int, prefix: str, text_suffix: str) -> bytes:
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(
+        ["external_qid", "screen_key", "question_order", "question_text", "answer_kind", "mandatory", "placeholder_code", "options"]
+    )
+    for i in range(n_rows):
+        enum = i % 3 == 0
+        writer.writerow(
+            [
+                f"{prefix}_{i}",
+                f"screen_{i % SCREENS}",
+                i // SCREENS,
+                f"Question {i} {text_suffix}",
+                "enum_single" if enum else "short_string",
+                "true" if i % 2 else "false",
+                "",
+                "a:Alpha|b:Beta|c:Gamma" if enum else "",
+            ]
+        )
+    return buf.getvalue().encode("utf-8")
+
+
+def main() -> None:
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    eng, tmp = _setup_engine()
+    try:
+        _seed_screens(eng)
+        from app.logic.csv_io import parse_import_csv  # noqa: E402
+
+        for n in sizes:
+            prefix = f"bench{n}"
+            for label, suffix in (("insert", "v1"), ("update", "v2"), ("noop", "v2")):
+                data = _build_csv(n, prefix, suffix)
+                started = time.perf_counter()
+                result = parse_import_csv(data)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"rows={n:>7} {label:<6}: {elapsed:8.2f} s  ({n / elapsed:9.0f} rows/s)  "
+                    f"created={result['created']} updated={result['updated']} errors={len(result['errors'])}"
+                )
+    finally:
+        eng.dispose()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""CSV import validation benchmark: inline vs the process pool.
+
+Times validation of generated import files inline (`validate_chunk` over all
+records) and on the persistent import pool (`_validate_records` with the
+parallel threshold forced to 1), after one warm-up import so worker start-up
+is excluded as it is for a long-running server. The smallest size where the
+pool wins is the value to use for ``CSV_IMPORT_PARALLEL_MIN_ROWS`` on that
+host; if the pool never wins, leave parallel validation off.
+
+Usage: python scripts/bench_csv_validate.py [workers] [rows ...]
+       (default: os.cpu_count() workers; 20000 100000 500000 rows)
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _build_csv(n_rows: int) -> bytes:
+    buf = io.StringIO(newline="")
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(
+        ["external_qid", "screen_key", "question_order", "question_text", "answer_kind", "mandatory", "placeholder_code", "options"]
+    )
+    for i in range(n_rows):
+        enum = i % 3 == 0
+        writer.writerow(
+            [
+                f"bench_{i}",
+                f"screen_{i % 20}",
+                i // 20,
+                f"Question {i}",
+                "enum_single" if enum else "short_string",
+                "true" if i % 2 else "false",
+                "",
+                "a:Alpha|b:Beta|c:Gamma" if enum else "",
+            ]
+        )
+    return buf.getvalue().encode("utf-8")
+
+
+def main() -> None:
+    args = [int(a) for a in sys.argv[1:]]
+    workers = args[0] if args else (os.cpu_count() or 1)
+    sizes = args[1:] or [20000, 100000, 500000]
+    os.environ["CSV_IMPORT_WORKERS"] = str(max(2, workers))
+    os.environ["CSV_IMPORT_PARALLEL_MIN_ROWS"] = "1"
+    from app.logic import csv_io  # noqa: E402
+    from app.logic.csv_validation import validate_chunk  # noqa: E402
+
+    try:
+        # Warm the pool: start-up is paid once per server process
+        csv_io._validate_records(*csv_io._read_import_records(_build_csv(csv_io.IMPORT_CHUNK_ROWS * 2)))
+        for n in sizes:
+            fieldnames, records = csv_io._read_import_records(_build_csv(n))
+            started = time.perf_counter()
+            validate_chunk(fieldnames, 2, records)
+            inline = time.perf_counter() - started
+            started = time.perf_counter()
+            csv_io._validate_records(fieldnames, records)
+            pooled = time.perf_counter() - started
+            print(f"rows={n:>7} inline: {inline:7.2f} s  pool({csv_io.IMPORT_WORKERS}): {pooled:7.2f} s")
+    finally:
+        csv_io.shutdown_import_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Bytes-per-entry benchmark for the in-process replay store.
+
+Compares the original layout (a plain dict keyed by
+``"{token}:{response_set_id}:{question_id}:{sha256 hex}"`` strings holding
+``{"body", "etag", "screen_etag"}`` dicts) with ``BoundedReplayStore``
+(16-byte key digests, zlib-compressed JSON values). Bodies are shaped like
+an answers PATCH response for a screen of a few questions.
+
+Usage: python scripts/bench_replay_store.py [entries]   (default: 100000)
+"""
+
+from __future__ import annotations
+
+import gc
+import hashlib
+import sys
+import tracemalloc
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.logic.replay_store import BoundedReplayStore  # noqa: E402
+
+QUESTIONS_PER_SCREEN = 5
+
+
+def _entry(i: int) -> tuple[str, dict]:
+    rs, q = str(uuid.uuid4()), str(uuid.uuid4())
+    body_hash = hashlib.sha256(f"payload-{i}".encode()).hexdigest()
+    etag = f'W/"{hashlib.sha1(str(i).encode()).hexdigest()}"'
+    body = {
+        "saved": {"question_id": q, "state_version": i % 7},
+        "etag": etag,
+        "screen_view": {
+            "screen": {"screen_key": f"screen_{i % 20}"},
+            "questions": [
+                {"question_id": str(uuid.uuid4()), "kind": "short_string", "label": f"Question {n}", "answer": None}
+                for n in range(QUESTIONS_PER_SCREEN)
+            ],
+            "etag": etag,
+        },
+        "visibility_delta": {"now_visible": [], "now_hidden": [], "suppressed_answers": []},
+        "suppressed_answers": [],
+        "events": [],
+    }
+    key = f"idem-{uuid.uuid4()}:{rs}:{q}:{body_hash}"
+    return key, {"body": body, "etag": etag, "screen_etag": etag}
+
+
+def _measure(factory, n: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    store = factory()
+    for i in range(n):
+        # Keys and bodies are built per write, as the request path does
+        key, value = _entry(i)
+        store[key] = value
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del store
+    return used / n
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    before = _measure(dict, n)
+    after = _measure(lambda: BoundedReplayStore("bench", max_entries=n), n)
+    print(f"replay entries: {n}")
+    print(f"plain dict, str keys, dict values : {before:8.1f} bytes/entry  ({before * n / 2**20:7.1f} MiB)")
+    print(f"BoundedReplayStore                : {after:8.1f} bytes/entry  ({after * n / 2**20:7.1f} MiB)")
+    print(f"saving                            : {100.0 * (before - after) / before:8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Per-call overhead of inline vs module-level SQL statements.
+
+For the hottest repository reads (answer probe, question -> screen_key,
+questions on a screen, response-set existence) times three variants:
+
+- ``inline``: ``sql_text(...)`` built inside the call, as the repository
+  functions used to do;
+- ``module``: the module-level statement the repositories now reuse;
+- ``build``: constructing the inline statement alone, without executing it.
+
+Runs against a throwaway SQLite database built from ``sqlite_migrations``
+unless ``--url`` points at another database (e.g. a migrated Postgres; on
+``postgresql+psycopg://`` set ``DB_PREPARE_THRESHOLD=0`` to prepare
+server-side from the first call).
+
+Usage: python scripts/bench_statements.py [--url URL] [calls]   (default: 20000)
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def _setup_engine(url: str | None):
+    if url:
+        os.environ["DATABASE_URL"] = url
+        os.environ["TEST_DATABASE_URL"] = url
+        from app.db.base import get_engine  # noqa: E402
+
+        return get_engine(url), None
+    tmp = Path(tempfile.mkdtemp(prefix="bench_statements_"))
+    url = f"sqlite:///{tmp / 'bench.db'}"
+    os.environ["DATABASE_URL"] = url
+    os.environ["TEST_DATABASE_URL"] = url
+    os.environ["AUTO_APPLY_MIGRATIONS"] = "0"
+    from app.db.base import get_engine  # noqa: E402
+    from app.db.migrations_runner import apply_migrations  # noqa: E402
+
+    migrations = tmp / "migrations"
+    shutil.copytree(ROOT / "sqlite_migrations", migrations)
+    (migrations / "_journal.json").unlink(missing_ok=True)
+    eng = get_engine(url)
+    apply_migrations(eng, migrations_dir=str(migrations))
+    return eng, tmp
+
+
+def _seed(eng) -> dict:
+    from sqlalchemy import text as sql_text
+
+    ids = {
+        "qn": str(uuid.uuid4()),
+        "sid": str(uuid.uuid4()),
+        "qid": str(uuid.uuid4()),
+        "rs": str(uuid.uuid4()),
+        "skey": "bench_screen",
+    }
+    with eng.begin() as conn:
+        conn.execute(sql_text("INSERT INTO questionnaire (questionnaire_id, name) VALUES (:qn, 'bench')"), ids)
+        conn.execute(
+            sql_text(
+                "INSERT INTO screen (screen_id, questionnaire_id, screen_key, title, screen_order) "
+                "VALUES (:sid, :qn, :skey, 'Bench', 1)"
+            ),
+            ids,
+        )
+        conn.execute(
+            sql_text(
+                "INSERT INTO questionnaire_question "
+                "(question_id, screen_key, screen_id, external_qid, question_order, question_text, answer_kind, mandatory) "
+                "VALUES (:qid, :skey, :sid, 'Q_BENCH', 1, 'Bench?', 'short_string', FALSE)"
+            ),
+            ids,
+        )
+    return ids
+
+
+def _cases(ids: dict):
+    from sqlalchemy import text as sql_text
+
+    from app.logic import repository_answers as ra
+    from app.logic import repository_response_sets as rrs
+    from app.logic import repository_screens as rs
+
+    return [
+        (
+            "existing answer",
+            lambda: sql_text(
+                """
+                SELECT option_id, value_text, value_number, value_bool, value_json
+                FROM response
+                WHERE response_set_id = :rs AND question_id = :qid
+                """
+            ),
+            ra._EXISTING_ANSWER_SQL,
+            {"rs": ids["rs"], "qid": ids["qid"]},
+        ),
+        (
+            "question screen_key",
+            lambda: sql_text("SELECT screen_key FROM questionnaire_question WHERE question_id = :qid"),
+            rs._QUESTION_SCREEN_KEY_SQL,
+            {"qid": ids["qid"]},
+        ),
+        (
+            "screen questions",
+            lambda: sql_text(
+                """
+                SELECT question_id, external_qid, question_text, answer_kind, mandatory, question_order
+                FROM questionnaire_question
+                WHERE screen_key = :skey
+                ORDER BY question_order ASC, question_id ASC
+                """
+            ),
+            rs._SCREEN_QUESTIONS_SQL,
+            {"skey": ids["skey"]},
+        ),
+        (
+            "response set exists",
+            lambda: sql_text("SELECT 1 FROM response_set WHERE response_set_id = :rs LIMIT 1"),
+            rrs._RESPONSE_SET_EXISTS_SQL,
+            {"rs": ids["rs"]},
+        ),
+    ]
+
+
+def _per_call_us(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    url = None
+    if args[:1] == ["--url"]:
+        url, args = args[1], args[2:]
+    calls = int(args[0]) if args else 20_000
+    eng, tmp = _setup_engine(url)
+    try:
+        ids = _seed(eng)
+        print(f"calls per case: {calls}  dialect: {eng.dialect.name}/{eng.dialect.driver}")
+        print(f"{'statement':<22}{'inline us':>12}{'module us':>12}{'build us':>12}{'saved':>9}")
+        with eng.connect() as conn:
+            for name, build, stmt, params in _cases(ids):
+                # Warm both the compiled cache and any driver statement cache
+                conn.execute(stmt, params).fetchall()
+                inline = _per_call_us(lambda: conn.execute(build(), params).fetchall(), calls)
+                module = _per_call_us(lambda: conn.execute(stmt, params).fetchall(), calls)
+                build_only = _per_call_us(build, calls)
+                saved = 100.0 * (inline - module) / inline if inline else 0.0
+                print(f"{name:<22}{inline:>12.1f}{module:>12.1f}{build_only:>12.1f}{saved:>8.1f}%")
+    finally:
+        eng.dispose()
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
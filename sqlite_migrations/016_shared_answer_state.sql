@@ -0,0 +1,19 @@
+-- SQLite migration: shared answer-state backend tables (ANSWER_STATE_BACKEND=sql)
+-- Purpose: Screen-ETag version counters and answer cache shared across workers
+
+CREATE TABLE IF NOT EXISTS screen_state_version (
+  response_set_id TEXT NOT NULL,
+  screen_key TEXT NOT NULL,
+  version INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (response_set_id, screen_key)
+);
+
+CREATE TABLE IF NOT EXISTS screen_state_answer (
+  response_set_id TEXT NOT NULL,
+  question_id TEXT NOT NULL,
+  option_id TEXT,
+  value_text TEXT,
+  value_number REAL,
+  value_bool INTEGER,
+  PRIMARY KEY (response_set_id, question_id)
+);
@@ -0,0 +1,13 @@
+-- SQLite migration: idempotency_key table for the replay store (REPLAY_STORE_BACKEND=sql)
+-- Purpose: namespaced replay entries with a JSON response body and expires_at TTL
+
+CREATE TABLE IF NOT EXISTS idempotency_key (
+  key_id TEXT PRIMARY KEY,
+  idempotency_key TEXT UNIQUE,
+  request_fingerprint TEXT,
+  response_body TEXT,
+  created_at TEXT,
+  expires_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_idempotency_expires ON idempotency_key(expires_at);
@@ -56,3 +56,64 @@ def functional_sqlite_bootstrap() -> None:
     _apply_sqlite_migrations()
     # Nothing to tear down; in-memory DB lifecycle is tied to process/engine
     yield
+
+
+@pytest.fixture
+def seed_questionnaire():
+    """Insert a questionnaire with one screen and the given questions.
+
+    Each question spec is a dict with optional keys `mandatory`,
+    `answer_kind`, `parent` (index of an earlier question in the list) and
+    `visible_if` (stored JSON text). Returns a dict with `questionnaire_id`,
+    `screen_key` and `question_ids` in spec order.
+    """
+    import uuid
+
+    from sqlalchemy import text as sql_text
+
+    from app.db.base import get_engine
+    from app.logic.question_meta import invalidate_question_meta
+
+    def _seed(specs: list[dict]) -> dict:
+        qn_id = str(uuid.uuid4())
+        screen_id = str(uuid.uuid4())
+        screen_key = f"screen_{qn_id[:8]}"
+        qids = [str(uuid.uuid4()) for _ in specs]
+        with get_engine().begin() as conn:
+            conn.execute(
+                sql_text("INSERT INTO questionnaire (questionnaire_id, name, description) VALUES (:q, 'n', 'd')"),
+                {"q": qn_id},
+            )
+            conn.execute(
+                sql_text(
+                    "INSERT INTO screen (screen_id, questionnaire_id, screen_key, title, screen_order) "
+                    "VALUES (:s, :q, :k, 't', 1)"
+                ),
+                {"s": screen_id, "q": qn_id, "k": screen_key},
+            )
+            for order, (qid, spec) in enumerate(zip(qids, specs), start=1):
+                parent = spec.get("parent")
+                conn.execute(
+                    sql_text(
+                        "INSERT INTO questionnaire_question (question_id, screen_id, screen_key, external_qid, "
+                        "question_order, question_text, answer_kind, mandatory, parent_question_id, visible_if_value) "
+                        "VALUES (:q, :s, :k, :e, :o, :t, :a, :m, :p, :v)"
+                    ),
+                    {
+                        "q": qid,
+                        "s": screen_id,
+                        "k": screen_key,
+                        "e": f"EXT_{qid[:8]}",
+                        "o": order,
+                        "t": f"Question {order}",
+                        "a": spec.get("answer_kind", "short_string"),
+                        "m": 1 if spec.get("mandatory") else 0,
+                        "p": qids[parent] if parent is not None else None,
+                        "v": spec.get("visible_if"),
+                    },
+                )
+        # Other tests may have cached metadata for an older snapshot
+        invalidate_question_meta()
+        return {"questionnaire_id": qn_id, "screen_key": screen_key, "question_ids": qids}
+
+    return _seed
@@ -0,0 +1,117 @@
+"""Functional tests for the bounded in-process answer cache (LRU, TTL, pinning, compact records)."""
+
+from __future__ import annotations
+
+import sys
+import threading
+
+from app.logic.answer_state_backend import BoundedAnswerCache
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+_ANSWER = ("opt-1", "text", None, None)
+
+
+def test_entries_expire_after_the_ttl():
+    clock = _Clock()
+    cache = BoundedAnswerCache(max_entries=10, ttl_seconds=30, clock=clock)
+    cache[("rs", "q1")] = _ANSWER
+
+    clock.now += 29
+    assert cache[("rs", "q1")] == _ANSWER
+    clock.now += 1
+
+    assert cache.get(("rs", "q1")) is None
+    assert len(cache) == 0
+    assert (cache.expirations, cache.hits, cache.misses) == (1, 1, 1)
+
+
+def test_eviction_drops_the_least_recently_used_response_set():
+    cache = BoundedAnswerCache(max_entries=3, ttl_seconds=60, clock=_Clock())
+    cache[("rs-a", "q1")] = _ANSWER
+    cache[("rs-b", "q1")] = _ANSWER
+    assert cache[("rs-a", "q1")] == _ANSWER  # rs-b is now least recently used
+
+    cache[("rs-c", "q1")] = _ANSWER
+    cache[("rs-c", "q2")] = _ANSWER
+
+    assert sorted(cache) == [("rs-a", "q1"), ("rs-c", "q1"), ("rs-c", "q2")]
+    assert cache.evictions == 1
+
+
+def test_a_single_oversized_response_set_trims_its_oldest_entries():
+    cache = BoundedAnswerCache(max_entries=2, ttl_seconds=60, clock=_Clock())
+    for qid in ("q1", "q2", "q3"):
+        cache[("rs", qid)] = _ANSWER
+
+    assert sorted(cache) == [("rs", "q2"), ("rs", "q3")]
+    assert cache.evictions == 1
+
+
+def test_pinned_answers_survive_size_and_ttl_eviction():
+    clock = _Clock()
+    cache = BoundedAnswerCache(max_entries=1, ttl_seconds=10, clock=clock)
+    cache[("rs-a", "q1")] = _ANSWER
+    cache.pin(("rs-a", "q1"))
+
+    cache[("rs-b", "q1")] = _ANSWER
+    cache[("rs-b", "q2")] = _ANSWER
+    clock.now += 60
+
+    assert cache[("rs-a", "q1")] == _ANSWER
+    assert cache.stats()["pinned"] == 1
+
+
+def test_overwriting_or_evicting_a_pinned_answer_unpins_it():
+    clock = _Clock()
+    cache = BoundedAnswerCache(max_entries=10, ttl_seconds=10, clock=clock)
+    cache[("rs", "q1")] = _ANSWER
+    cache.pin(("rs", "q1"))
+    cache[("rs", "q2")] = _ANSWER
+    cache.pin(("rs", "q2"))
+
+    cache[("rs", "q1")] = ("opt-2", None, 1.0, None)  # the DB write succeeded
+    clock.now += 10
+
+    assert ("rs", "q1") not in cache
+    assert cache.evict_response_set("rs") == 1
+    assert len(cache) == 0 and cache.stats()["pinned"] == 0
+
+
+def test_entries_are_slotted_records_with_interned_ids():
+    cache = BoundedAnswerCache(clock=_Clock())
+    rs_id, qid, opt = "".join(["rs-", "interned"]), "".join(["q-", "interned"]), "".join(["opt-", "x"])
+
+    cache[(rs_id, qid)] = (opt, None, 2.0, None)
+    (stored_rs, entries), = cache._sets.items()
+    (stored_qid, entry), = entries.items()
+
+    assert stored_rs is sys.intern(rs_id) and stored_qid is sys.intern(qid)
+    assert entry.option_id is sys.intern(opt)
+    assert not hasattr(entry, "__dict__")
+    assert cache[(rs_id, qid)] == (opt, None, 2.0, None)
+
+
+def test_concurrent_writers_keep_the_size_bound():
+    cache = BoundedAnswerCache(max_entries=50, ttl_seconds=60)
+
+    def _write(worker: int) -> None:
+        for i in range(500):
+            cache[(f"rs-{worker}-{i % 7}", f"q{i}")] = _ANSWER
+            cache.get((f"rs-{worker}-{(i + 3) % 7}", f"q{i - 1}"))
+
+    threads = [threading.Thread(target=_write, args=(w,)) for w in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(cache) == cache.stats()["entries"] <= 50
+    assert len(list(cache)) == len(cache)
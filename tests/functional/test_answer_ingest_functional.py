@@ -0,0 +1,52 @@
+"""Functional tests for NDJSON line splitting and parsing in answer ingestion."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.logic.answer_ingest import iter_ndjson_lines, parse_ingest_line
+
+
+def _lines(chunks: list[bytes], max_line_bytes: int) -> list[tuple[int, bytes | None]]:
+    async def _source():
+        for chunk in chunks:
+            yield chunk
+
+    async def _collect():
+        return [item async for item in iter_ndjson_lines(_source(), max_line_bytes)]
+
+    return asyncio.run(_collect())
+
+
+def test_lines_split_across_chunks_are_reassembled():
+    out = _lines([b'{"a":', b"1}\n\n", b'{"b":2}\n{"c":3}'], 1024)
+
+    assert out == [(1, b'{"a":1}'), (3, b'{"b":2}'), (4, b'{"c":3}')]
+
+
+def test_overlong_line_within_one_chunk_is_rejected():
+    long_line = b'{"v":"' + b"x" * 2000 + b'"}'
+
+    out = _lines([b'{"a":1}\n' + long_line + b'\n{"b":2}\n'], 1024)
+
+    assert out == [(1, b'{"a":1}'), (2, None), (3, b'{"b":2}')]
+
+
+def test_overlong_line_spread_over_chunks_is_rejected():
+    out = _lines([b'{"v":"' + b"x" * 700, b"x" * 700, b'"}\n{"b":2}\n'], 1024)
+
+    assert out == [(1, None), (2, b'{"b":2}')]
+
+
+def test_overlong_trailing_line_without_newline_is_rejected():
+    out = _lines([b'{"a":1}\n', b"x" * 1500], 1024)
+
+    assert out == [(1, b'{"a":1}'), (2, None)]
+
+
+def test_parse_errors_are_carried_per_line():
+    assert parse_ingest_line(1, None)[3] == ("VALIDATION_FAILED", "line too long")
+    assert parse_ingest_line(2, b"{not json")[3] == ("VALIDATION_FAILED", "invalid json")
+    assert parse_ingest_line(3, b"[1]")[3] == ("VALIDATION_FAILED", "line must be an object")
+    assert parse_ingest_line(4, b'{"value": 1}')[3][0] == "RUN_BATCH_ITEM_QUESTION_ID_MISSING"
+    assert parse_ingest_line(5, b'{"question_id": "q", "value": "v"}') == (5, "q", {"value": "v"}, None)
@@ -0,0 +1,218 @@
+"""Functional tests for batch answer writes, NDJSON ingest and gating.
+
+Runs the real app in-process (TestClient) against the shared functional
+SQLite database; questionnaires are seeded per test via `seed_questionnaire`.
+"""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+from app.logic import answer_state_backend, repository_answers
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    from app.main import create_app
+
+    return TestClient(create_app())
+
+
+def _new_response_set(client: TestClient) -> str:
+    resp = client.post("/api/v1/response-sets", json={"name": "functional"})
+    assert resp.status_code == 201
+    return resp.json()["response_set_id"]
+
+
+def _stored_answers(rs_id: str) -> dict[str, str | None]:
+    with get_engine().connect() as conn:
+        rows = conn.execute(
+            sql_text("SELECT question_id, value_text FROM response WHERE response_set_id = :rs"),
+            {"rs": rs_id},
+        ).fetchall()
+    return {str(r[0]): r[1] for r in rows}
+
+
+def _batch(client: TestClient, rs_id: str, items: list[dict]) -> dict:
+    resp = client.post(
+        f"/api/v1/response-sets/{rs_id}/answers:batch",
+        json={"items": [{"etag": "*", **item} for item in items]},
+        headers={"If-Match": "*"},
+    )
+    assert resp.status_code == 200
+    return resp.json()["batch_result"]
+
+
+def _gate(client: TestClient, rs_id: str) -> dict:
+    resp = client.post(f"/api/v1/response-sets/{rs_id}/regenerate-check", json={})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def _blocking(verdict: dict) -> set[str]:
+    return {item["question_id"] for item in verdict["blocking_items"]}
+
+
+def test_batch_clear_then_set_keeps_the_set(client, seed_questionnaire):
+    q = seed_questionnaire([{}])["question_ids"][0]
+    rs_id = _new_response_set(client)
+
+    result = _batch(client, rs_id, [
+        {"question_id": q, "body": {"clear": True}},
+        {"question_id": q, "body": {"value": "5"}},
+    ])
+
+    assert [item["outcome"] for item in result["items"]] == ["success", "success"]
+    assert _stored_answers(rs_id) == {q: "5"}
+
+
+def test_batch_set_then_clear_deletes_the_answer(client, seed_questionnaire):
+    q = seed_questionnaire([{}])["question_ids"][0]
+    rs_id = _new_response_set(client)
+    _batch(client, rs_id, [{"question_id": q, "body": {"value": "1"}}])
+
+    _batch(client, rs_id, [
+        {"question_id": q, "body": {"value": "2"}},
+        {"question_id": q, "body": {"clear": True}},
+    ])
+
+    assert _stored_answers(rs_id) == {}
+
+
+def test_ndjson_ingest_streams_per_line_outcomes_and_summary(client, seed_questionnaire):
+    seeded = seed_questionnaire([{}, {}])
+    q1, q2 = seeded["question_ids"]
+    rs_id = _new_response_set(client)
+    _batch(client, rs_id, [{"question_id": q2, "body": {"value": "old"}}])
+    lines = [
+        {"question_id": q1, "value": "a"},
+        {"question_id": "not-a-question", "value": "x"},
+        {"question_id": q2, "clear": True},
+    ]
+    body = "".join(json.dumps(line) + "\n" for line in lines)
+
+    resp = client.post(
+        f"/api/v1/response-sets/{rs_id}/answers:ingest",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert resp.status_code == 200
+    out = [json.loads(line) for line in resp.text.splitlines() if line.strip()]
+    assert [o.get("outcome") for o in out[:3]] == ["success", "error", "success"]
+    assert out[1]["error"]["code"] == "RUN_QUESTION_ID_UNKNOWN"
+    summary = out[-1]["summary"]
+    assert (summary["lines"], summary["succeeded"], summary["failed"]) == (3, 2, 1)
+    assert seeded["screen_key"] in summary["screen_etags"]
+    assert _stored_answers(rs_id) == {q1: "a"}
+
+
+def test_ndjson_ingest_rejects_other_content_types_and_unknown_sets(client, seed_questionnaire):
+    rs_id = _new_response_set(client)
+
+    wrong_type = client.post(
+        f"/api/v1/response-sets/{rs_id}/answers:ingest",
+        content="{}\n",
+        headers={"Content-Type": "application/json"},
+    )
+    unknown_set = client.post(
+        "/api/v1/response-sets/00000000-0000-4000-8000-000000000000/answers:ingest",
+        content="{}\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert wrong_type.status_code == 415
+    assert unknown_set.status_code == 404
+
+
+def test_gating_is_scoped_to_the_answered_questionnaire(client, seed_questionnaire):
+    q_a, q_b = seed_questionnaire([{"mandatory": True}, {"mandatory": True}])["question_ids"]
+    other = seed_questionnaire([{"mandatory": True}])["question_ids"][0]
+    rs_id = _new_response_set(client)
+
+    _batch(client, rs_id, [{"question_id": q_a, "body": {"value": "x"}}])
+    first = _gate(client, rs_id)
+    _batch(client, rs_id, [{"question_id": q_b, "body": {"value": "y"}}])
+    second = _gate(client, rs_id)
+    _batch(client, rs_id, [{"question_id": q_b, "body": {"clear": True}}])
+    third = _gate(client, rs_id)
+
+    # The other questionnaire's mandatory question never blocks
+    assert _blocking(first) == {q_b} and other not in _blocking(first)
+    assert second == {"ok": True, "blocking_items": []}
+    assert _blocking(third) == {q_b}
+
+
+def test_gating_skips_mandatory_questions_hidden_by_visibility(client, seed_questionnaire):
+    parent, child = seed_questionnaire([
+        {},
+        {"mandatory": True, "parent": 0, "visible_if": '["yes"]'},
+    ])["question_ids"]
+    rs_id = _new_response_set(client)
+
+    _batch(client, rs_id, [{"question_id": parent, "body": {"value": "no"}}])
+    hidden = _gate(client, rs_id)
+    _batch(client, rs_id, [{"question_id": parent, "body": {"value": "yes"}}])
+    shown = _gate(client, rs_id)
+
+    assert hidden["ok"] is True
+    assert _blocking(shown) == {child}
+
+
+@pytest.fixture
+def sql_answer_state(monkeypatch):
+    """Swap in the shared SQL answer stores, as ANSWER_STATE_BACKEND=sql opens them."""
+    monkeypatch.setattr(answer_state_backend, "_OPENED_BACKEND", "sql")
+    monkeypatch.setattr(repository_answers, "_INMEM_ANSWERS", answer_state_backend.SqlAnswers())
+    monkeypatch.setattr(repository_answers, "_SCREEN_VERSIONS", answer_state_backend.SqlVersions())
+
+
+def test_backend_is_resolved_when_the_stores_are_opened(monkeypatch):
+    monkeypatch.setattr(answer_state_backend, "_OPENED_BACKEND", "memory")
+    monkeypatch.setenv("ANSWER_STATE_BACKEND", "sql")
+
+    assert answer_state_backend.is_shared_answer_state() is False
+
+
+def test_gating_reads_answers_from_the_db_with_a_shared_backend(client, seed_questionnaire, sql_answer_state):
+    q_a, q_b = seed_questionnaire([{"mandatory": True}, {"mandatory": True}])["question_ids"]
+    rs_id = _new_response_set(client)
+    _batch(client, rs_id, [{"question_id": q_a, "body": {"value": "x"}}])
+    assert _blocking(_gate(client, rs_id)) == {q_b}
+
+    # Another worker answers q_b; only the DB sees that write
+    with get_engine().begin() as conn:
+        conn.execute(
+            sql_text(
+                "INSERT INTO response (response_id, response_set_id, question_id, value_text) "
+                "VALUES (:id, :rs, :q, 'y')"
+            ),
+            {"id": f"{rs_id[:8]}-other-worker", "rs": rs_id, "q": q_b},
+        )
+
+    assert _gate(client, rs_id) == {"ok": True, "blocking_items": []}
+
+
+def test_failed_write_degrades_when_the_fallback_store_fails_too(seed_questionnaire, sql_answer_state, monkeypatch):
+    (qid,) = seed_questionnaire([{}])["question_ids"]
+
+    class _DownAnswers(dict):
+        def __setitem__(self, key, value):
+            raise ConnectionError("database unavailable")
+
+    def _fail(_eng):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(repository_answers, "_INMEM_ANSWERS", _DownAnswers())
+    monkeypatch.setattr(repository_answers, "_upsert_statement", _fail)
+
+    result = repository_answers.upsert_answer("rs-fallback", qid, {"value": "x"})
+    versions = repository_answers.bulk_upsert_answers("rs-fallback", [(qid, "y", None)], [], {qid: "s"})
+
+    assert result["question_id"] == qid
+    assert versions == {"s": repository_answers.get_screen_version("rs-fallback", "s")}
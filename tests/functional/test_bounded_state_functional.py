@@ -0,0 +1,100 @@
+"""Functional tests for the bounded per-response-set state maps."""
+
+from __future__ import annotations
+
+from app.logic import gating_state, repository_answers
+from app.logic.answer_state_backend import InProcessVersions
+from app.logic.bounded_state import BoundedStateMap
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = _Clock()
+    states = BoundedStateMap("test", max_entries=10, ttl_seconds=30, clock=clock)
+    states["rs"] = {"a"}
+
+    clock.now += 29
+    assert states["rs"] == {"a"}
+    clock.now += 1
+    assert "rs" not in states
+    assert states.get("rs") is None
+    assert states.expirations == 1
+
+
+def test_inserting_past_the_bound_evicts_the_least_recently_used():
+    states = BoundedStateMap("test", max_entries=2, ttl_seconds=60, clock=_Clock())
+    states["a"] = 1
+    states["b"] = 2
+    assert states["a"] == 1  # refresh "a" so "b" is the eviction candidate
+
+    states["c"] = 3
+
+    assert "b" not in states
+    assert (states["a"], states["c"]) == (1, 3)
+    assert states.evictions == 1
+
+
+def test_reads_return_the_stored_record():
+    states = BoundedStateMap("test", clock=_Clock())
+    states["rs"] = {"a"}
+
+    states["rs"].add("b")
+
+    assert states["rs"] == {"a", "b"}
+
+
+def test_write_generations_are_bounded_and_never_repeat(monkeypatch):
+    generations = BoundedStateMap("test", max_entries=1, ttl_seconds=60)
+    monkeypatch.setattr(repository_answers, "_WRITE_GENERATIONS", generations)
+    monkeypatch.setattr(repository_answers, "advance_screen_version", lambda *_args: None)
+    monkeypatch.setattr(repository_answers, "_SCREEN_VERSIONS", InProcessVersions())
+
+    repository_answers._bump_screen_version("rs-a", "s")
+    first = repository_answers.get_write_generation("rs-a")
+    repository_answers._bump_screen_version("rs-b", "s")  # evicts rs-a
+    assert repository_answers.get_write_generation("rs-a") == 0
+    repository_answers._bump_screen_version("rs-a", "s")
+
+    assert len(generations) == 1
+    assert repository_answers.get_write_generation("rs-a") not in {0, first}
+
+
+def _seed_gating(rs_id: str, write_count: int) -> gating_state.GatingState:
+    return gating_state.record_gating_state(
+        rs_id,
+        ["qn"],
+        gating_state.question_meta_generation(),
+        frozenset({"q1"}),
+        frozenset({"q1"}),
+        [],
+        write_count=write_count,
+    )
+
+
+def test_gating_records_are_bounded(monkeypatch):
+    monkeypatch.setattr(gating_state, "_GATING_STATES", BoundedStateMap("test", max_entries=1, ttl_seconds=60))
+
+    _seed_gating("rs-a", gating_state.gating_write_count("rs-a"))
+    _seed_gating("rs-b", gating_state.gating_write_count("rs-b"))
+
+    assert gating_state.get_gating_state("rs-a") is None
+    assert gating_state.get_gating_state("rs-b") is not None
+
+
+def test_a_seed_racing_a_write_is_not_kept_across_eviction(monkeypatch):
+    monkeypatch.setattr(gating_state, "_WRITE_COUNTS", BoundedStateMap("test", max_entries=1, ttl_seconds=60))
+    gating_state.mark_answered("rs-a", ["q0"])
+    seen = gating_state.gating_write_count("rs-a")
+
+    gating_state.mark_answered("rs-b", ["q0"])  # evicts rs-a's stamp
+    gating_state.mark_answered("rs-a", ["q1"])  # lands while the seed loads answers
+    _seed_gating("rs-a", seen)
+
+    assert gating_state.get_gating_state("rs-a") is None
@@ -0,0 +1,75 @@
+"""Functional tests for CSV import validation, inline and on the import pool."""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.logic import csv_io
+from app.logic.csv_validation import validate_chunk
+
+_ROOT = Path(__file__).resolve().parents[2]
+
+_CSV = (
+    "external_qid,screen_key,question_order,question_text,answer_kind,mandatory,placeholder_code,options\n"
+    + "".join(
+        f"ext_{i},s1,{i},Question {i},{'enum_single' if i % 2 else 'short_string'},true,,a:A|b:B|c\n"
+        for i in range(1, 8)
+    )
+    + ",s1,9,No external id,short_string,false,,\n"
+    + "ext_bad,s1,10,,short_string,false,,\n"
+).encode("utf-8")
+
+
+def test_rows_are_normalized_and_errors_carry_line_numbers():
+    fieldnames, records = csv_io._read_import_records(_CSV)
+
+    result = validate_chunk(fieldnames, 2, records)
+
+    assert [r.external_qid for r in result.rows] == [f"ext_{i}" for i in range(1, 8)]
+    assert result.rows[0].options == (("a", "A"), ("b", "B"), ("c", "c"))
+    assert result.rows[1].options == ()
+    assert result.missing_ext == [{"line": 9, "message": "missing external_qid"}]
+    assert [e["line"] for e in result.invalid] == [9, 10]
+
+
+def test_validator_module_does_not_load_the_application():
+    out = subprocess.run(
+        [sys.executable, "-c", "import sys, app.logic.csv_validation; print('app.main' in sys.modules)"],
+        cwd=_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert out.stdout.strip() == "False"
+
+
+def test_pool_validation_matches_inline_and_reuses_one_pool(monkeypatch):
+    monkeypatch.setattr(csv_io, "IMPORT_WORKERS", 2)
+    monkeypatch.setattr(csv_io, "IMPORT_PARALLEL_MIN_ROWS", 1)
+    monkeypatch.setattr(csv_io, "IMPORT_CHUNK_ROWS", 3)
+    fieldnames, records = csv_io._read_import_records(_CSV)
+    try:
+        first = csv_io._validate_records(fieldnames, records)
+        pool = csv_io._import_pool()
+        second = csv_io._validate_records(fieldnames, records)
+        assert csv_io._import_pool() is pool
+    finally:
+        csv_io.shutdown_import_pool()
+
+    inline = validate_chunk(fieldnames, 2, records)
+    assert len(first) == 3
+    assert [r for c in first for r in c.rows] == inline.rows
+    assert [e for c in first for e in c.invalid] == inline.invalid
+    assert first == second
+
+
+def test_parallel_validation_is_off_by_default():
+    if "CSV_IMPORT_WORKERS" in os.environ:
+        pytest.skip("CSV_IMPORT_WORKERS is configured")
+    assert csv_io.IMPORT_WORKERS == 1
@@ -0,0 +1,81 @@
+"""Functional tests for the in-memory enum option index and its invalidation.
+
+Runs against the shared functional SQLite database; questionnaires are
+seeded per test via `seed_questionnaire`.
+"""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+from app.logic import enum_resolution
+from app.logic.enum_resolution import enum_option_value, invalidate_enum_index, resolve_enum_option
+
+
+def _add_option(question_id: str, option_id: str, value: str, sort_index: int) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(
+            sql_text(
+                "INSERT INTO answer_option (option_id, question_id, value, label, sort_index) "
+                "VALUES (:oid, :q, :v, :v, :i)"
+            ),
+            {"oid": option_id, "q": question_id, "v": value, "i": sort_index},
+        )
+
+
+@pytest.fixture
+def enum_question(seed_questionnaire) -> dict:
+    seeded = seed_questionnaire([{"answer_kind": "enum_single"}])
+    qid = seeded["question_ids"][0]
+    _add_option(qid, f"{qid[:8]}-a", "alpha", 1)
+    _add_option(qid, f"{qid[:8]}-b", "beta", 2)
+    return {"questionnaire_id": seeded["questionnaire_id"], "question_id": qid}
+
+
+def _no_sql(monkeypatch) -> None:
+    def _fail():
+        raise AssertionError("option probe reached SQL despite an index hit")
+
+    monkeypatch.setattr(enum_resolution, "get_engine", _fail)
+
+
+def test_known_options_resolve_from_the_index(enum_question, monkeypatch):
+    qid = enum_question["question_id"]
+    resolve_enum_option(qid, value_token="alpha")  # builds the index
+
+    _no_sql(monkeypatch)
+
+    assert resolve_enum_option(qid, value_token="beta") == f"{qid[:8]}-b"
+    assert enum_option_value(qid, f"{qid[:8]}-a") == "alpha"
+
+
+def test_an_option_added_elsewhere_is_confirmed_in_sql_and_indexed(enum_question, monkeypatch):
+    qid = enum_question["question_id"]
+    resolve_enum_option(qid, value_token="alpha")
+
+    _add_option(qid, f"{qid[:8]}-g", "gamma", 3)  # another worker's import
+    assert resolve_enum_option(qid, value_token="gamma") == f"{qid[:8]}-g"
+    _no_sql(monkeypatch)
+
+    assert resolve_enum_option(qid, value_token="gamma") == f"{qid[:8]}-g"
+
+
+def test_unknown_tokens_resolve_to_none(enum_question):
+    qid = enum_question["question_id"]
+
+    assert resolve_enum_option(qid, value_token="missing") is None
+    assert enum_option_value(qid, "no-such-option") is None
+
+
+def test_invalidation_drops_the_questionnaire_index(enum_question):
+    qid, qn = enum_question["question_id"], enum_question["questionnaire_id"]
+    resolve_enum_option(qid, value_token="alpha")
+    assert qn in enum_resolution._INDEXES
+
+    invalidate_enum_index(qid)
+
+    assert qn not in enum_resolution._INDEXES
+    assert resolve_enum_option(qid, value_token="alpha") == f"{qid[:8]}-a"
+    assert qn in enum_resolution._INDEXES
@@ -0,0 +1,91 @@
+"""Functional tests for the queued logging pipeline (handler, sampling, config parsing)."""
+
+from __future__ import annotations
+
+import logging
+import queue
+
+import pytest
+
+from app.logging_setup import SamplingFilter, _DeferredQueueHandler, _parse_pairs
+
+
+class _Collect(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__()
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+@pytest.fixture
+def queued_logger():
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    logger = logging.getLogger("tests.logging_setup")
+    handler = _DeferredQueueHandler(q)
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    yield logger, q, handler
+    logger.handlers.clear()
+
+
+def test_arguments_are_merged_before_the_caller_mutates_them(queued_logger):
+    logger, q, _ = queued_logger
+    missing = ["q1"]
+
+    logger.info("missing=%s", missing)
+    missing.append("q2")
+
+    record = q.get_nowait()
+    assert record.getMessage() == "missing=['q1']"
+    assert record.args is None
+
+
+def test_later_handlers_still_see_args_and_exc_info(queued_logger):
+    logger, q, _ = queued_logger
+    after = _Collect()
+    logger.addHandler(after)
+
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logger.error("failed rs_id=%s", "rs-1", exc_info=True)
+
+    queued = q.get_nowait()
+    seen = after.records[0]
+    assert seen.args == ("rs-1",)
+    assert seen.exc_info is not None and seen.exc_info[0] is ValueError
+    assert queued is not seen
+    assert queued.exc_info is None and "ValueError: boom" in queued.exc_text
+    assert "ValueError: boom" in logging.Formatter().format(queued)
+
+
+def test_sampling_drops_info_for_the_longest_matching_prefix_only():
+    sampler = SamplingFilter({"app.logic": 1.0, "app.logic.screen_builder": 0.0})
+
+    def _record(name: str, level: int) -> logging.LogRecord:
+        return logging.LogRecord(name, level, __file__, 1, "m", None, None)
+
+    assert sampler.filter(_record("app.logic.screen_builder", logging.INFO)) is False
+    assert sampler.filter(_record("app.logic.screen_builder.sub", logging.DEBUG)) is False
+    assert sampler.filter(_record("app.logic.screen_builder", logging.WARNING)) is True
+    assert sampler.filter(_record("app.logic.screen_builder_extra", logging.INFO)) is True
+    assert sampler.filter(_record("app.logic.gating", logging.INFO)) is True
+
+
+def test_sampled_out_records_never_reach_the_queue(queued_logger):
+    logger, q, handler = queued_logger
+    handler.addFilter(SamplingFilter({"tests.logging_setup": 0.0}))
+
+    logger.info("dropped")
+    logger.warning("kept")
+
+    assert q.get_nowait().getMessage() == "kept"
+    assert q.empty()
+
+
+def test_level_and_rate_pairs_ignore_malformed_items():
+    assert _parse_pairs("a=1, b = WARNING ,bad,=2,c=,") == {"a": "1", "b": "WARNING"}
+    assert _parse_pairs(None) == {}
@@ -0,0 +1,61 @@
+"""Functional tests for authoring parent-cycle detection.
+
+Parent links are written straight to the shared functional SQLite database,
+as another worker process would, so the checks must confirm the in-memory
+parent index against the database.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+from app.logic.parent_index import would_create_cycle
+from app.logic.repository_questions import is_parent_cycle
+
+
+def _set_parent(question_id: str, parent: str | None) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(
+            sql_text("UPDATE questionnaire_question SET parent_question_id = :p WHERE question_id = :q"),
+            {"p": parent, "q": question_id},
+        )
+
+
+def test_self_parenting_is_a_cycle(seed_questionnaire):
+    q = seed_questionnaire([{}])["question_ids"][0]
+
+    assert is_parent_cycle(q, q) is True
+
+
+def test_links_closing_a_long_chain_are_rejected(seed_questionnaire):
+    a, b, c, d = seed_questionnaire([{}, {}, {}, {}])["question_ids"]
+    # Load the index before the chain exists: d <- c <- b <- a
+    assert would_create_cycle(a, d) is False
+    _set_parent(b, a)
+    _set_parent(c, b)
+    _set_parent(d, c)
+
+    assert is_parent_cycle(a, d) is True
+    assert is_parent_cycle(d, a) is False
+
+
+def test_parent_tokens_given_as_external_qids_are_followed(seed_questionnaire):
+    a, b, c = seed_questionnaire([{}, {}, {}])["question_ids"]
+    assert would_create_cycle(a, c) is False
+    _set_parent(b, a)
+    # Legacy schemas store the parent's external_qid instead of its id
+    _set_parent(c, f"EXT_{b[:8]}")
+
+    assert would_create_cycle(a, c) is True
+
+
+def test_links_removed_elsewhere_no_longer_block(seed_questionnaire):
+    a, b, c = seed_questionnaire([{}, {}, {}])["question_ids"]
+    _set_parent(b, a)
+    _set_parent(c, b)
+    assert would_create_cycle(a, c) is True
+
+    _set_parent(b, None)
+
+    assert would_create_cycle(a, c) is False
@@ -0,0 +1,105 @@
+"""Functional tests for the question metadata cache and its invalidation.
+
+Runs against the shared functional SQLite database; questionnaires are
+seeded per test via `seed_questionnaire`.
+"""
+
+from __future__ import annotations
+
+import uuid
+
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+from app.logic import parent_index, question_meta
+from app.logic.question_meta import (
+    get_all_question_meta,
+    get_question_meta,
+    invalidate_question_meta,
+    question_meta_generation,
+)
+from app.logic.visibility_graph import get_graph_for_question, invalidate_questionnaire_graph
+
+
+def _set_column(question_id: str, column: str, value: object) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(
+            sql_text(f"UPDATE questionnaire_question SET {column} = :v WHERE question_id = :q"),
+            {"v": value, "q": question_id},
+        )
+
+
+def test_metadata_is_cached_until_invalidated(seed_questionnaire):
+    seeded = seed_questionnaire([{}])
+    (qid,) = seeded["question_ids"]
+    assert get_question_meta(qid).answer_kind == "short_string"
+
+    _set_column(qid, "answer_kind", "boolean")
+    cached = get_question_meta(qid)
+    invalidate_question_meta(seeded["questionnaire_id"])
+
+    assert cached.answer_kind == "short_string"
+    assert get_question_meta(qid).answer_kind == "boolean"
+
+
+def test_a_load_racing_an_invalidation_is_not_cached(seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}])
+    (qid,) = seeded["question_ids"]
+    real_load = question_meta._load_meta
+
+    def _load_then_invalidate(questionnaire_id):
+        loaded = real_load(questionnaire_id)
+        invalidate_question_meta()  # an authoring write lands mid-load
+        return loaded
+
+    monkeypatch.setattr(question_meta, "_load_meta", _load_then_invalidate)
+    assert get_question_meta(qid) is not None
+    monkeypatch.undo()
+
+    assert seeded["questionnaire_id"] not in question_meta._META_CACHE
+
+
+def test_expiry_moves_the_generation(monkeypatch):
+    generation = question_meta_generation()
+    monkeypatch.setattr(question_meta, "QUESTION_META_TTL_SECONDS", 30.0)
+    monkeypatch.setattr(question_meta, "_EXPIRES_AT", 0.0)
+
+    assert question_meta_generation() == generation + 1
+
+
+def test_unknown_questions_are_remembered_until_invalidated(seed_questionnaire):
+    seeded = seed_questionnaire([{}])
+    stray = str(uuid.uuid4())
+    assert get_question_meta(stray) is None
+    assert question_meta._QUESTION_QUESTIONNAIRE[stray] is None
+
+    with get_engine().begin() as conn:
+        screen_id = conn.execute(
+            sql_text("SELECT screen_id FROM screen WHERE screen_key = :k"), {"k": seeded["screen_key"]}
+        ).scalar_one()
+        conn.execute(
+            sql_text(
+                "INSERT INTO questionnaire_question (question_id, screen_id, screen_key, external_qid, "
+                "question_order, question_text, answer_kind, mandatory) "
+                "VALUES (:q, :s, :k, :q, 9, 'Late', 'short_string', 0)"
+            ),
+            {"q": stray, "s": screen_id, "k": seeded["screen_key"]},
+        )
+    assert get_question_meta(stray) is None
+    invalidate_question_meta()
+
+    assert get_question_meta(stray).questionnaire_id == seeded["questionnaire_id"]
+
+
+def test_external_qid_parents_resolve_once_for_every_index(seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}, {"parent": 0, "visible_if": '["yes"]'}])
+    parent, child = seeded["question_ids"]
+    _set_column(child, "parent_question_id", f"ext_{parent[:8]}")  # lower-cased external_qid token
+    invalidate_question_meta()
+    invalidate_questionnaire_graph()
+    monkeypatch.setattr(parent_index, "_PARENT_OF", None)
+
+    assert get_question_meta(child).parent_question_id == parent
+    assert get_graph_for_question(child).parent_of[child] == parent
+    assert parent_index._index()[child] == parent
+    assert get_all_question_meta()[child].visible_if_value == '["yes"]'
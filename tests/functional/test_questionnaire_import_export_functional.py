@@ -0,0 +1,214 @@
+"""Functional tests for CSV import (apply and dry-run planner) and the export cache.
+
+Runs the real app in-process (TestClient) against the shared functional
+SQLite database; questionnaires are seeded per test via `seed_questionnaire`.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+from app.logic.csv_io import ImportRow, _load_import_snapshot, get_cached_export, plan_import_rows
+
+_IMPORT_HEADER = [
+    "external_qid",
+    "screen_key",
+    "question_order",
+    "question_text",
+    "answer_kind",
+    "mandatory",
+    "placeholder_code",
+    "options",
+]
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    from app.main import create_app
+
+    return TestClient(create_app())
+
+
+def _import_csv(rows: list[dict]) -> bytes:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=_IMPORT_HEADER, lineterminator="\n")
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({k: row.get(k, "") for k in _IMPORT_HEADER})
+    return buf.getvalue().encode("utf-8")
+
+
+def _seeded_rows(seeded: dict) -> list[dict]:
+    """Import rows that exactly mirror the seeded questions."""
+    return [
+        {
+            "external_qid": f"EXT_{qid[:8]}",
+            "screen_key": seeded["screen_key"],
+            "question_order": order,
+            "question_text": f"Question {order}",
+            "answer_kind": "short_string",
+            "mandatory": "false",
+        }
+        for order, qid in enumerate(seeded["question_ids"], start=1)
+    ]
+
+
+def _post_csv(client: TestClient, path: str, data: bytes) -> dict:
+    resp = client.post(path, content=data, headers={"Content-Type": "text/csv"})
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def _question_texts(qids: list[str]) -> list[str]:
+    with get_engine().connect() as conn:
+        return [
+            conn.execute(
+                sql_text("SELECT question_text FROM questionnaire_question WHERE question_id = :q"), {"q": q}
+            ).scalar_one()
+            for q in qids
+        ]
+
+
+def test_dry_run_counts_unchanged_rows_as_noops(client, seed_questionnaire):
+    seeded = seed_questionnaire([{}, {}])
+
+    result = _post_csv(client, "/api/v1/questionnaires/import:dry-run", _import_csv(_seeded_rows(seeded)))
+
+    assert result["errors"] == []
+    assert (result["created"], result["updated"]) == (0, 2)
+    plan = result["plan"]
+    assert plan["noops"] == 2
+    assert (plan["creates"], plan["updates"], plan["option_replacements"]) == (0, 0, 0)
+    assert plan["estimated_statements"] == 0 and plan["estimated_rows_written"] == 0
+
+
+def test_dry_run_reports_the_diff_without_writing(client, seed_questionnaire):
+    seeded = seed_questionnaire([{}, {}])
+    rows = _seeded_rows(seeded)
+    rows[0]["question_text"] = "Reworded"
+    rows.append(
+        {
+            "external_qid": f"EXT_NEW_{seeded['questionnaire_id'][:8]}",
+            "screen_key": seeded["screen_key"],
+            "question_order": 3,
+            "question_text": "Added",
+            "answer_kind": "enum_single",
+            "options": "a:A|b:B",
+        }
+    )
+
+    result = _post_csv(client, "/api/v1/questionnaires/import:dry-run", _import_csv(rows))
+
+    plan = result["plan"]
+    assert (plan["creates"], plan["updates"], plan["noops"]) == (1, 1, 1)
+    # One statement each for the update, the insert and the two options
+    assert plan["estimated_statements"] == 3
+    assert plan["estimated_rows_written"] == 4
+    assert _question_texts(seeded["question_ids"]) == ["Question 1", "Question 2"]
+
+
+def test_import_updates_existing_questions_by_id(client, seed_questionnaire):
+    seeded = seed_questionnaire([{}, {}])
+    rows = _seeded_rows(seeded)
+    rows[1]["question_text"] = "Reworded"
+    rows[1]["mandatory"] = "true"
+
+    result = _post_csv(client, "/api/v1/questionnaires/import", _import_csv(rows))
+
+    assert (result["created"], result["updated"], result["errors"]) == (0, 2, [])
+    assert _question_texts(seeded["question_ids"]) == ["Question 1", "Reworded"]
+    with get_engine().connect() as conn:
+        count = conn.execute(
+            sql_text("SELECT COUNT(*) FROM questionnaire_question WHERE external_qid = :e"),
+            {"e": rows[1]["external_qid"]},
+        ).scalar_one()
+    assert count == 1
+
+
+def test_planned_updates_are_keyed_on_question_id(seed_questionnaire):
+    seeded = seed_questionnaire([{}])
+    qid = seeded["question_ids"][0]
+    with get_engine().connect() as conn:
+        existing, screens = _load_import_snapshot(conn)
+    row = ImportRow(2, f"EXT_{qid[:8]}", seeded["screen_key"], 1, "Changed", "short_string", False, None, ())
+
+    plan = plan_import_rows([row], existing, screens)
+
+    assert [u["qid"] for u in plan.updates] == [qid]
+
+
+def _add_options(question_id: str, values: list[str]) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(
+            sql_text(
+                "INSERT INTO answer_option (option_id, question_id, value, label, sort_index) "
+                "VALUES (:oid, :q, :v, :l, :i)"
+            ),
+            [
+                {"oid": f"{question_id[:8]}-{i}", "q": question_id, "v": v, "l": v.upper(), "i": i}
+                for i, v in enumerate(values, start=1)
+            ],
+        )
+
+
+def test_export_writes_one_row_per_question_with_only_the_header_columns(client, seed_questionnaire):
+    seeded = seed_questionnaire([{"answer_kind": "enum_single"}, {}])
+    q_enum, q_text = seeded["question_ids"]
+    _add_options(q_enum, ["a", "b", "c"])
+
+    resp = client.get(f"/api/v1/questionnaires/{seeded['questionnaire_id']}/export")
+
+    assert list(csv.reader(io.StringIO(resp.text))) == [
+        ["question_id", "question_text", "answer_kind"],
+        [q_enum, "Question 1", "enum_single"],
+        [q_text, "Question 2", "short_string"],
+    ]
+
+
+def test_export_etag_ignores_option_changes_it_does_not_export(client, seed_questionnaire):
+    seeded = seed_questionnaire([{"answer_kind": "enum_single"}])
+    path = f"/api/v1/questionnaires/{seeded['questionnaire_id']}/export"
+    first = client.get(path)
+
+    _add_options(seeded["question_ids"][0], ["x"])
+    again = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+
+
+def test_export_honours_if_none_match_and_caches_the_body(client, seed_questionnaire):
+    seeded = seed_questionnaire([{}, {}])
+    qn_id = seeded["questionnaire_id"]
+    path = f"/api/v1/questionnaires/{qn_id}/export"
+
+    first = client.get(path)
+    etag = first.headers["ETag"]
+    not_modified = client.get(path, headers={"If-None-Match": etag})
+
+    assert first.status_code == 200
+    assert "Question 1" in first.text
+    assert get_cached_export(qn_id, etag) == first.content
+    assert not_modified.status_code == 304
+    assert not_modified.headers["ETag"] == etag
+    assert not_modified.content == b""
+
+
+def test_export_changes_etag_and_body_after_an_import(client, seed_questionnaire):
+    seeded = seed_questionnaire([{}])
+    path = f"/api/v1/questionnaires/{seeded['questionnaire_id']}/export"
+    first = client.get(path)
+    rows = _seeded_rows(seeded)
+    rows[0]["question_text"] = "Reworded"
+
+    _post_csv(client, "/api/v1/questionnaires/import", _import_csv(rows))
+    stale = client.get(path, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert stale.status_code == 200
+    assert stale.headers["ETag"] != first.headers["ETag"]
+    assert "Reworded" in stale.text and "Question 1" not in stale.text
@@ -0,0 +1,91 @@
+"""Functional tests for the bounded replay stores (TTL, eviction, sweeping)."""
+
+from __future__ import annotations
+
+import uuid
+
+import app.logic.replay_store as replay_store
+from app.logic.replay_store import BoundedReplayStore, SqlReplayStore
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_the_ttl():
+    clock = _Clock()
+    store = BoundedReplayStore("test", max_entries=10, ttl_seconds=30, clock=clock)
+    store["k"] = {"status": 200, "body": [1, 2]}
+
+    clock.now += 29
+    assert store["k"] == {"status": 200, "body": [1, 2]}
+    clock.now += 1
+    assert "k" not in store
+    assert store.expirations == 1
+    assert len(store) == 0
+
+
+def test_inserting_past_the_bound_evicts_the_least_recently_used():
+    store = BoundedReplayStore("test", max_entries=2, ttl_seconds=60, clock=_Clock())
+    store["a"] = 1
+    store["b"] = 2
+    assert store["a"] == 1  # refresh "a" so "b" is the eviction candidate
+
+    store["c"] = 3
+
+    assert "b" not in store
+    assert (store["a"], store["c"]) == (1, 3)
+    assert store.evictions == 1
+
+
+def test_sweep_drops_only_expired_entries():
+    clock = _Clock()
+    store = BoundedReplayStore("test", max_entries=10, ttl_seconds=10, clock=clock)
+    store["old"] = 1
+    clock.now += 5
+    store["new"] = 2
+    clock.now += 5
+
+    assert store.sweep() == 1
+    assert len(store) == 1 and store["new"] == 2
+
+
+def test_reads_return_independent_copies():
+    store = BoundedReplayStore("test", clock=_Clock())
+    store["k"] = {"items": [1]}
+
+    store["k"]["items"].append(2)
+
+    assert store["k"] == {"items": [1]}
+
+
+def test_sql_store_round_trips_and_expires():
+    namespace = f"test-{uuid.uuid4().hex[:8]}"
+    live = SqlReplayStore(namespace, ttl_seconds=60)
+    expired = SqlReplayStore(namespace, ttl_seconds=-1)
+
+    live["kept"] = {"status": 201}
+    expired["gone"] = {"status": 200}
+
+    assert live["kept"] == {"status": 201}
+    assert "gone" not in live
+    assert len(live) == 1
+    assert live.sweep() == 1
+
+
+def test_sql_store_read_failures_are_misses(monkeypatch):
+    store = SqlReplayStore(f"test-{uuid.uuid4().hex[:8]}", ttl_seconds=60)
+    store["k"] = {"status": 200}
+
+    class _DownEngine:
+        def connect(self):
+            raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(replay_store, "get_engine", lambda: _DownEngine())
+
+    assert store.get("k") is None
+    assert "k" not in store
@@ -0,0 +1,81 @@
+"""Functional tests for Screen-ETags served from maintained screen-state records.
+
+Runs against the shared functional SQLite database; questionnaires are
+seeded per test via `seed_questionnaire`.
+"""
+
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.logic import etag, screen_state
+from app.logic.bounded_state import BoundedStateMap
+from app.logic.repository_answers import get_screen_version, load_screen_snapshot, upsert_answer
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    from app.main import create_app
+
+    return TestClient(create_app())
+
+
+def _new_response_set(client: TestClient) -> str:
+    resp = client.post("/api/v1/response-sets", json={"name": "functional"})
+    assert resp.status_code == 201
+    return resp.json()["response_set_id"]
+
+
+def _fresh_etag(rs_id: str, screen_key: str) -> str:
+    """Screen-ETag hashed from a freshly loaded snapshot, bypassing the records."""
+    return etag._screen_etag_from_snapshot(rs_id, screen_key, load_screen_snapshot(rs_id, screen_key))
+
+
+def _no_snapshot_loads(monkeypatch) -> None:
+    def _fail(*_args):
+        raise AssertionError("snapshot loaded despite a current screen-state record")
+
+    monkeypatch.setattr(etag, "load_screen_snapshot", _fail)
+
+
+def test_recorded_state_serves_the_etag_without_a_load(client, seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}, {}])
+    rs_id, skey = _new_response_set(client), seeded["screen_key"]
+    expected = etag.compute_screen_etag(rs_id, skey)  # seeds the record
+
+    _no_snapshot_loads(monkeypatch)
+
+    assert screen_state.get_screen_state(rs_id, skey) is not None
+    assert etag.compute_screen_etag(rs_id, skey) == expected
+
+
+def test_writes_keep_the_record_equal_to_a_fresh_snapshot(client, seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}, {"parent": 0, "visible_if": '["yes"]'}])
+    parent, _child = seeded["question_ids"]
+    rs_id, skey = _new_response_set(client), seeded["screen_key"]
+    hidden = etag.compute_screen_etag(rs_id, skey)
+
+    upsert_answer(rs_id, parent, {"value": "yes"})
+    state = screen_state.get_screen_state(rs_id, skey)
+
+    assert state is not None and state.version == get_screen_version(rs_id, skey)
+    assert state.visible_ids == frozenset(seeded["question_ids"])
+    assert state.etag == _fresh_etag(rs_id, skey) != hidden
+    _no_snapshot_loads(monkeypatch)
+    assert etag.compute_screen_etag(rs_id, skey) == state.etag
+
+
+def test_stale_or_evicted_records_fall_back_to_a_load(client, seed_questionnaire, monkeypatch):
+    states = BoundedStateMap("test", max_entries=1, ttl_seconds=60)
+    monkeypatch.setattr(screen_state, "_SCREEN_STATES", states)
+    seeded = seed_questionnaire([{}])
+    rs_a, rs_b, skey = _new_response_set(client), _new_response_set(client), seeded["screen_key"]
+
+    screen_state.record_screen_state(rs_a, skey, 99, [])  # version no longer current
+    assert etag.compute_screen_etag(rs_a, skey) == _fresh_etag(rs_a, skey)
+    etag.compute_screen_etag(rs_b, skey)  # evicts rs_a's records
+
+    assert screen_state.get_screen_state(rs_a, skey) is None
+    assert not screen_state.has_screen_states(rs_a)
+    assert len(states) == 1 and states.evictions == 1
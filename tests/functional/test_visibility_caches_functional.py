@@ -0,0 +1,239 @@
+"""Functional tests for the visibility rule cache, questionnaire graph and evaluation.
+
+Runs against the shared functional SQLite database; questionnaires are
+seeded per test via `seed_questionnaire`.
+"""
+
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text as sql_text
+
+from app.db.base import get_engine
+from app.logic import question_meta, repository_screens, screen_state, visibility_graph
+from app.logic.question_meta import invalidate_question_meta
+from app.logic.repository_answers import upsert_answer
+from app.logic.repository_screens import get_visibility_rules_for_screen, invalidate_visibility_rules_cache
+from app.logic.visibility_graph import (
+    get_graph_for_question,
+    get_questionnaire_graph,
+    invalidate_questionnaire_graph,
+    reevaluate_descendants,
+    visible_questions,
+)
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    from app.main import create_app
+
+    return TestClient(create_app())
+
+
+def _set_visible_if(question_id: str, value: str | None) -> None:
+    with get_engine().begin() as conn:
+        conn.execute(
+            sql_text("UPDATE questionnaire_question SET visible_if_value = :v WHERE question_id = :q"),
+            {"v": value, "q": question_id},
+        )
+
+
+def _expire_question_meta(monkeypatch) -> None:
+    monkeypatch.setattr(question_meta, "QUESTION_META_TTL_SECONDS", 30.0)
+    monkeypatch.setattr(question_meta, "_EXPIRES_AT", 0.0)
+
+
+def _count_rule_loads(monkeypatch) -> list[str]:
+    loads: list[str] = []
+    real_load = repository_screens._load_visibility_rules
+
+    def _counting(screen_key):
+        loads.append(screen_key)
+        return real_load(screen_key)
+
+    monkeypatch.setattr(repository_screens, "_load_visibility_rules", _counting)
+    return loads
+
+
+def test_rules_are_compiled_once_per_screen(seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}, {"parent": 0, "visible_if": '["yes", true]'}])
+    parent, child = seeded["question_ids"]
+    loads = _count_rule_loads(monkeypatch)
+
+    first = get_visibility_rules_for_screen(seeded["screen_key"])
+    first[child] = (None, None)  # callers get a copy
+    again = get_visibility_rules_for_screen(seeded["screen_key"])
+
+    assert loads == [seeded["screen_key"]]
+    assert again == {parent: (None, None), child: (parent, frozenset({"yes", "true"}))}
+
+
+def test_authoring_invalidation_recompiles_the_rules(seed_questionnaire):
+    seeded = seed_questionnaire([{}, {"parent": 0, "visible_if": '["yes"]'}])
+    child = seeded["question_ids"][1]
+    get_visibility_rules_for_screen(seeded["screen_key"])
+
+    _set_visible_if(child, '["no"]')
+    stale = get_visibility_rules_for_screen(seeded["screen_key"])
+    invalidate_visibility_rules_cache(seeded["screen_key"])
+
+    assert stale[child][1] == frozenset({"yes"})
+    assert get_visibility_rules_for_screen(seeded["screen_key"])[child][1] == frozenset({"no"})
+
+
+def test_rules_expire_with_the_question_meta_generation(seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}, {"parent": 0, "visible_if": '["yes"]'}])
+    child = seeded["question_ids"][1]
+    get_visibility_rules_for_screen(seeded["screen_key"])
+
+    # Another worker's authoring write: only the metadata TTL can reveal it
+    _set_visible_if(child, '["no"]')
+    _expire_question_meta(monkeypatch)
+
+    assert get_visibility_rules_for_screen(seeded["screen_key"])[child][1] == frozenset({"no"})
+
+
+def test_a_compile_racing_an_invalidation_is_not_cached(seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}])
+    real_load = repository_screens._load_visibility_rules
+
+    def _load_then_invalidate(screen_key):
+        rules = real_load(screen_key)
+        invalidate_question_meta()  # an authoring write lands mid-compile
+        return rules
+
+    monkeypatch.setattr(repository_screens, "_load_visibility_rules", _load_then_invalidate)
+    get_visibility_rules_for_screen(seeded["screen_key"])
+
+    assert seeded["screen_key"] not in repository_screens._VISIBILITY_RULES_CACHE
+
+
+def _chain(seed_questionnaire) -> dict:
+    """a -> b (visible when a=yes) -> c (visible when b=go)."""
+    return seed_questionnaire([{}, {"parent": 0, "visible_if": '["yes"]'}, {"parent": 1, "visible_if": '["go"]'}])
+
+
+def test_graph_is_built_once_and_indexes_children(seed_questionnaire, monkeypatch):
+    seeded = _chain(seed_questionnaire)
+    a, b, c = seeded["question_ids"]
+    loads: list[str] = []
+    real_load = visibility_graph._load_graph
+    monkeypatch.setattr(visibility_graph, "_load_graph", lambda qn: loads.append(qn) or real_load(qn))
+
+    graph = get_graph_for_question(c)
+
+    assert get_questionnaire_graph(seeded["questionnaire_id"]) is graph
+    assert loads == [seeded["questionnaire_id"]]
+    assert graph.children_of[a] == (b,) and graph.children_of[b] == (c,)
+    assert graph.descendants(a) == [b, c]
+    assert graph.topological_order == (a, b, c)
+
+
+def test_graph_rebuilds_after_invalidation_or_expiry(seed_questionnaire, monkeypatch):
+    seeded = _chain(seed_questionnaire)
+    qn, c = seeded["questionnaire_id"], seeded["question_ids"][2]
+    first = get_questionnaire_graph(qn)
+
+    invalidate_questionnaire_graph(qn)
+    rebuilt = get_questionnaire_graph(qn)
+    _set_visible_if(c, '["stop"]')
+    _expire_question_meta(monkeypatch)
+    expired = get_questionnaire_graph(qn)
+
+    assert rebuilt is not first
+    assert rebuilt.visible_if[c] == frozenset({"go"})
+    assert expired.visible_if[c] == frozenset({"stop"})
+
+
+def test_descendant_walk_only_flips_the_affected_subtree(seed_questionnaire):
+    a, b, c = _chain(seed_questionnaire)["question_ids"]
+    graph = get_graph_for_question(a)
+    stored = {b: "go"}
+    reads: list[str] = []
+
+    def value_of(qid):
+        reads.append(qid)
+        return stored.get(qid)
+
+    shown = reevaluate_descendants(graph, a, None, "yes", value_of)
+    hidden = reevaluate_descendants(graph, a, "yes", "no", value_of)
+    unchanged = reevaluate_descendants(graph, a, "no", "maybe", value_of)
+
+    assert shown == (sorted([b, c]), [])
+    assert hidden == ([], sorted([b, c]))
+    assert unchanged == ([], [])
+    assert set(reads) <= {b, c}  # only questions whose visibility flipped
+
+
+def test_screen_records_from_an_older_generation_read_as_missing(seed_questionnaire, monkeypatch):
+    seeded = seed_questionnaire([{}])
+    screen_state.record_screen_state("rs-generation", seeded["screen_key"], 1, seeded["question_ids"])
+    assert screen_state.get_screen_state("rs-generation", seeded["screen_key"]) is not None
+
+    _expire_question_meta(monkeypatch)
+
+    assert screen_state.get_screen_state("rs-generation", seeded["screen_key"]) is None
+
+
+def test_hidden_parents_hide_their_whole_subtree():
+    graph = visibility_graph.QuestionnaireGraph(
+        "qn",
+        {"a": None, "b": "a", "c": "b"},
+        {"a": None, "b": frozenset({"yes"}), "c": frozenset({"go"})},
+        {"a": "s1", "b": "s1", "c": "s2"},
+    )
+    stored = {"a": "no", "b": "go"}
+
+    visible = visibility_graph.evaluate_visibility(graph, stored.get)
+
+    # b still holds the value c is gated on, but b itself is hidden
+    assert visible == {"a"}
+    assert visibility_graph.effective_values(graph, {"b": "go"}, stored.get) == {"b": None}
+
+
+def test_parent_cycles_evaluate_as_hidden():
+    graph = visibility_graph.QuestionnaireGraph(
+        "qn",
+        {"a": None, "x": "y", "y": "x"},
+        {"a": None, "x": frozenset({"1"}), "y": frozenset({"1"})},
+        {"a": "s", "x": "s", "y": "s"},
+    )
+
+    assert visibility_graph.evaluate_visibility(graph, lambda _q: "1") == {"a"}
+
+
+def test_visibility_is_transitive_across_screens(client, seed_questionnaire):
+    seeded = _chain(seed_questionnaire)
+    a, b, c = seeded["question_ids"]
+    other_screen = f"{seeded['screen_key']}_2"
+    with get_engine().begin() as conn:
+        conn.execute(
+            sql_text(
+                "INSERT INTO screen (screen_id, questionnaire_id, screen_key, title, screen_order) "
+                "VALUES (:s, :q, :k, 't', 2)"
+            ),
+            {"s": str(uuid.uuid4()), "q": seeded["questionnaire_id"], "k": other_screen},
+        )
+        conn.execute(
+            sql_text(
+                "UPDATE questionnaire_question SET screen_key = :k, "
+                "screen_id = (SELECT screen_id FROM screen WHERE screen_key = :k) WHERE question_id = :q"
+            ),
+            {"k": other_screen, "q": c},
+        )
+    invalidate_question_meta()
+    invalidate_questionnaire_graph()
+    rs_id = client.post("/api/v1/response-sets", json={"name": "functional"}).json()["response_set_id"]
+
+    upsert_answer(rs_id, a, {"value": "yes"})
+    upsert_answer(rs_id, b, {"value": "go"})
+    shown = visible_questions(rs_id, [b, c])
+    upsert_answer(rs_id, a, {"value": "no"})
+    hidden = visible_questions(rs_id, [b, c])
+
+    assert get_graph_for_question(c).screen_of[c] == other_screen
+    assert shown == {b, c}
+    assert hidden == set()